@@ -14,6 +14,7 @@ from fooltrader.contract.data_contract import EXCHANGE_LIST_COL
 from fooltrader.contract.files_contract import get_finance_dir, get_tick_dir, get_event_dir, get_kdata_dir, \
     get_exchange_dir, get_exchange_cache_dir
 from fooltrader.settings import FOOLTRADER_STORE_PATH, ES_HOSTS, KAFKA_HOST
+from fooltrader.utils.lazy_utils import LazyObject
 
 
 def init_log():
@@ -60,8 +61,14 @@ def mkdir_for_stock(item):
 
 
 def init_env():
+    """
+    create the directories of all the securities in advance,it's not called on import any more,
+    the directories are created when writing the files.
+
+    python -m fooltrader init_env
+    """
     if not os.path.exists(FOOLTRADER_STORE_PATH):
-        print("{} is a wrong path")
+        print("{} is a wrong path".format(FOOLTRADER_STORE_PATH))
         print("please set env FOOLTRADER_STORE_PATH to working path or set it in settings.py")
     else:
         # 初始化股票文件夹
@@ -89,21 +96,20 @@ def init_env():
             if not os.path.exists(exchange_dir):
                 os.makedirs(exchange_dir)
 
+        # 去中心化交易所的标的列表
+        from fooltrader.datasource import init_contract_security_list
+        init_contract_security_list()
+
 
 pd.set_option('expand_frame_repr', False)
 
 init_log()
 
-init_env()
-
 logger = logging.getLogger(__name__)
 
-try:
-    es_client = connections.create_connection(hosts=ES_HOSTS)
-except Exception as e:
-    logger.exception(e)
+# 连接在第一次使用时才创建,import fooltrader不访问es和kafka
+connections.configure(default={'hosts': ES_HOSTS})
+
+es_client = LazyObject(connections.get_connection)
 
-try:
-    kafka_producer = KafkaProducer(bootstrap_servers=KAFKA_HOST)
-except Exception as e:
-    logger.exception(e)
+kafka_producer = LazyObject(lambda: KafkaProducer(bootstrap_servers=KAFKA_HOST))
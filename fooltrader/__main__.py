@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+import argparse
+
+from fooltrader import init_env
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python -m fooltrader')
+    parser.add_argument('command', choices=['init_env'], help='init_env:create the directories of the securities')
+
+    args = parser.parse_args()
+
+    if args.command == 'init_env':
+        init_env()
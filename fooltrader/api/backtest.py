@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+def _to_weights(signals, tradable):
+    # signals:(k,t,n),tradable:(t,n)
+    targets = np.nan_to_num(signals, nan=0.0)
+    weights = np.zeros_like(targets)
+    pre_weight = np.zeros((targets.shape[0], targets.shape[2]))
+    for t in range(targets.shape[1]):
+        # 停牌等没有价格的证券不能交易,保持之前的仓位
+        frozen = ~tradable[t]
+        held = np.where(frozen, pre_weight, 0.0)
+        weight = np.where(frozen, 0.0, targets[:, t])
+
+        # 总仓位超过1的按比例缩小,不加杠杆,保持的仓位先占用
+        budget = np.maximum(1 - np.abs(held).sum(axis=1, keepdims=True), 0)
+        gross = np.abs(weight).sum(axis=1, keepdims=True)
+        scale = np.divide(budget, gross, out=np.ones_like(gross), where=gross > budget)
+
+        pre_weight = held + weight * scale
+        weights[:, t] = pre_weight
+    return weights
+
+
+def _backtest_matrix(signals, prices, buy_cost, sell_cost, slippage, lag):
+    tradable = ~np.isnan(prices)
+    # 停牌的日子收益为0
+    filled = pd.DataFrame(prices).ffill().values
+    returns = np.zeros_like(filled)
+    returns[1:] = filled[1:] / filled[:-1] - 1
+    returns = np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0)
+
+    weights = _to_weights(signals, tradable)
+
+    # 信号在收盘时产生,lag个bar后才持有
+    position = np.zeros_like(weights)
+    if lag:
+        position[:, lag:] = weights[:, :-lag]
+    else:
+        position[:] = weights
+
+    trade = np.diff(position, axis=1, prepend=0)
+    buy = np.clip(trade, 0, None).sum(axis=2)
+    sell = np.clip(-trade, 0, None).sum(axis=2)
+
+    cost = buy * (buy_cost + slippage) + sell * (sell_cost + slippage)
+    net_return = (position * returns[np.newaxis]).sum(axis=2) - cost
+    equity = np.cumprod(1 + net_return, axis=1)
+    return position, net_return, cost, buy + sell, equity
+
+
+def _summarize(net_return, equity, turnover):
+    # 每行一个回测
+    days = net_return.shape[1]
+    total_return = equity[:, -1] - 1
+    annual_return = np.power(equity[:, -1], TRADING_DAYS_PER_YEAR / days) - 1
+    drawdown = equity / np.maximum.accumulate(equity, axis=1) - 1
+    std = net_return.std(axis=1)
+    sharpe = np.divide(net_return.mean(axis=1) * np.sqrt(TRADING_DAYS_PER_YEAR), std,
+                       out=np.zeros_like(std), where=std > 0)
+    return {'totalReturn': total_return,
+            'annualReturn': annual_return,
+            'maxDrawdown': drawdown.min(axis=1),
+            'sharpe': sharpe,
+            'turnover': turnover.sum(axis=1)}
+
+
+def backtest(signals, prices, base_capital=1000000, buy_cost=0.001, sell_cost=0.001, slippage=0.001, lag=1):
+    """
+    vectorized backtest of the signal matrix,e.g. the ma cross signal calculated by fooltrader.api.computing.
+
+    the signal is the target weight of the security,the portfolio is rebalanced to the target weights every bar,
+    the total weight over 1 is scaled down.the security without price(e.g. suspended) keeps its weight and is
+    not traded on that bar.the costs are calculated like AccountService:buying costs
+    buy_cost+slippage,selling costs sell_cost+slippage.
+
+    Parameters
+    ----------
+    signals : DataFrame
+        the target weights,indexed by timestamp,one column for every security,NaN for 0
+    prices : DataFrame
+        the prices with the same shape,e.g. technical.get_kdata_panel(...,pivot=True)['close']
+    base_capital : float
+        the initial capital
+    buy_cost : float
+        the buy cost
+    sell_cost : float
+        the sell cost
+    slippage : float
+        the slippage
+    lag : int
+        the bars between the signal and holding,default:1
+
+    Returns
+    -------
+    dict
+        {'position':DataFrame,'return':Series,'cost':Series,'turnover':Series,'equity':Series}
+
+    """
+    signals = signals.reindex(index=prices.index, columns=prices.columns)
+
+    position, net_return, cost, turnover, equity = _backtest_matrix(
+        np.asarray(signals, dtype=float)[np.newaxis], np.asarray(prices, dtype=float), buy_cost, sell_cost,
+        slippage, lag)
+
+    return {'position': pd.DataFrame(position[0], index=prices.index, columns=prices.columns),
+            'return': pd.Series(net_return[0], index=prices.index),
+            'cost': pd.Series(cost[0], index=prices.index),
+            'turnover': pd.Series(turnover[0], index=prices.index),
+            'equity': pd.Series(equity[0] * base_capital, index=prices.index)}
+
+
+def backtest_sweep(signals_map, prices, buy_cost=0.001, sell_cost=0.001, slippage=0.001, lag=1, chunk_size=100):
+    """
+    backtest many signal matrices at once,e.g. the signals of a parameter grid.
+
+    Parameters
+    ----------
+    signals_map : dict
+        parameter -> signals DataFrame,or iterable of (parameter,signals)
+    prices : DataFrame
+        the prices,indexed by timestamp,one column for every security
+    buy_cost : float
+        the buy cost
+    sell_cost : float
+        the sell cost
+    slippage : float
+        the slippage
+    lag : int
+        the bars between the signal and holding,default:1
+    chunk_size : int
+        the signal matrices calculated together,limit the memory
+
+    Returns
+    -------
+    DataFrame
+        indexed by parameter,columns:totalReturn,annualReturn,maxDrawdown,sharpe,turnover
+
+    """
+    if isinstance(signals_map, dict):
+        signals_map = signals_map.items()
+
+    price_values = np.asarray(prices, dtype=float)
+
+    params = []
+    results = []
+
+    def run_chunk(chunk):
+        _, net_return, _, turnover, equity = _backtest_matrix(np.stack(chunk), price_values, buy_cost, sell_cost,
+                                                              slippage, lag)
+        results.append(pd.DataFrame(_summarize(net_return, equity, turnover)))
+
+    chunk = []
+    for param, signals in signals_map:
+        params.append(param)
+        chunk.append(np.asarray(signals.reindex(index=prices.index, columns=prices.columns), dtype=float))
+        if len(chunk) >= chunk_size:
+            run_chunk(chunk)
+            chunk = []
+    if chunk:
+        run_chunk(chunk)
+
+    if not results:
+        return pd.DataFrame()
+
+    df = pd.concat(results, ignore_index=True)
+    df.index = pd.Index(params) if not isinstance(params[0], tuple) else pd.MultiIndex.from_tuples(params)
+    return df
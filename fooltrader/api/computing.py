@@ -1,8 +1,17 @@
 # -*- coding: utf-8 -*-
 
+import json
+import logging
+import os
+
+import numpy as np
 import pandas as pd
 
 from fooltrader.api import technical
+from fooltrader.contract.files_contract import get_indicator_state_path
+from fooltrader.utils.utils import to_time_str, mkdir_for_path
+
+logger = logging.getLogger(__name__)
 
 
 def ma(security_item, start_date, end_date, level='day', fuquan='qfq', source='163', window=5,
@@ -154,6 +163,328 @@ def macd(security_item, start_date, end_date, level='day', fuquan='qfq', source=
     return result
 
 
+# 截面计算,输入为(日期 x 证券)的矩阵,如get_kdata_panel(pivot=True)['close']
+# 每个证券只用自己的有效数据计算,上市前的NaN和停牌的空缺都会被跳过,结果和单个证券计算的一致
+def _compact(values):
+    # 把每列的有效值按时间顺序挪到前面
+    valid = ~np.isnan(values)
+    order = np.argsort(~valid, axis=0, kind='stable')
+    compacted = np.take_along_axis(values, order, axis=0)
+    return compacted, order, valid
+
+
+def _expand(compacted_result, order, valid):
+    result = np.full(compacted_result.shape, np.nan)
+    np.put_along_axis(result, order, compacted_result, axis=0)
+    result[~valid] = np.nan
+    return result
+
+
+def _to_matrix(df):
+    if isinstance(df, pd.DataFrame):
+        return df.values.astype(float)
+    return np.asarray(df, dtype=float)
+
+
+def _to_result(df, values):
+    if isinstance(df, pd.DataFrame):
+        return pd.DataFrame(values, index=df.index, columns=df.columns)
+    return values
+
+
+def _rolling_mean_matrix(values, window):
+    compacted, order, valid = _compact(values)
+    rows = compacted.shape[0]
+
+    cum = np.cumsum(np.nan_to_num(compacted), axis=0)
+    result = np.full(compacted.shape, np.nan)
+    if rows >= window:
+        result[window - 1] = cum[window - 1]
+        result[window:] = cum[window:] - cum[:-window]
+        result /= window
+
+    return _expand(result, order, valid)
+
+
+def _ema_matrix(values, window, min_periods):
+    compacted, order, valid = _compact(values)
+    alpha = 2.0 / (window + 1)
+
+    # 时间方向递推,证券方向向量化
+    result = np.empty(compacted.shape)
+    if compacted.shape[0] > 0:
+        result[0] = compacted[0]
+    for i in range(1, compacted.shape[0]):
+        result[i] = (1 - alpha) * result[i - 1] + alpha * compacted[i]
+    if min_periods > 1:
+        result[:min_periods - 1] = np.nan
+
+    return _expand(result, order, valid)
+
+
+def panel_ma(df, window=5):
+    """
+    calculate ma of the (dates x securities) matrix.
+
+    Parameters
+    ----------
+    df : DataFrame or ndarray
+        the matrix indexed by timestamp with securityId columns,e.g. get_kdata_panel(pivot=True)['close']
+    window : int
+        the ma window,default : 5
+
+    Returns
+    -------
+    DataFrame or ndarray
+        the same shape as df
+
+    """
+    return _to_result(df, _rolling_mean_matrix(_to_matrix(df), window))
+
+
+def panel_ema(df, window=12, min_periods=None):
+    """
+    calculate ema of the (dates x securities) matrix.
+
+    Parameters
+    ----------
+    df : DataFrame or ndarray
+        the matrix indexed by timestamp with securityId columns,e.g. get_kdata_panel(pivot=True)['close']
+    window : int
+        the ema window,default : 12
+    min_periods : int
+        the minimum valid values for the result,default:window
+
+    Returns
+    -------
+    DataFrame or ndarray
+        the same shape as df
+
+    """
+    if min_periods is None:
+        min_periods = window
+    return _to_result(df, _ema_matrix(_to_matrix(df), window, min_periods))
+
+
+def panel_macd(df, slow=26, fast=12, n=9):
+    """
+    calculate macd of the (dates x securities) matrix.
+
+    Parameters
+    ----------
+    df : DataFrame or ndarray
+        the close matrix indexed by timestamp with securityId columns,e.g. get_kdata_panel(pivot=True)['close']
+    slow : int
+        the slow ma window,default : 26
+    fast : list
+        the fast ma window,default : 12
+    n : int
+        the dea window,default : 9
+
+    Returns
+    -------
+    dict
+        {'diff':diff,'dea':dea,'macd':macd},every value has the same shape as df
+
+    """
+    values = _to_matrix(df)
+
+    diff = _ema_matrix(values, fast, fast) - _ema_matrix(values, slow, slow)
+    dea = _ema_matrix(diff, n, 1)
+    macd = (diff - dea) * 2
+
+    return {'diff': _to_result(df, diff),
+            'dea': _to_result(df, dea),
+            'macd': _to_result(df, macd)}
+
+
+# 增量计算,每个证券的指标状态存在k线目录下,每天新增k线后只需推进新的bar
+def _new_indicator_state(col, fuquan, ma_windows, ema_windows, macd_param):
+    return {'col': col,
+            'fuquan': fuquan,
+            'ma_windows': list(ma_windows),
+            'ema_windows': list(ema_windows),
+            'macd_param': list(macd_param) if macd_param else None,
+            'timestamp': None,
+            'count': 0,
+            'ma_buffer': [],
+            'ema': {},
+            'macd': {'fast': None, 'slow': None, 'dea': None}}
+
+
+def _is_same_params(state, col, fuquan, ma_windows, ema_windows, macd_param):
+    return state['col'] == col and state.get('fuquan') == fuquan and state['ma_windows'] == list(ma_windows) and state['ema_windows'] == list(
+        ema_windows) and state['macd_param'] == (list(macd_param) if macd_param else None)
+
+
+def _get_fuquan_col(df, col, fuquan):
+    # 163的k线复权价格在单独的列里,如hfqClose
+    fuquan_col = fuquan + col[0].upper() + col[1:]
+    if fuquan != 'bfq' and fuquan_col in df.columns:
+        return fuquan_col
+    return col
+
+
+def _advance_indicator_state(state, df):
+    col = state['col']
+    max_window = max(state['ma_windows']) if state['ma_windows'] else 0
+
+    result = []
+    for the_timestamp, value in zip(df.index, df[_get_fuquan_col(df, col, state.get('fuquan', 'bfq'))]):
+        # 和ewm(ignore_na=True)一样,缺失值不推进状态,ema沿用上一个值
+        is_valid = not pd.isna(value)
+        if is_valid:
+            value = float(value)
+            state['count'] += 1
+        count = state['count']
+        row = {'timestamp': the_timestamp}
+
+        if max_window:
+            if is_valid:
+                state['ma_buffer'].append(value)
+                state['ma_buffer'] = state['ma_buffer'][-max_window:]
+            for window in state['ma_windows']:
+                row['{}_ma{}'.format(col, window)] = np.mean(state['ma_buffer'][-window:]) \
+                    if is_valid and count >= window else np.nan
+
+        for window in state['ema_windows']:
+            current = state['ema'].get(str(window))
+            if is_valid:
+                current = value if current is None else _ema_step(current, value, window)
+                state['ema'][str(window)] = current
+            row['{}_ema{}'.format(col, window)] = current if count >= window else np.nan
+
+        if state['macd_param']:
+            slow, fast, n = state['macd_param']
+            macd_state = state['macd']
+            if is_valid:
+                for key, window in (('fast', fast), ('slow', slow)):
+                    macd_state[key] = value if macd_state[key] is None else _ema_step(macd_state[key], value,
+                                                                                     window)
+
+            # 和macd()一致,diff在有了slow个值后才有效,dea从第一个有效的diff开始算
+            if count >= max(slow, fast):
+                diff = macd_state['fast'] - macd_state['slow']
+                dea = macd_state['dea']
+                if is_valid:
+                    dea = diff if dea is None else _ema_step(dea, diff, n)
+                    macd_state['dea'] = dea
+                row['diff'] = diff
+                row['dea'] = dea
+                row['macd'] = (diff - dea) * 2
+            else:
+                row['diff'] = row['dea'] = row['macd'] = np.nan
+
+        state['timestamp'] = to_time_str(the_timestamp)
+        result.append(row)
+
+    if not result:
+        return pd.DataFrame()
+
+    df_result = pd.DataFrame(result)
+    return df_result.set_index('timestamp')
+
+
+def _ema_step(pre, value, window):
+    alpha = 2.0 / (window + 1)
+    return (1 - alpha) * pre + alpha * value
+
+
+def get_indicator_state(security_item, source='163', fuquan='hfq'):
+    """
+    get the persisted indicator state.
+
+    Parameters
+    ----------
+    security_item : SecurityItem or str
+        the security item,id or code
+    source : str
+        the data source,{'163','sina'},default: '163'
+    fuquan : str
+        {"hfq","bfq"},default:"hfq"
+
+    Returns
+    -------
+    dict
+        None if not exist
+
+    """
+    security_item = technical.to_security_item(security_item)
+    the_path = get_indicator_state_path(security_item, source=source, fuquan=fuquan)
+    if os.path.isfile(the_path):
+        with open(the_path) as f:
+            return json.load(f)
+    return None
+
+
+def update(security_item, new_bars=None, source='163', fuquan='hfq', col='close', ma_windows=(5, 10, 20),
+           ema_windows=(12, 26), macd_param=(26, 12, 9)):
+    """
+    advance the persisted ma,ema and macd state with the new bars,the result is the same as the full recompute.
+
+    the state would be rebuilt from the whole kdata if it doesn't exist or the params changed.
+    the bars with missing value are skipped like ewm(ignore_na=True).
+
+    Parameters
+    ----------
+    security_item : SecurityItem or str
+        the security item,id or code
+    new_bars : DataFrame
+        the new kdata indexed by timestamp,default:None(read the bars after the state from the kdata)
+    source : str
+        the data source,{'163','sina'},default: '163'
+    fuquan : str
+        {"hfq","bfq"},default:"hfq",qfq is not supported because its history changes with every new factor
+    col : str
+        the column for calculating,default:'close'
+    ma_windows : list
+        the ma windows,default:(5, 10, 20)
+    ema_windows : list
+        the ema windows,default:(12, 26)
+    macd_param : tuple
+        (slow, fast, n),default:(26, 12, 9),None for not calculating macd
+
+    Returns
+    -------
+    DataFrame
+        the indicators of the processed bars,the columns are like ma,ema and macd
+
+    """
+    if fuquan not in ('hfq', 'bfq'):
+        raise ValueError("fuquan:{} is not supported,use hfq or bfq".format(fuquan))
+
+    security_item = technical.to_security_item(security_item)
+    the_path = get_indicator_state_path(security_item, source=source, fuquan=fuquan)
+
+    state = get_indicator_state(security_item, source=source, fuquan=fuquan)
+
+    results = []
+    if not state or not _is_same_params(state, col, fuquan, ma_windows, ema_windows, macd_param):
+        state = _new_indicator_state(col, fuquan, ma_windows, ema_windows, macd_param)
+        df = technical.get_kdata(security_item, source=source, fuquan=fuquan)
+        results.append(_advance_indicator_state(state, df))
+    elif new_bars is None:
+        new_bars = technical.get_kdata(security_item, source=source, fuquan=fuquan, start_date=state['timestamp'])
+
+    if new_bars is not None and not new_bars.empty:
+        new_bars = new_bars.sort_index()
+        if state['timestamp']:
+            new_bars = new_bars[new_bars.index > pd.Timestamp(state['timestamp'])]
+        results.append(_advance_indicator_state(state, new_bars))
+
+    # 先写临时文件再替换,中途退出不会留下读不了的状态
+    mkdir_for_path(the_path)
+    tmp_path = the_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, the_path)
+
+    results = [df for df in results if not df.empty]
+    if results:
+        return pd.concat(results)
+    return pd.DataFrame()
+
+
 if __name__ == '__main__':
     # print(ma(security_item='000002', start_date='2017-01-01', end_date='2017-12-31'))
     # print(ema(security_item='000002', start_date='20171101', end_date='20171201'))
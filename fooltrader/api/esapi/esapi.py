@@ -41,6 +41,85 @@ def es_get_latest_daily_user_statistic(user_id, main_chain='eos', security_id='c
     return None
 
 
+def es_get_latest_daily_user_statistics(user_ids, main_chain='eos', security_id='cryptocurrency_contract_RAM-EOS',
+                                        batch_size=1000):
+    """
+    the batch version of es_get_latest_daily_user_statistic,one terms query for every batch_size users.
+
+    Parameters
+    ----------
+    user_ids : list of str
+        the users
+    main_chain : str
+        the main chain
+    security_id : str
+        the security id
+    batch_size : int
+        the users for one query
+
+    Returns
+    -------
+    dict
+        user_id -> the latest daily statistic,the users without statistic are not included
+
+    """
+    index = get_cryptocurrency_daily_user_statistic_index(main_chain=main_chain)
+    user_ids = list(user_ids)
+
+    result = {}
+    for i in range(0, len(user_ids), batch_size):
+        batch = user_ids[i:i + batch_size]
+
+        s = Search(using=es_client, index=index, doc_type='doc') \
+            .filter('terms', userId=batch) \
+            .filter('term', securityId=security_id)
+        s.aggs.bucket('users', 'terms', field='userId', size=len(batch)) \
+            .metric('latest', 'top_hits', size=1, sort=[{"timestamp": {"order": "desc"}}])
+
+        resp = s[0:0].execute()
+        for bucket in resp.aggregations.users.buckets:
+            hits = bucket.latest.hits.hits
+            if hits:
+                result[bucket.key] = hits[0]['_source'].to_dict()
+    return result
+
+
+def es_get_user_statistics(user_ids, main_chain='eos', security_id='cryptocurrency_contract_RAM-EOS',
+                           batch_size=1000):
+    """
+    the batch version of es_get_user_statistic(user_id=...),one mget for every batch_size users.
+
+    Parameters
+    ----------
+    user_ids : list of str
+        the users
+    main_chain : str
+        the main chain
+    security_id : str
+        the security id
+    batch_size : int
+        the users for one request
+
+    Returns
+    -------
+    dict
+        user_id -> the latest statistic,the users without statistic are not included
+
+    """
+    index = get_cryptocurrency_user_statistic_index(main_chain=main_chain)
+    user_ids = list(user_ids)
+
+    result = {}
+    for i in range(0, len(user_ids), batch_size):
+        batch = user_ids[i:i + batch_size]
+        resp = es_client.mget(index=index, doc_type='doc',
+                              body={'ids': ['{}_{}'.format(user_id, security_id) for user_id in batch]})
+        for user_id, doc in zip(batch, resp['docs']):
+            if doc.get('found'):
+                result[user_id] = doc['_source']
+    return result
+
+
 def es_get_user_statistic(main_chain='eos', security_id='cryptocurrency_contract_RAM-EOS', user_id=None,
                           start_date=None, end_date=None, from_idx=0, size=100, order='volume'):
     index = get_cryptocurrency_user_statistic_index(main_chain=main_chain)
@@ -2,14 +2,151 @@
 
 import os
 
+import numpy as np
 import pandas as pd
 
 from fooltrader.api.technical import to_security_item
 from fooltrader.contract.files_contract import get_event_path
+from fooltrader.settings import EVENT_CACHE_SIZE_MB
 from fooltrader.utils import pd_utils
+from fooltrader.utils.cache_utils import LruCache, get_file_stat
 from fooltrader.utils.pd_utils import df_for_date_range
 
 
+class EventIndex(object):
+    """
+    the events of one security sorted by timestamp,for the as-of lookups in O(log n).
+
+    Parameters
+    ----------
+    df : DataFrame
+        the events with timestamp column,in the file order
+
+    """
+
+    def __init__(self, df):
+        if df.empty:
+            self.df = df
+            self.timestamps = np.array([], dtype='datetime64[ns]')
+        else:
+            # 同一天公告的,报告期新的在后
+            sort_columns = ['timestamp', 'reportPeriod'] if 'reportPeriod' in df.columns else ['timestamp']
+            self.df = df.sort_values(sort_columns, kind='mergesort').reset_index(drop=True)
+            self.timestamps = pd.to_datetime(self.df['timestamp']).values
+
+        # 报告期 -> 公告日,多次公告的取文件里的最后一次
+        self.report_period_map = {}
+        if 'reportPeriod' in df.columns:
+            for report_period, timestamp in zip(pd.to_datetime(df['reportPeriod']), df['timestamp']):
+                self.report_period_map[report_period] = timestamp
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def asof_positions(self, dates):
+        """
+        the positions of the latest events on or before the dates,-1 for none.
+        """
+        dates = pd.to_datetime(pd.Series(dates)).values
+        return np.searchsorted(self.timestamps, dates, side='right') - 1
+
+    def get_latest(self, the_date):
+        """
+        the latest event on or before the_date,None for none.
+        """
+        pos = self.asof_positions([the_date])[0]
+        if pos < 0:
+            return None
+        return self.df.iloc[pos]
+
+    def get_report_event_date(self, report_period):
+        return self.report_period_map.get(pd.Timestamp(report_period))
+
+
+# path -> (file stat,EventIndex)
+event_index_cache = LruCache(max_bytes=EVENT_CACHE_SIZE_MB * 1024 * 1024,
+                             sizeof=lambda entry: int(entry[1].df.memory_usage(deep=True).sum()))
+
+
+def _read_event_df(path):
+    if os.path.exists(path):
+        df = pd.read_csv(path, dtype={"code": str, 'timestamp': str, 'reportPeriod': str})
+        if not df.empty and 'id' not in df.columns and 'securityId' in df.columns:
+            df['id'] = df['securityId'] + '_' + df['timestamp']
+        return df
+    return pd.DataFrame()
+
+
+def get_event_index(security_item, event_type='finance_report'):
+    """
+    get the sorted event index of the security,it's built once and rebuilt when the file changes.
+
+    Parameters
+    ----------
+    security_item : SecurityItem or str
+        the security item,id or code
+    event_type : str
+        {'finance_forecast','finance_report'}
+
+    Returns
+    -------
+    EventIndex
+
+    """
+    security_item = to_security_item(security_item)
+    path = get_event_path(security_item, event_type)
+    stat = (path, get_file_stat(path))
+
+    entry = event_index_cache.get(path)
+    if entry and entry[0] == stat:
+        return entry[1]
+
+    event_index = EventIndex(_read_event_df(path))
+    event_index_cache.put(path, (stat, event_index))
+    return event_index
+
+
+def get_latest_events(security_items, dates, event_type='finance_report'):
+    """
+    get the latest events on or before the dates for many (security,date) pairs,e.g. the latest
+    finance report published before every trading day in backtest.
+
+    Parameters
+    ----------
+    security_items : list
+        the security items,ids or codes
+    dates : list
+        the dates,the same length as security_items
+    event_type : str
+        {'finance_forecast','finance_report'}
+
+    Returns
+    -------
+    DataFrame
+        one row for every pair in the same order,the event columns are NaN if no event before the date
+
+    """
+    security_ids = [the_item if isinstance(the_item, str) else the_item['id'] for the_item in security_items]
+    pairs = pd.DataFrame({'securityId': security_ids, 'date': pd.to_datetime(pd.Series(list(dates))).values})
+
+    frames = []
+    for security_id, group in pairs.groupby('securityId', sort=False):
+        security_item = to_security_item(security_id)
+        event_index = get_event_index(security_item, event_type=event_type)
+        if len(event_index):
+            positions = event_index.asof_positions(group['date'])
+            df = event_index.df.reindex(positions).set_index(group.index)
+        else:
+            df = pd.DataFrame(index=group.index)
+        df['securityId'] = security_item['id']
+        df['date'] = group['date']
+        frames.append(df)
+
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames).sort_index()
+
+
 def get_event(security_item, event_type='finance_forecast', start_date=None, end_date=None, index='timestamp'):
     """
     get forecast items.
@@ -54,11 +191,9 @@ def get_finance_report_event(security_item, index='timestamp', start_date=None,
 
 
 def get_report_event_date(security_item, report_period):
-    df = get_finance_report_event(security_item, index='reportPeriod')
-    if report_period in df.index:
-        report_event_date = df.loc[report_period, 'timestamp']
-        if type(report_event_date) == pd.Series:
-            report_event_date = report_event_date.iat[-1]
+    report_event_date = get_event_index(security_item, event_type='finance_report').get_report_event_date(
+        report_period)
+    if report_event_date is not None:
         return report_event_date
     else:
         return report_period
@@ -5,20 +5,26 @@ import json
 import logging
 import os
 import re
+import threading
 from ast import literal_eval
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from itertools import repeat
 
 import pandas as pd
 
 from fooltrader.consts import CHINA_STOCK_SH_INDEX, CHINA_STOCK_SZ_INDEX, USA_STOCK_NASDAQ_INDEX, \
     SECURITY_TYPE_MAP_EXCHANGES
 from fooltrader.contract import files_contract
-from fooltrader.contract.data_contract import get_future_name, KDATA_FUTURE_COL
+from fooltrader.contract.data_contract import get_future_name, KDATA_FUTURE_COL, KDATA_STOCK_HFQ_COL
 from fooltrader.contract.files_contract import get_kdata_dir, get_kdata_path, get_exchange_cache_dir, \
     get_security_list_path, get_exchange_trading_calendar_path, adjust_source
+from fooltrader.datamanager import kdata_store
 from fooltrader.datamanager.zipdata import unzip
+from fooltrader.settings import KDATA_CACHE_SIZE_MB, KDATA_CACHE_POLICY
 from fooltrader.utils import pd_utils
-from fooltrader.utils.pd_utils import kdata_df_save, df_for_date_range
-from fooltrader.utils.utils import get_file_name, to_time_str, drop_duplicate
+from fooltrader.utils.cache_utils import FrameCache, get_file_stat
+from fooltrader.utils.pd_utils import kdata_df_append, df_for_date_range
+from fooltrader.utils.utils import get_file_name, to_time_str, drop_duplicate, mkdir_for_path
 
 logger = logging.getLogger(__name__)
 
@@ -69,24 +75,19 @@ def get_security_list(security_type='stock', exchanges=None, start_code=None, en
         exchanges = SECURITY_TYPE_MAP_EXCHANGES[security_type]
 
     if security_type == 'index':
-        df = df.append(pd.DataFrame(CHINA_STOCK_SH_INDEX), ignore_index=True)
-        df = df.append(pd.DataFrame(CHINA_STOCK_SZ_INDEX), ignore_index=True)
-        df = df.append(pd.DataFrame(USA_STOCK_NASDAQ_INDEX), ignore_index=True)
+        df = df.append(security_master.get_list_df('index'), ignore_index=True)
     else:
         for exchange in exchanges:
-            the_path = get_security_list_path(security_type, exchange)
-            if os.path.exists(the_path):
-                converters = None
-
-                if mode == 'es' and security_type == 'stock':
+            if mode == 'es' and security_type == 'stock':
+                the_path = get_security_list_path(security_type, exchange)
+                if os.path.exists(the_path):
                     converters = {'code': str,
                                   'sinaIndustry': convert_to_list_if_need,
                                   'sinaConcept': convert_to_list_if_need,
                                   'sinaArea': convert_to_list_if_need}
-                if converters:
                     df = df.append(pd.read_csv(the_path, converters=converters), ignore_index=True)
-                else:
-                    df = df.append(pd.read_csv(the_path, dtype=str), ignore_index=True)
+            else:
+                df = df.append(security_master.get_list_df(security_type, exchange), ignore_index=True)
 
     if not df.empty > 0:
         df = df_for_date_range(df, start_date=start_list_date)
@@ -105,6 +106,94 @@ def get_security_list(security_type='stock', exchanges=None, start_code=None, en
     return df
 
 
+class SecurityMaster(object):
+    """
+    in-process cache of the security list files.
+
+    the list of one (security_type, exchange) is reloaded only when its file's mtime or size changes,
+    and the security items are looked up by code in O(1).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # (security_type, exchange) -> entry
+        self._entries = {}
+
+    def _get_entry(self, security_type, exchange=None):
+        if security_type == 'index':
+            the_path = None
+            stat = None
+        else:
+            the_path = get_security_list_path(security_type, exchange)
+            # 去中心化交易所的列表是写死的,第一次用到时生成
+            if security_type == 'cryptocurrency' and exchange == 'contract' and not os.path.exists(the_path):
+                from fooltrader.datasource import init_contract_security_list
+                init_contract_security_list()
+            try:
+                file_stat = os.stat(the_path)
+                stat = (file_stat.st_mtime_ns, file_stat.st_size)
+            except OSError:
+                stat = None
+
+        key = (security_type, exchange)
+        entry = self._entries.get(key)
+        if entry and entry['path'] == the_path and entry['stat'] == stat:
+            return entry
+
+        with self._lock:
+            if security_type == 'index':
+                df = pd.DataFrame(CHINA_STOCK_SH_INDEX + CHINA_STOCK_SZ_INDEX + USA_STOCK_NASDAQ_INDEX)
+            elif stat:
+                df = pd.read_csv(the_path, dtype=str)
+            else:
+                df = pd.DataFrame()
+
+            code_map_row = {}
+            if not df.empty:
+                # 重复的code以最后一个为准
+                for idx, code in enumerate(df['code']):
+                    code_map_row[code] = idx
+
+            entry = {'path': the_path,
+                     'stat': stat,
+                     'df': df,
+                     'code_map_row': code_map_row,
+                     'code_map_item': {}}
+            self._entries[key] = entry
+            return entry
+
+    def get_list_df(self, security_type, exchange=None):
+        """
+        the raw security list of the exchange,don't modify it in place.
+        """
+        return self._get_entry(security_type, exchange)['df']
+
+    def get_item(self, security_type, exchanges, code):
+        if security_type == 'index':
+            exchanges = [None]
+
+        # 多个交易所有相同code的,以后面的为准
+        for exchange in reversed(exchanges):
+            entry = self._get_entry(security_type, exchange)
+            item = entry['code_map_item'].get(code)
+            if item is None:
+                row = entry['code_map_row'].get(code)
+                if row is None:
+                    continue
+                item = entry['df'].iloc[row]
+                item.name = code
+                entry['code_map_item'][code] = item
+            return item.copy()
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+
+
+security_master = SecurityMaster()
+
+
 def _get_security_item(security_type, exchanges, code=None):
     """
     get the security item.
@@ -122,16 +211,11 @@ def _get_security_item(security_type, exchanges, code=None):
 
     Returns
     -------
-    DataFrame
+    Series
         the security item
 
     """
-    df = get_security_list(security_type=security_type, exchanges=exchanges)
-
-    if not df.empty:
-        df = df.set_index(df['code'])
-        return df.loc[code,]
-    return None
+    return security_master.get_item(security_type=security_type, exchanges=exchanges, code=code)
 
 
 def to_security_item(security_item, exchange=None):
@@ -159,6 +243,26 @@ def to_security_item(security_item, exchange=None):
     return security_item
 
 
+def to_security_items(security_items, exchange=None):
+    """
+    the bulk version of to_security_item.
+
+    Parameters
+    ----------
+    security_items : list
+        the security items,ids or codes
+    exchange : str
+        the exchange,set this for cryptocurrency
+
+    Returns
+    -------
+    list
+        the security items,None for the one not found
+
+    """
+    return [to_security_item(security_item, exchange) for security_item in security_items]
+
+
 # tick
 def get_ticks(security_item, the_date=None, start_date=None, end_date=None):
     """
@@ -224,7 +328,7 @@ def get_available_tick_dates(security_item):
 
 # kdata
 def get_kdata(security_item, exchange=None, the_date=None, start_date=None, end_date=None, fuquan='bfq', source=None,
-              level='day', generate_id=False):
+              level='day', generate_id=False, copy=True):
     """
     get kdata.
 
@@ -248,6 +352,9 @@ def get_kdata(security_item, exchange=None, the_date=None, start_date=None, end_
         the data source,{'163','sina','exchange'},just used for internal merge
     level : str or int
         the kdata level,{1,5,15,30,60,'day','week','month'},default : 'day'
+    copy : bool
+        whether the result could be modified in place,set False for reading only,e.g. replaying the kdata,
+        which avoids copying the cached kdata
 
     Returns
     -------
@@ -261,20 +368,22 @@ def get_kdata(security_item, exchange=None, the_date=None, start_date=None, end_
     source = adjust_source(security_item, source)
 
     # 163的数据是合并过的,有复权因子,都存在'bfq'目录下,只需从一个地方取数据,并做相应转换
-    if source == '163':
-        the_path = files_contract.get_kdata_path(security_item, source=source, fuquan='bfq')
-    else:
-        the_path = files_contract.get_kdata_path(security_item, source=source, fuquan=fuquan)
+    file_fuquan = 'bfq' if source == '163' else fuquan
+    the_path = files_contract.get_kdata_path(security_item, source=source, fuquan=file_fuquan)
 
     if os.path.isfile(the_path):
-        df = pd_utils.pd_read_csv(the_path, generate_id=generate_id)
+        df = kdata_cache.get((security_item['id'], source, file_fuquan), the_path, pd_utils.pd_read_kdata,
+                             depend_paths=[pd_utils.get_kdata_delta_path(the_path)], copy=copy)
+        if not copy:
+            # 共享缓存的数据,下面增加的列不影响缓存
+            df = df.copy(deep=False)
+
+        # generate id if need
+        if generate_id and not df.empty and 'id' not in df.columns:
+            df['id'] = df['securityId'] + '_' + df['timestamp']
 
         if 'factor' in df.columns and source == '163' and security_item['type'] == 'stock':
-            df_kdata_has_factor = df[df['factor'].notna()]
-            if df_kdata_has_factor.shape[0] > 0:
-                latest_factor = df_kdata_has_factor.tail(1).factor.iat[0]
-            else:
-                latest_factor = None
+            latest_factor = _get_latest_factor(security_item, the_path, df=df)
 
         if the_date:
             if the_date in df.index:
@@ -288,18 +397,17 @@ def get_kdata(security_item, exchange=None, the_date=None, start_date=None, end_
         # 复权处理
         if source == '163' and security_item['type'] == 'stock':
             if 'factor' in df.columns:
-                # 后复权是不变的
-                df['hfqClose'] = df.close * df.factor
-                df['hfqOpen'] = df.open * df.factor
-                df['hfqHigh'] = df.high * df.factor
-                df['hfqLow'] = df.low * df.factor
+                # 后复权是不变的,写入时已经算好,老的数据才需要在这里算
+                if 'hfqClose' not in df.columns:
+                    df['hfqClose'] = df.close * df.factor
+                    df['hfqOpen'] = df.open * df.factor
+                    df['hfqHigh'] = df.high * df.factor
+                    df['hfqLow'] = df.low * df.factor
 
                 # 前复权需要根据最新的factor往回算,当前价格不变
                 if latest_factor:
-                    df['qfqClose'] = df.hfqClose / latest_factor
-                    df['qfqOpen'] = df.hfqOpen / latest_factor
-                    df['qfqHigh'] = df.hfqHigh / latest_factor
-                    df['qfqLow'] = df.hfqLow / latest_factor
+                    for col in KDATA_STOCK_HFQ_COL:
+                        df['qfq' + col[3:]] = df[col] / latest_factor
                 else:
                     logger.exception("missing latest factor for {}".format(security_item['id']))
 
@@ -307,6 +415,152 @@ def get_kdata(security_item, exchange=None, the_date=None, start_date=None, end_
     return pd.DataFrame()
 
 
+# 解析后的k线缓存,文件变化后自动失效
+kdata_cache = FrameCache(max_bytes=KDATA_CACHE_SIZE_MB * 1024 * 1024, policy=KDATA_CACHE_POLICY)
+
+
+# 最新的复权因子,meta或者k线文件变化后失效
+latest_factor_cache = {}
+
+
+def _get_latest_factor(security_item, the_path, df=None):
+    meta_path = files_contract.get_kdata_meta_path(security_item, source='163')
+    stat = (get_file_stat(meta_path), get_file_stat(the_path), get_file_stat(pd_utils.get_kdata_delta_path(the_path)))
+
+    entry = latest_factor_cache.get(the_path)
+    if entry and entry[0] == stat:
+        return entry[1]
+
+    latest_factor = _load_latest_factor(security_item, the_path, meta_path, df=df)
+    latest_factor_cache[the_path] = (stat, latest_factor)
+    return latest_factor
+
+
+def _load_latest_factor(security_item, the_path, meta_path, df=None):
+    # 写入时保存在meta里,meta比数据旧的话说明数据不是通过save_stock_kdata_163写的,从数据里找
+    if os.path.isfile(meta_path) and os.path.getmtime(meta_path) >= os.path.getmtime(the_path):
+        meta = kdata_store.get_kdata_meta(security_item, source='163')
+        if meta and meta.get('latestFactor'):
+            return meta['latestFactor']
+
+    if df is None:
+        df = pd_utils.pd_read_kdata(the_path, columns=['factor'])
+    df_kdata_has_factor = df[df['factor'].notna()]
+    if df_kdata_has_factor.shape[0] > 0:
+        return df_kdata_has_factor.tail(1).factor.iat[0]
+    return None
+
+
+def _get_panel_kdata(security_item, start_date, end_date, fuquan, source, columns):
+    source = adjust_source(security_item, source)
+
+    # 163的股票数据用复权因子转换价格
+    factor_fuquan = source == '163' and security_item['type'] == 'stock' and fuquan in ('qfq', 'hfq')
+
+    if factor_fuquan or source == '163':
+        the_path = files_contract.get_kdata_path(security_item, source=source, fuquan='bfq')
+    else:
+        the_path = files_contract.get_kdata_path(security_item, source=source, fuquan=fuquan)
+
+    if not os.path.isfile(the_path):
+        return None
+
+    read_columns = columns
+    if factor_fuquan and read_columns is not None and 'factor' not in read_columns:
+        read_columns = list(read_columns) + ['factor']
+
+    df = pd_utils.pd_read_kdata(the_path, columns=read_columns, start_date=start_date, end_date=end_date)
+
+    if factor_fuquan and 'factor' in df.columns:
+        latest_factor = None
+        if fuquan == 'qfq':
+            latest_factor = _get_latest_factor(security_item, the_path)
+            if not latest_factor:
+                logger.warning("missing latest factor for {}".format(security_item['id']))
+                return None
+        for col in ('open', 'close', 'high', 'low'):
+            if col in df.columns:
+                df[col] = df[col] * df['factor']
+                if latest_factor:
+                    df[col] = df[col] / latest_factor
+
+    if columns is not None:
+        df = df.loc[:, [col for col in columns if col in df.columns]]
+
+    return df
+
+
+def get_kdata_panel(codes=None, security_type='stock', exchanges=None, start_date=None, end_date=None, fuquan='bfq',
+                    source=None, columns=None, pivot=False, max_workers=8, use_process=False):
+    """
+    get kdata of many securities in one call.
+
+    Parameters
+    ----------
+    codes : list
+        the exact codes to query,default:None(all the securities of the security_type and exchanges)
+    security_type : str
+        {‘stock’, 'index', 'future', 'cryptocurrency'},default: stock
+    exchanges : str or list
+        ['sh', 'sz','nasdaq','nyse','amex','shfe','dce','zce'],default: the exchanges of the security_type
+    start_date : TimeStamp str or TimeStamp
+        start date
+    end_date : TimeStamp str or TimeStamp
+        end date
+    fuquan : str
+        {"qfq","hfq","bfq"},default:"bfq"
+        for 163 stock data,the open,close,high,low would be adjusted by the factor
+    source : str
+        the data source,{'163','sina','exchange'},default: the best source of the security_type
+    columns : list
+        the kdata columns to read,default:None(all columns)
+    pivot : bool
+        False:return (timestamp,securityId) MultiIndex DataFrame
+        True:return DataFrame indexed by timestamp with (column,securityId) columns,
+        panel['close'] is the close matrix,default:False
+    max_workers : int
+        the worker count for loading the files
+    use_process : bool
+        whether use process pool,default:False(thread pool)
+
+    Returns
+    -------
+    DataFrame
+
+    """
+    security_list = get_security_list(security_type=security_type, exchanges=exchanges, codes=codes)
+
+    if security_list.empty:
+        return pd.DataFrame()
+
+    security_items = [item for _, item in security_list.iterrows()]
+
+    if use_process:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+    else:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    with executor:
+        dfs = executor.map(_get_panel_kdata, security_items, repeat(start_date), repeat(end_date), repeat(fuquan),
+                           repeat(source), repeat(columns))
+
+        frames = {}
+        for security_item, df in zip(security_items, dfs):
+            if df is not None and not df.empty:
+                frames[security_item['id']] = df
+
+    if not frames:
+        return pd.DataFrame()
+
+    df = pd.concat(frames, names=['securityId', 'timestamp'])
+    df = df.swaplevel().sort_index()
+
+    if pivot:
+        df = df.unstack('securityId')
+
+    return df
+
+
 def get_latest_download_trading_date(security_item, return_next=True, source=None):
     df = get_kdata(security_item, source=source)
     if len(df) == 0:
@@ -345,9 +599,126 @@ def kdata_exist(security_item, year, quarter, fuquan=None, source='163'):
     return False
 
 
+def _read_shfe_day_data(cache_dir, the_dates):
+    """
+    load the cached shfe day kdata json of the dates into one frame.
+
+    Parameters
+    ----------
+    cache_dir : str
+        the cache dir of the year
+    the_dates : list of str
+        the cached file names,e.g. '20180702'
+
+    Returns
+    -------
+    (DataFrame, list)
+        the raw rows with timestamp,the dates loaded
+
+    """
+    dfs = []
+    the_loaded = []
+    for the_date in the_dates:
+        the_path = os.path.join(cache_dir, the_date)
+        try:
+            with open(the_path, 'r', encoding='UTF8') as f:
+                the_datas = json.load(f)['o_curinstrument']
+        except Exception as e:
+            logger.exception("read {} failed".format(the_path), e)
+            continue
+
+        the_loaded.append(the_date)
+        if the_datas:
+            df = pd.DataFrame(the_datas)
+            df['timestamp'] = to_time_str(the_date)
+            dfs.append(df)
+
+    if not dfs:
+        return pd.DataFrame(), the_loaded
+    return pd.concat(dfs, ignore_index=True, sort=False), the_loaded
+
+
+def _to_shfe_day_kdata(df):
+    # {'CLOSEPRICE': 11480,
+    #  'DELIVERYMONTH': '1809',
+    #  'HIGHESTPRICE': 11555,
+    #  'LOWESTPRICE': 11320,
+    #  'OPENINTEREST': 425692,
+    #  'OPENINTERESTCHG': 3918,
+    #  'OPENPRICE': 11495,
+    #  'ORDERNO': 0,
+    #  'PRESETTLEMENTPRICE': 11545,
+    #  'PRODUCTID': 'ru_f    ',
+    #  'PRODUCTNAME': '天然橡胶            ',
+    #  'PRODUCTSORTNO': 100,
+    #  'SETTLEMENTPRICE': 11465,
+    #  'VOLUME': 456574,
+    #  'ZD1_CHG': -65,
+    #  'ZD2_CHG': -80}
+
+    # 小计,合计等不是合约
+    df = df[df['DELIVERYMONTH'].astype(str).str.match(r'\d{4}')]
+    if df.empty:
+        return pd.DataFrame(columns=KDATA_FUTURE_COL)
+
+    def to_number(col, fill=0):
+        return pd.to_numeric(df[col], errors='coerce').fillna(fill)
+
+    codes = df['PRODUCTID'].str.split('_').str[0] + df['DELIVERYMONTH']
+    low_price = to_number('LOWESTPRICE')
+    open_price = to_number('OPENPRICE')
+    close_price = to_number('CLOSEPRICE')
+    high_price = to_number('HIGHESTPRICE')
+    volume = to_number('VOLUME')
+    change = to_number('ZD1_CHG')
+    change1 = to_number('ZD2_CHG')
+    pre_settlement = pd.to_numeric(df['PRESETTLEMENTPRICE'], errors='coerce')
+
+    pre_close = close_price - change
+
+    kdata = pd.DataFrame({'timestamp': df['timestamp'],
+                          'code': codes,
+                          'name': codes.map({code: get_future_name(code) for code in codes.unique()}),
+                          'low': low_price,
+                          'open': open_price,
+                          'close': close_price,
+                          'high': high_price,
+                          'volume': volume,
+                          # 成交额为估算
+                          'turnover': (low_price + open_price + close_price + high_price / 4) * volume,
+                          'securityId': 'future_shfe_' + codes,
+                          'preClose': pre_close,
+                          'change': change,
+                          # 首日交易
+                          'changePct': (change / pre_close).where(pre_close != 0, 0),
+                          'openInterest': pd.to_numeric(df['OPENINTEREST'], errors='coerce'),
+                          'settlement': pd.to_numeric(df['SETTLEMENTPRICE'], errors='coerce'),
+                          'preSettlement': pre_settlement,
+                          'change1': change1,
+                          'changePct1': (change1 / pre_settlement).where(pre_settlement != 0, 0)},
+                         columns=KDATA_FUTURE_COL)
+    return kdata
+
+
 def parse_shfe_day_data(force_parse=False):
+    """
+    parse the cached shfe day kdata of this year in batch,
+    every contract's new bars are appended in one write and the security list is saved once.
+
+    the bars of a re-parsed date replace the saved ones,so force_parse picks up the corrected cache files.
+
+    Parameters
+    ----------
+    force_parse : bool
+        whether parse the dates which have been parsed
+
+    """
     cache_dir = get_exchange_cache_dir(security_type='future', exchange='shfe', the_year=datetime.datetime.today().year,
                                        data_type="day_kdata")
+    if not os.path.exists(cache_dir):
+        logger.info("no cached day kdata in {}".format(cache_dir))
+        return
+
     the_parsed_path = os.path.join(cache_dir, 'parsed')
     the_parsed = []
     if os.path.exists(the_parsed_path):
@@ -361,159 +732,52 @@ def parse_shfe_day_data(force_parse=False):
         the_dates = [f for f in os.listdir(cache_dir) if
                      f != 'parsed' and f not in the_parsed]
 
-    for the_date in the_dates:
-        the_path = os.path.join(cache_dir, the_date)
-        logger.info("start handling {}".format(the_path))
-
-        with open(the_path, 'r', encoding='UTF8') as f:
-            tmp_str = f.read()
-            the_json = json.loads(tmp_str)
-            the_datas = the_json['o_curinstrument']
-            # 日期,代码,名称,最低,开盘,收盘,最高,成交量(手),成交额(元),唯一标识,前收盘,涨跌额,涨跌幅(%),持仓量,结算价,前结算,涨跌额(按结算价),涨跌幅(按结算价)
-            KDATA_COLUMN_FUTURE = ['timestamp', 'code', 'name', 'low', 'open', 'close', 'high', 'volume', 'turnover',
-                                   'securityId',
-                                   'preClose', 'change', 'changePct', 'openInterest', 'settlement', 'preSettlement',
-                                   'change1',
-                                   'changePct1']
-            for the_data in the_datas:
-                # {'CLOSEPRICE': 11480,
-                #  'DELIVERYMONTH': '1809',
-                #  'HIGHESTPRICE': 11555,
-                #  'LOWESTPRICE': 11320,
-                #  'OPENINTEREST': 425692,
-                #  'OPENINTERESTCHG': 3918,
-                #  'OPENPRICE': 11495,
-                #  'ORDERNO': 0,
-                #  'PRESETTLEMENTPRICE': 11545,
-                #  'PRODUCTID': 'ru_f    ',
-                #  'PRODUCTNAME': '天然橡胶            ',
-                #  'PRODUCTSORTNO': 100,
-                #  'SETTLEMENTPRICE': 11465,
-                #  'VOLUME': 456574,
-                #  'ZD1_CHG': -65,
-                #  'ZD2_CHG': -80}
-
-                if not re.match("\d{4}", the_data['DELIVERYMONTH']):
-                    continue
+    logger.info("start handling {} dates in {}".format(len(the_dates), cache_dir))
 
-                code = "{}{}".format(the_data['PRODUCTID'][:the_data['PRODUCTID'].index('_')],
-                                     the_data['DELIVERYMONTH'])
-                logger.info("start handling {} for {}".format(code, the_date))
-
-                name = get_future_name(code)
-                security_id = "future_shfe_{}".format(code)
-
-                security_list = get_security_list(security_type='future', exchanges=['shfe'])
-
-                logger.info("start handling {} for {}".format(code, the_date))
-                security_item = {'code': code,
-                                 'name': name,
-                                 'id': security_id,
-                                 'exchange': 'shfe',
-                                 'type': 'future'}
-                # 检查是否需要保存合约meta
-                if security_list is not None and 'code' in security_list.columns:
-                    security_list = security_list.set_index(security_list['code'], drop=False)
-                if code not in security_list.index:
-                    security_list = security_list.append(security_item, ignore_index=True)
-                    security_list.to_csv(get_security_list_path('future', 'shfe'), index=False)
-
-                kdata_path = get_kdata_path(item=security_item, source='exchange')
-                # TODO：这些逻辑应该统一处理
-                kdata_dir = get_kdata_dir(item=security_item)
-                if not os.path.exists(kdata_dir):
-                    os.makedirs(kdata_dir)
-
-                if os.path.exists(kdata_path):
-                    saved_df = pd.read_csv(kdata_path, dtype=str)
-                    saved_df = saved_df.set_index(saved_df['timestamp'], drop=False)
-                else:
-                    saved_df = pd.DataFrame()
-
-                if saved_df.empty or the_date not in saved_df.index:
-                    low_price = the_data['LOWESTPRICE']
-                    if not low_price:
-                        low_price = 0
-                    open_price = the_data['OPENPRICE']
-                    if not open_price:
-                        open_price = 0
-                    close_price = the_data['CLOSEPRICE']
-                    if not close_price:
-                        close_price = 0
-                    high_price = the_data['HIGHESTPRICE']
-                    if not high_price:
-                        high_price = 0
-                    volume = the_data['VOLUME']
-                    if not volume:
-                        volume = 0
-
-                    if type(the_data['ZD1_CHG']) == str:
-                        change = 0
-                    else:
-                        change = the_data['ZD1_CHG']
-
-                    if type(the_data['ZD2_CHG']) == str:
-                        change1 = 0
-                    else:
-                        change1 = the_data['ZD2_CHG']
-
-                    pre_close = close_price - change
-                    pre_settlement = the_data['PRESETTLEMENTPRICE']
-
-                    # 首日交易
-                    if pre_close != 0:
-                        change_pct = change / pre_close
-                    else:
-                        change_pct = 0
-                    if pre_settlement != 0:
-                        change_pct1 = change1 / pre_settlement
-                    else:
-                        change_pct1 = 0
-
-                    the_json = {
-                        "timestamp": to_time_str(the_date),
-                        "code": code,
-                        "name": name,
-                        "low": low_price,
-                        "open": open_price,
-                        "close": close_price,
-                        "high": high_price,
-                        "volume": volume,
-                        # 成交额为估算
-                        "turnover": (low_price + open_price + close_price + high_price / 4) * volume,
-                        "securityId": security_id,
-                        "preClose": pre_close,
-                        "change": change,
-                        "changePct": change_pct,
-                        "openInterest": the_data['OPENINTEREST'],
-                        "settlement": the_data['SETTLEMENTPRICE'],
-                        "preSettlement": the_data['PRESETTLEMENTPRICE'],
-                        "change1": change1,
-                        "changePct1": change_pct1
-                    }
-                    saved_df = saved_df.append(the_json, ignore_index=True)
-                    saved_df = saved_df.loc[:, KDATA_COLUMN_FUTURE]
-                    saved_df = saved_df.drop_duplicates(subset='timestamp', keep='last')
-                    saved_df = saved_df.set_index(saved_df['timestamp'], drop=False)
-                    saved_df.index = pd.to_datetime(saved_df.index)
-                    saved_df = saved_df.sort_index()
-                    saved_df.to_csv(kdata_path, index=False)
-
-                    logger.info("end handling {} for {}".format(code, the_date))
-
-                    if the_date not in the_parsed:
-                        the_parsed.append(the_date)
-        if the_parsed:
-            result_list = drop_duplicate(the_parsed)
-            result_list = sorted(result_list)
-
-            with open(the_parsed_path, 'w') as outfile:
-                json.dump(result_list, outfile)
-        logger.info("end handling {}".format(the_path))
+    df, the_loaded = _read_shfe_day_data(cache_dir, the_dates)
+    if not df.empty:
+        df = _to_shfe_day_kdata(df)
+
+    new_items = []
+    if not df.empty:
+        security_list = get_security_list(security_type='future', exchanges=['shfe'])
+
+        for code, the_df in df.groupby('code', sort=True):
+            security_item = {'code': code,
+                             'name': the_df['name'].iat[0],
+                             'id': the_df['securityId'].iat[0],
+                             'exchange': 'shfe',
+                             'type': 'future'}
+            if security_list.empty or code not in security_list.index:
+                new_items.append(security_item)
+
+            # 重复的日期追加后会覆盖旧的,不用读出整个文件检查
+            kdata_df_append(the_df, get_kdata_path(item=security_item, source='exchange'))
+
+        # 新的合约一次保存
+        if new_items:
+            security_list = security_list.append(new_items, ignore_index=True)
+            the_path = get_security_list_path('future', 'shfe')
+            mkdir_for_path(the_path)
+            security_list.to_csv(the_path, index=False)
+
+    if the_loaded:
+        result_list = drop_duplicate(the_parsed + the_loaded)
+        result_list = sorted(result_list)
+
+        with open(the_parsed_path, 'w') as outfile:
+            json.dump(result_list, outfile)
+
+    logger.info("end handling {} dates in {},{} contracts,{} new".format(len(the_loaded), cache_dir,
+                                                                        df['code'].nunique() if not df.empty else 0,
+                                                                        len(new_items)))
 
 
 def parse_shfe_data(force_parse=False):
     the_dir = get_exchange_cache_dir(security_type='future', exchange='shfe')
+    if not os.path.exists(the_dir):
+        logger.info("no cached history data in {}".format(the_dir))
+        return
 
     need_parse_files = []
 
@@ -569,7 +833,7 @@ def parse_shfe_data(force_parse=False):
                 security_list = security_list.sort_index()
                 security_list.to_csv(get_security_list_path('future', 'shfe'), index=False)
 
-            the_df = df.loc[the_contract,]
+            the_df = df.loc[[the_contract], :].copy()
             the_df['code'] = the_contract
             the_df['name'] = get_future_name(the_contract)
             the_df['securityId'] = 'future_{}_{}'.format('shfe', the_contract)
@@ -582,16 +846,8 @@ def parse_shfe_data(force_parse=False):
             if not os.path.exists(kdata_dir):
                 os.makedirs(kdata_dir)
 
-            if os.path.exists(kdata_path):
-                saved_df = pd.read_csv(kdata_path, dtype=str)
-            else:
-                saved_df = pd.DataFrame()
-
-            saved_df = saved_df.append(the_df, ignore_index=True)
-            saved_df = saved_df.loc[:, KDATA_FUTURE_COL]
-
-            if not saved_df.empty:
-                kdata_df_save(saved_df, kdata_path)
+            the_df = the_df.reindex(columns=KDATA_FUTURE_COL)
+            kdata_df_append(the_df, kdata_path)
 
             logger.info("end handling {} in {}".format(the_contract, the_file))
 
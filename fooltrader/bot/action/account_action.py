@@ -3,10 +3,13 @@
 import logging
 import math
 
-from fooltrader.api.esapi import esapi
-from fooltrader.domain.business.es_account import Account, Position
-from fooltrader.utils.es_utils import es_get_latest_record, es_delete, es_index_mapping
-from fooltrader.utils.utils import fill_doc_type
+import numpy as np
+import pandas as pd
+
+from fooltrader.api.technical import get_kdata, to_security_item
+from fooltrader.domain.business.es_account import Account
+from fooltrader.settings import ACCOUNT_SNAPSHOT_INTERVAL, ACCOUNT_SNAPSHOT_BATCH_SIZE
+from fooltrader.utils.es_utils import es_get_latest_record, es_delete, es_index_mapping, es_bulk_index
 
 ORDER_TYPE_LONG = 0
 ORDER_TYPE_SHORT = 1
@@ -14,14 +17,193 @@ ORDER_TYPE_CLOSE_LONG = 2
 ORDER_TYPE_CLOSE_SHORT = 3
 
 
+# 数组里存储的仓位字段
+POSITION_FIELDS = ('longAmount', 'availableLong', 'averageLongPrice', 'shortAmount', 'availableShort',
+                   'averageShortPrice', 'value', 'tradingT')
+# 数量类的字段,存es时为整数
+POSITION_INT_FIELDS = ('longAmount', 'availableLong', 'shortAmount', 'availableShort', 'tradingT')
+# 没有仓位时的字段值,其他字段为0
+EMPTY_POSITION = {'tradingT': 1}
+
+
+class PositionLedger(object):
+    """
+    the positions stored in arrays,one slot for every security,so the closing calculation is vectorized.
+
+    Parameters
+    ----------
+    capacity : int
+        the initial slot count,the arrays grow when needed
+
+    """
+
+    def __init__(self, capacity=16):
+        self.security_ids = []
+        self.slots = {}
+        self.arrays = {field: np.zeros(capacity) for field in POSITION_FIELDS}
+
+    def __len__(self):
+        return len(self.security_ids)
+
+    def get_slot(self, security_id, trading_t=EMPTY_POSITION['tradingT']):
+        slot = self.slots.get(security_id)
+        if slot is None:
+            slot = len(self.security_ids)
+            capacity = len(self.arrays['value'])
+            if slot >= capacity:
+                for field in POSITION_FIELDS:
+                    self.arrays[field] = np.concatenate([self.arrays[field], np.zeros(capacity)])
+            self.security_ids.append(security_id)
+            self.slots[security_id] = slot
+            self.arrays['tradingT'][slot] = trading_t
+        return slot
+
+    def get(self, field):
+        return self.arrays[field][:len(self.security_ids)]
+
+    def to_dicts(self):
+        the_dicts = []
+        for slot, security_id in enumerate(self.security_ids):
+            the_dict = {'securityId': security_id, 'profit': 0}
+            for field in POSITION_FIELDS:
+                value = self.arrays[field][slot].item()
+                the_dict[field] = int(value) if field in POSITION_INT_FIELDS else value
+            the_dicts.append(the_dict)
+        return the_dicts
+
+
+class PositionView(object):
+    """
+    the position of one security,reading and writing the fields of the ledger directly.
+
+    the slot is allocated on the first writing,so querying a security without position doesn't add it
+    to the ledger.
+    """
+
+    def __init__(self, ledger, security_id):
+        object.__setattr__(self, '_ledger', ledger)
+        object.__setattr__(self, '_security_id', security_id)
+        object.__setattr__(self, '_slot', ledger.slots.get(security_id))
+
+    @property
+    def securityId(self):
+        return self._security_id
+
+    def _get_slot(self, allocate=False):
+        if self._slot is None:
+            # 可能已经被其他view分配了
+            if allocate:
+                slot = self._ledger.get_slot(self._security_id)
+            else:
+                slot = self._ledger.slots.get(self._security_id)
+            object.__setattr__(self, '_slot', slot)
+        return self._slot
+
+    def __getattr__(self, name):
+        if name in POSITION_FIELDS:
+            slot = self._get_slot()
+            if slot is None:
+                return EMPTY_POSITION.get(name, 0)
+            return self._ledger.arrays[name][slot].item()
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name in POSITION_FIELDS:
+            self._ledger.arrays[name][self._get_slot(allocate=True)] = value
+        else:
+            object.__setattr__(self, name, value)
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+def _get_close_col(security_item, fuquan):
+    if security_item['type'] == 'stock' and fuquan in ('qfq', 'hfq'):
+        return fuquan + 'Close'
+    return 'close'
+
+
+def load_closing_prices(security_ids, start_date=None, end_date=None, fuquan='hfq'):
+    """
+    load the closing prices of the securities as a matrix.
+
+    Parameters
+    ----------
+    security_ids : list
+        the security ids
+    start_date : TimeStamp str or TimeStamp
+        start date
+    end_date : TimeStamp str or TimeStamp
+        end date
+    fuquan : str
+        {"qfq","hfq","bfq"},default:"hfq",just for stock
+
+    Returns
+    -------
+    DataFrame
+        indexed by timestamp,one column for every security
+
+    """
+    closes = {}
+    for security_id in security_ids:
+        security_item = to_security_item(security_id)
+        df = get_kdata(security_item, start_date=start_date, end_date=end_date, fuquan=fuquan, copy=False)
+        col = _get_close_col(security_item, fuquan)
+        if df is not None and not df.empty and col in df.columns:
+            closes[security_id] = pd.to_numeric(df[col], errors='coerce')
+    if not closes:
+        return pd.DataFrame(columns=security_ids, dtype=float)
+    return pd.DataFrame(closes).reindex(columns=security_ids).sort_index()
+
+
 class AccountService(object):
+    """
+    the account and positions are kept in memory,the snapshots are written to es in bulk.
+
+    Parameters
+    ----------
+    bot_name : str
+        the bot name
+    timestamp : TimeStamp
+        the start time
+    base_capital : float
+        the initial cash
+    buy_cost : float
+        the buy cost
+    sell_cost : float
+        the sell cost
+    slippage : float
+        the slippage
+    stock_fuquan : str
+        {"qfq","hfq","bfq"},default:"hfq",the fuquan of the stock closing prices
+    security_ids : list
+        the securities to preload the closing prices,others are loaded when first used
+    start_date : TimeStamp str or TimeStamp
+        start date of the closing prices
+    end_date : TimeStamp str or TimeStamp
+        end date of the closing prices
+    snapshot_interval : int
+        snapshot the account every snapshot_interval trades,0 for just at closing and flush,
+        default:settings.ACCOUNT_SNAPSHOT_INTERVAL
+    snapshot_batch_size : int
+        write the snapshots to es when the count reaches it,default:settings.ACCOUNT_SNAPSHOT_BATCH_SIZE
+    persist : bool
+        whether write the account to es,default:True
+
+    """
 
     def __init__(self, bot_name, timestamp,
                  base_capital=1000000,
                  buy_cost=0.001,
                  sell_cost=0.001,
                  slippage=0.001,
-                 stock_fuquan='hfq'):
+                 stock_fuquan='hfq',
+                 security_ids=None,
+                 start_date=None,
+                 end_date=None,
+                 snapshot_interval=None,
+                 snapshot_batch_size=None,
+                 persist=True):
         self.logger = logging.getLogger(__name__)
 
         self.base_capital = base_capital
@@ -31,13 +213,28 @@ class AccountService(object):
         self.stock_fuquan = stock_fuquan
         self.bot_name = bot_name
 
-        account = es_get_latest_record(index='account', query={"term": {"botName": bot_name}})
+        if snapshot_interval is None:
+            snapshot_interval = ACCOUNT_SNAPSHOT_INTERVAL
+        if snapshot_batch_size is None:
+            snapshot_batch_size = ACCOUNT_SNAPSHOT_BATCH_SIZE
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_batch_size = snapshot_batch_size
+        self.persist = persist
+
+        if self.persist:
+            account = es_get_latest_record(index='account', query={"term": {"botName": bot_name}})
 
-        if account:
-            self.logger.warning("bot:{} has run before,old result would be deleted".format(bot_name))
-            es_delete(index='account', query={"term": {"botName": bot_name}})
+            if account:
+                self.logger.warning("bot:{} has run before,old result would be deleted".format(bot_name))
+                es_delete(index='account', query={"term": {"botName": bot_name}})
 
-        es_index_mapping('account', Account)
+            es_index_mapping('account', Account)
+
+        self.ledger = PositionLedger()
+        self.trade_count = 0
+        self.snapshots = []
+        # 最近一次收盘计算的时间,之后有交易则清空
+        self.closing_time = None
 
         self.account = Account()
         self.account.botName = bot_name
@@ -45,54 +242,101 @@ class AccountService(object):
         self.account.positions = []
         self.account.value = self.base_capital
         self.account.timestamp = timestamp
-        self.account.save()
+        self.account.closing = False
 
-    def get_account(self, refresh=True):
-        if refresh:
-            account_json = es_get_latest_record(index='account', query={"term": {"botName": self.bot_name}})
-            self.account = Account()
-            fill_doc_type(self.account, account_json)
+        # 收盘价矩阵,按日期查找
+        self.price_start_date = start_date if start_date else timestamp
+        self.price_end_date = end_date
+        self.prices = load_closing_prices(security_ids, self.price_start_date, self.price_end_date,
+                                          stock_fuquan) if security_ids else pd.DataFrame(dtype=float)
 
+        self.snapshot()
+
+    def get_account(self, refresh=True):
+        # 内存里的账户就是最新的
+        self.account.positions = self.ledger.to_dicts()
         return self.account
 
     def get_current_position(self, security_id):
-        account = self.get_account()
-        for position in account.positions:
-            if position.securityId == security_id:
-                return position
-        return Position(security_id=security_id)
+        return PositionView(self.ledger, security_id)
 
-    # 计算收盘账户
-    def calculate_closing_account(self, the_date):
-        account = self.get_account()
-        for position in account.positions:
-            kdata = esapi.es_get_kdata(security_item=position['securityId'], the_date=the_date)
-            closing_price = kdata['hfqClose']
-            position.availableLong = position.longAmount
-            position.availableShort = position.shortAmount
+    def _get_closing_prices(self, the_date):
+        missing = [security_id for security_id in self.ledger.security_ids if security_id not in self.prices.columns]
+        if missing:
+            df = load_closing_prices(missing, self.price_start_date, self.price_end_date, self.stock_fuquan)
+            self.prices = pd.concat([self.prices, df], axis=1).sort_index()
 
-            # 做多导致的市值变化体现了value里
-            # 做空导致的市值变化体现在value和cash里
-            position.value = position.longAmount * closing_price + position.shortAmount * closing_price
+        prices = self.prices.reindex(columns=self.ledger.security_ids)
+        # 停牌等没有k线的日子用之前的收盘价
+        index = prices.index.searchsorted(pd.Timestamp(the_date), side='right') - 1
+        if index < 0:
+            return np.full(len(self.ledger), np.nan)
+        return prices.iloc[:index + 1].ffill().iloc[-1].values.astype(float)
 
-            account.cash += 2 * (position.shortAmount * (position.averageShortPrice - closing_price))
-
-            position.averageShortPrice = closing_price
-            position.averageLongPrice = closing_price
+    # 计算收盘账户
+    def calculate_closing_account(self, the_date):
+        long_amount = self.ledger.get('longAmount')
+        short_amount = self.ledger.get('shortAmount')
+        self.ledger.get('availableLong')[:] = long_amount
+        self.ledger.get('availableShort')[:] = short_amount
+
+        closing_price = self._get_closing_prices(the_date)
+        has_price = ~np.isnan(closing_price)
+        if not has_price.all():
+            self.logger.warning("missing closing price for {} at {}".format(
+                [security_id for security_id, valid in zip(self.ledger.security_ids, has_price) if not valid],
+                the_date))
+
+        # 做多导致的市值变化体现了value里
+        # 做空导致的市值变化体现在value和cash里
+        value = self.ledger.get('value')
+        value[has_price] = (long_amount[has_price] + short_amount[has_price]) * closing_price[has_price]
+
+        average_short_price = self.ledger.get('averageShortPrice')
+        self.account.cash += 2 * float(np.sum(
+            short_amount[has_price] * (average_short_price[has_price] - closing_price[has_price])))
+
+        average_short_price[has_price] = closing_price[has_price]
+        self.ledger.get('averageLongPrice')[has_price] = closing_price[has_price]
+
+        self.account.value = float(np.sum(value))
+        self.account.allValue = self.account.value + self.account.cash
+        self.account.timestamp = the_date
+        self.closing_time = the_date
+        self.snapshot(closing=True)
+
+    def snapshot(self, closing=False):
+        self.account.closing = closing
+        # numpy和pandas的标量和[]比较会得到数组,es序列化前转为python类型
+        for field in ('cash', 'value', 'allValue'):
+            if getattr(self.account, field, None) is not None:
+                setattr(self.account, field, float(getattr(self.account, field)))
+        self.account.timestamp = pd.Timestamp(self.account.timestamp).to_pydatetime()
+        self.snapshots.append(self.get_account().to_dict())
+
+        if len(self.snapshots) >= self.snapshot_batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        write the pending snapshots to es.
+        """
+        if self.persist and self.snapshots:
+            es_bulk_index({'_index': 'account', '_type': 'doc', '_source': the_dict} for the_dict in self.snapshots)
+        self.snapshots = []
 
     # 两种情况下会被调用：
     # 1)操作导致账户更新
     # 2)当日收盘
     def save_account(self):
-        self.account.save()
+        self.snapshot(closing=self.account.closing)
 
     def update_account(self, security_id, new_position):
-        # 先去掉之前的position
-        positions = [position for position in self.account.positions if position.securityId != security_id]
-        # 更新为新的position
-        positions.append(new_position)
-        self.account.positions = positions
-        self.account.save()
+        # 仓位直接在ledger里修改,这里只需按间隔记录快照
+        self.trade_count += 1
+        self.closing_time = None
+        if self.snapshot_interval and self.trade_count % self.snapshot_interval == 0:
+            self.snapshot()
 
     def update_position(self, current_position, order_amount, current_price, order_type):
         if order_type == ORDER_TYPE_LONG:
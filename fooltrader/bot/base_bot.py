@@ -1,21 +1,19 @@
 # -*- coding: utf-8 -*-
 
-import json
 import logging
 import threading
 import time
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 import pandas as pd
 from kafka import KafkaConsumer
-from kafka import TopicPartition
 
 from fooltrader.api.technical import to_security_item
 from fooltrader.bot.action.account_action import AccountService
+from fooltrader.bot.quote_source import KafkaSource, get_quote_source
 from fooltrader.contract.kafka_contract import get_kafka_tick_topic, get_kafka_kdata_topic
-from fooltrader.settings import KAFKA_HOST, TIME_FORMAT_DAY
+from fooltrader.settings import KAFKA_HOST
 from fooltrader.utils.utils import is_same_date
-from fooltrader.utils.utils import to_timestamp
 
 
 class BaseBot(object):
@@ -33,16 +31,25 @@ class BaseBot(object):
     def on_timer(self, event_item):
         self.logger.info("got event:{}".format(event_item))
 
-    def __init__(self, security_item=None, level=None):
+    def __init__(self, security_item=None, level=None, params=None):
         self.logger = logging.getLogger(__name__)
 
         self.on_init()
 
+        # 参数寻优时传入的参数,覆盖on_init里的设置
+        if params:
+            for key, value in params.items():
+                setattr(self, key, value)
+
         self.threads = []
 
         if not hasattr(self, 'living_mode'):
             self.living_mode = False
 
+        # 行情来源,{'file','kafka'},回测默认直接读本地的k线和tick
+        if not hasattr(self, 'quote_source'):
+            self.quote_source = 'kafka' if self.living_mode else 'file'
+
         if not hasattr(self, 'start_date'):
             self.topics = []
 
@@ -70,8 +77,13 @@ class BaseBot(object):
             if not hasattr(self, 'slippage'):
                 self.slippage = 0.001
 
-            if not hasattr(self, 'stock_fuquan'):
-                self.stock_fuquan = 'hfq'
+            # 是否把账户写到es,参数寻优时不需要
+            if not hasattr(self, 'persist_account'):
+                self.persist_account = True
+
+        # 股票行情的复权方式
+        if not hasattr(self, 'stock_fuquan'):
+            self.stock_fuquan = 'hfq'
 
         self.bot_name = type(self).__name__.lower()
 
@@ -103,6 +115,22 @@ class BaseBot(object):
                 self.quote_topic = get_kafka_tick_topic(security_id=self.security_item['id'])
             else:
                 self.logger.exception("wrong level:{}".format(self.level))
+        elif hasattr(self, 'security_items'):
+            # 监听一组标的,各自的行情按时间合并后回调on_event
+            if not self.security_items:
+                raise Exception("you must set the security items!")
+
+            self.security_items = [to_security_item(the_item) for the_item in self.security_items]
+
+            if None in self.security_items:
+                raise Exception("invalid security items:{}".format(self.security_items))
+
+            if not hasattr(self, 'level') or not self.level:
+                self.level = 'day'
+
+            self.logger.info("bot:{} listen to {} security items,level:{}".format(self.bot_name,
+                                                                                len(self.security_items),
+                                                                                self.level))
         else:
             # 默认日级别timer
             if not hasattr(self, 'time_step'):
@@ -124,10 +152,19 @@ class BaseBot(object):
 
         # 是否需要账户，回测需要，只是监听和告警不需要
         if self.need_account:
+            # 回测时预先加载监听标的的收盘价
+            security_ids = None
+            if hasattr(self, 'security_item'):
+                security_ids = [self.security_item['id']]
+            elif hasattr(self, 'security_items'):
+                security_ids = [the_item['id'] for the_item in self.security_items]
+
             self.account_service = AccountService(bot_name=self.bot_name, timestamp=self.current_time,
                                                   base_capital=self.base_capital, buy_cost=self.buy_cost,
                                                   sell_cost=self.sell_cost, slippage=self.slippage,
-                                                  stock_fuquan=self.stock_fuquan)
+                                                  stock_fuquan=self.stock_fuquan, security_ids=security_ids,
+                                                  start_date=self.start_date, end_date=self.end_date,
+                                                  persist=self.persist_account)
 
     def __repr__(self):
         return '{}({})'.format(
@@ -144,72 +181,40 @@ class BaseBot(object):
 
                 self.current_time += self.time_step
 
-        consumer = KafkaConsumer(topic,
-                                 # client_id='fooltrader',
-                                 # group_id=self.bot_name,
-                                 value_deserializer=lambda m: json.loads(m.decode('utf8')),
-                                 bootstrap_servers=[KAFKA_HOST])
-        topic_partition = TopicPartition(topic=topic, partition=0)
-        start_timestamp = int(self.start_date.timestamp())
-
-        end_offset = consumer.end_offsets([topic_partition])[topic_partition]
-        if end_offset == 0:
-            self.logger.warning("topic:{} end offset:{}".format(topic, end_offset))
-            # 等有数据才能做进一步的判断
-            for message in consumer:
-                self.logger.info("first message:{} to topic:{}".format(message, topic))
+        self.consume_source_with_func(KafkaSource(topic, start_date=self.start_date, end_date=self.end_date), func)
+
+    def get_quote_source(self):
+        if hasattr(self, 'security_item'):
+            security_item = self.security_item
+        else:
+            security_item = self.security_items
+        return get_quote_source(security_item, level=self.level, start_date=self.start_date,
+                                end_date=self.end_date, source=self.quote_source, fuquan=self.stock_fuquan)
+
+    def consume_source_with_func(self, source, func):
+        for timestamp, event_item in source:
+            # 设定了结束日期的话,时间到了就结束
+            if self.end_date and timestamp > self.end_date:
                 break
-            consumer.poll(5, 1)
-            consumer.seek(topic_partition, 0)
-
-        # 找到以start_timestamp为起点的offset
-        partition_map_offset_and_timestamp = consumer.offsets_for_times({topic_partition: start_timestamp})
-
-        if partition_map_offset_and_timestamp:
-            offset_and_timestamp = partition_map_offset_and_timestamp[topic_partition]
-
-            if offset_and_timestamp:
-                # partition  assigned after poll, and we could seek
-                consumer.poll(5, 1)
-                # move to the offset
-                consumer.seek(topic_partition, offset_and_timestamp.offset)
-                # 目前的最大offset
-                end_offset = consumer.end_offsets([topic_partition])[topic_partition]
-                for message in consumer:
-                    if 'timestamp' in message.value:
-                        message_time = to_timestamp(message.value['timestamp'])
-                    else:
-                        message_time = to_timestamp(message.timestamp)
-
-                    # 设定了结束日期的话,时间到了或者kafka没数据了就结束
-                    if self.end_date and (message_time > self.end_date or message.offset + 1 == end_offset):
-                        consumer.close()
-                        break
-
-                    self.current_time = message_time
-
-                    # 收市后计算
-                    if False:
-                        self.account_service.calculate_closing_account(self.current_time)
-
-                    # self.on_event(message.value)
-                    getattr(self, func)(message.value)
 
-            else:
-                consumer.poll(5, 1)
-                consumer.seek(topic_partition, consumer.end_offsets([topic_partition])[topic_partition] - 1)
-                message = consumer.poll(5000, 1)
-                kafka_end_date = datetime.fromtimestamp(message[topic_partition][0].timestamp).strftime(
-                    TIME_FORMAT_DAY)
-                self.logger.warning("start:{} is after the last record:{}".format(self.start_date, kafka_end_date))
+            self.current_time = timestamp
+
+            # 收市后计算
+            if False:
+                self.account_service.calculate_closing_account(self.current_time)
+
+            getattr(self, func)(event_item)
 
     def run(self):
         self.logger.info("start bot:{}".format(self))
 
         funcs = set(dir(self)) & self.func_map_topic.keys()
 
-        consumer = KafkaConsumer(bootstrap_servers=[KAFKA_HOST])
-        current_topics = consumer.topics()
+        # 只从文件回放行情的话,不需要kafka
+        current_topics = set()
+        if funcs:
+            consumer = KafkaConsumer(bootstrap_servers=[KAFKA_HOST])
+            current_topics = consumer.topics()
 
         for func in funcs:
             topic = self.func_map_topic.get(func)
@@ -223,6 +228,12 @@ class BaseBot(object):
         for the_thread in self.threads:
             the_thread.start()
 
-        self.consume_topic_with_func(self.quote_topic, 'on_event')
+        if hasattr(self, 'security_item') or hasattr(self, 'security_items'):
+            self.consume_source_with_func(self.get_quote_source(), 'on_event')
+        else:
+            self.consume_topic_with_func(None, 'on_timer')
+
+        if self.need_account:
+            self.account_service.flush()
 
         self.logger.info("finish bot:{}".format(self))
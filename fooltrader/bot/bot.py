@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 import datetime
-import json
 import logging
 import threading
 
@@ -12,7 +11,7 @@ from fooltrader.bot.action.account_action import AccountService
 from fooltrader.bot.action.msg_action import WeixinAction, EmailAction
 from fooltrader.contract.kafka_contract import get_kafka_tick_topic
 from fooltrader.settings import KAFKA_HOST
-from fooltrader.utils.kafka_utils import get_latest_timestamp_order_from_topic
+from fooltrader.utils.kafka_utils import get_latest_timestamp_order_from_topic, decode_message
 from fooltrader.utils.utils import to_timestamp
 
 
@@ -61,7 +60,7 @@ class EventBot(BaseBot):
         consumer = KafkaConsumer(topic,
                                  client_id='fooltrader',
                                  group_id=self.bot_name,
-                                 value_deserializer=lambda m: json.loads(m.decode('utf8')),
+                                 value_deserializer=decode_message,
                                  bootstrap_servers=[KAFKA_HOST])
         topic_partition = TopicPartition(topic=topic, partition=0)
 
@@ -145,7 +144,8 @@ class TradingEventBot(EventBot):
             timestamp = datetime.datetime.now()
         self.account_service = AccountService(bot_name=self.bot_name, timestamp=timestamp,
                                               base_capital=self.base_capital, buy_cost=self.buy_cost,
-                                              sell_cost=self.sell_cost, slippage=self.slippage)
+                                              sell_cost=self.sell_cost, slippage=self.slippage,
+                                              snapshot_interval=1, snapshot_batch_size=1)
 
         self.after_init()
 
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+
+import heapq
+import itertools
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime
+
+import pandas as pd
+from kafka import KafkaConsumer
+from kafka import TopicPartition
+
+from fooltrader.api.technical import get_kdata, get_ticks, get_available_tick_dates, to_security_item
+from fooltrader.contract.kafka_contract import get_kafka_tick_topic, get_kafka_kdata_topic
+from fooltrader.settings import KAFKA_HOST, TIME_FORMAT_DAY
+from fooltrader.utils.kafka_utils import decode_message
+from fooltrader.utils.utils import to_timestamp
+
+logger = logging.getLogger(__name__)
+
+
+def _df_to_events(df, chunk_size=1000):
+    # 分块转换,避免一次生成整个frame的dict
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        # 和kafka里的json消息一样,缺失值为None
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        yield from zip(chunk.index, chunk.to_dict('records'))
+
+
+class QuoteSource(ABC):
+    """
+    the quote events for the bots in timestamp order,iterate it to get (timestamp,event) pairs.
+
+    the source is bounded if iterating it never waits for the events in the future,
+    the unbounded sources(e.g. kafka) are not read ahead when merging.
+
+    Parameters
+    ----------
+    start_date : TimeStamp str or TimeStamp
+        start date
+    end_date : TimeStamp str or TimeStamp
+        end date,None for no limit
+
+    """
+
+    bounded = True
+
+    def __init__(self, start_date=None, end_date=None):
+        self.start_date = to_timestamp(start_date) if start_date else None
+        self.end_date = to_timestamp(end_date) if end_date else None
+
+    @abstractmethod
+    def __iter__(self):
+        pass
+
+
+class KdataSource(QuoteSource):
+    """
+    replay the kdata from the local store.
+
+    Parameters
+    ----------
+    security_item : SecurityItem or str
+        the security item,id or code
+    start_date : TimeStamp str or TimeStamp
+        start date
+    end_date : TimeStamp str or TimeStamp
+        end date
+    fuquan : str
+        {"qfq","hfq","bfq"},default:"hfq",just for stock
+
+    """
+
+    def __init__(self, security_item, start_date=None, end_date=None, fuquan='hfq'):
+        super().__init__(start_date, end_date)
+        self.security_item = to_security_item(security_item)
+        self.fuquan = fuquan if self.security_item['type'] == 'stock' else 'bfq'
+
+    def __iter__(self):
+        df = get_kdata(self.security_item, start_date=self.start_date, end_date=self.end_date, fuquan=self.fuquan,
+                       copy=False)
+        if df is None or df.empty:
+            return iter(())
+        return _df_to_events(df)
+
+
+class TickSource(QuoteSource):
+    """
+    replay the ticks from the local store,one day is loaded at a time.
+
+    Parameters
+    ----------
+    security_item : SecurityItem or str
+        the security item,id or code
+    start_date : TimeStamp str or TimeStamp
+        start date
+    end_date : TimeStamp str or TimeStamp
+        end date
+
+    """
+
+    def __init__(self, security_item, start_date=None, end_date=None):
+        super().__init__(start_date, end_date)
+        self.security_item = to_security_item(security_item)
+
+    def __iter__(self):
+        try:
+            tick_dates = sorted(pd.Timestamp(the_date) for the_date in get_available_tick_dates(self.security_item))
+        except FileNotFoundError:
+            return
+
+        for the_date in tick_dates:
+            if self.start_date and the_date < self.start_date.normalize():
+                continue
+            if self.end_date and the_date > self.end_date:
+                break
+
+            for df in get_ticks(self.security_item, the_date=the_date):
+                if df is None or df.empty:
+                    continue
+                for timestamp, event in _df_to_events(df):
+                    if self.start_date and timestamp < self.start_date:
+                        continue
+                    if self.end_date and timestamp > self.end_date:
+                        return
+                    yield timestamp, event
+
+
+class KafkaSource(QuoteSource):
+    """
+    consume the events from the kafka topic,start from the offset of the start date.
+
+    Parameters
+    ----------
+    topic : str
+        the topic
+    start_date : TimeStamp str or TimeStamp
+        start date
+    end_date : TimeStamp str or TimeStamp
+        end date,the consuming stops at it or the end of the topic,None for consuming forever
+
+    """
+
+    # 消费者会等待新的消息
+    bounded = False
+
+    def __init__(self, topic, start_date=None, end_date=None):
+        super().__init__(start_date, end_date)
+        self.topic = topic
+
+    def __iter__(self):
+        consumer = KafkaConsumer(self.topic,
+                                 # client_id='fooltrader',
+                                 # group_id=self.bot_name,
+                                 value_deserializer=decode_message,
+                                 bootstrap_servers=[KAFKA_HOST])
+        topic_partition = TopicPartition(topic=self.topic, partition=0)
+        start_timestamp = int(self.start_date.timestamp()) if self.start_date else 0
+
+        end_offset = consumer.end_offsets([topic_partition])[topic_partition]
+        if end_offset == 0:
+            logger.warning("topic:{} end offset:{}".format(self.topic, end_offset))
+            # 等有数据才能做进一步的判断
+            for message in consumer:
+                logger.info("first message:{} to topic:{}".format(message, self.topic))
+                break
+            consumer.poll(5, 1)
+            consumer.seek(topic_partition, 0)
+
+        # 找到以start_timestamp为起点的offset
+        partition_map_offset_and_timestamp = consumer.offsets_for_times({topic_partition: start_timestamp})
+
+        if partition_map_offset_and_timestamp and partition_map_offset_and_timestamp[topic_partition]:
+            offset_and_timestamp = partition_map_offset_and_timestamp[topic_partition]
+            # partition  assigned after poll, and we could seek
+            consumer.poll(5, 1)
+            # move to the offset
+            consumer.seek(topic_partition, offset_and_timestamp.offset)
+            # 目前的最大offset
+            end_offset = consumer.end_offsets([topic_partition])[topic_partition]
+            for message in consumer:
+                if 'timestamp' in message.value:
+                    message_time = to_timestamp(message.value['timestamp'])
+                else:
+                    message_time = to_timestamp(message.timestamp)
+
+                # 设定了结束日期的话,时间到了或者kafka没数据了就结束
+                if self.end_date and message_time > self.end_date:
+                    break
+
+                yield message_time, message.value
+
+                if self.end_date and message.offset + 1 == end_offset:
+                    break
+        else:
+            consumer.poll(5, 1)
+            consumer.seek(topic_partition, consumer.end_offsets([topic_partition])[topic_partition] - 1)
+            message = consumer.poll(5000, 1)
+            kafka_end_date = datetime.fromtimestamp(message[topic_partition][0].timestamp).strftime(
+                TIME_FORMAT_DAY)
+            logger.warning("start:{} is after the last record:{}".format(self.start_date, kafka_end_date))
+
+        consumer.close()
+
+
+class MergedSource(QuoteSource):
+    """
+    merge the events of many sources in timestamp order by a heap,every bounded source is read ahead at most
+    buffer_size events,so the memory is bounded by the source count.
+
+    the unbounded sources are read one event at a time,so the merging never waits for buffer_size events
+    of a live source.the events with the same timestamp are delivered in the order of the sources.
+
+    Parameters
+    ----------
+    sources : list of QuoteSource
+        the sources,e.g. one for every security
+    buffer_size : int
+        the read-ahead size of every source,default:1000
+
+    """
+
+    def __init__(self, sources, buffer_size=1000):
+        super().__init__()
+        self.sources = sources
+        self.buffer_size = buffer_size
+        self.bounded = all(source.bounded for source in sources)
+
+    def __iter__(self):
+        streams = [iter(source) for source in self.sources]
+        buffers = [deque() for _ in streams]
+        # 实时的数据源每次只取一个,堆里只有它的头部
+        read_sizes = [self.buffer_size if source.bounded else 1 for source in self.sources]
+
+        def fill(i):
+            buffers[i].extend(itertools.islice(streams[i], read_sizes[i]))
+            return len(buffers[i]) > 0
+
+        heap = [(buffers[i][0][0], i) for i in range(len(streams)) if fill(i)]
+        heapq.heapify(heap)
+
+        while heap:
+            i = heap[0][1]
+            yield buffers[i].popleft()
+
+            if buffers[i] or fill(i):
+                heapq.heapreplace(heap, (buffers[i][0][0], i))
+            else:
+                heapq.heappop(heap)
+
+
+def get_quote_source(security_item, level='day', start_date=None, end_date=None, source='file', fuquan='hfq'):
+    """
+    get the quote source for the bot.
+
+    Parameters
+    ----------
+    security_item : SecurityItem or str or list
+        the security item,id or code,the sources of a list are merged by timestamp
+    level : str
+        {'day','tick'},default:'day'
+    start_date : TimeStamp str or TimeStamp
+        start date
+    end_date : TimeStamp str or TimeStamp
+        end date
+    source : str
+        {'file','kafka'},default:'file'
+    fuquan : str
+        {"qfq","hfq","bfq"},default:"hfq",for the kdata from file
+
+    Returns
+    -------
+    QuoteSource
+
+    """
+    if isinstance(security_item, (list, tuple)):
+        return MergedSource([get_quote_source(the_item, level=level, start_date=start_date, end_date=end_date,
+                                              source=source, fuquan=fuquan) for the_item in security_item])
+
+    security_item = to_security_item(security_item)
+
+    if source == 'kafka':
+        if level == 'tick':
+            topic = get_kafka_tick_topic(security_id=security_item['id'])
+        else:
+            topic = get_kafka_kdata_topic(security_id=security_item['id'], level=level)
+        return KafkaSource(topic, start_date=start_date, end_date=end_date)
+
+    if level == 'tick':
+        return TickSource(security_item, start_date=start_date, end_date=end_date)
+    if level == 'day':
+        return KdataSource(security_item, start_date=start_date, end_date=end_date, fuquan=fuquan)
+
+    raise ValueError("unsupported level:{} for source:{}".format(level, source))
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from fooltrader.api.technical import get_kdata, to_security_item
+
+logger = logging.getLogger(__name__)
+
+
+def expand_param_grid(param_grid):
+    """
+    expand the parameter grid to the parameter combinations.
+
+    Parameters
+    ----------
+    param_grid : dict
+        parameter name -> the values,e.g. {'fast':[5,10],'slow':[20,30]}
+
+    Returns
+    -------
+    list of dict
+
+    """
+    keys = list(param_grid.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*[param_grid[key] for key in keys])]
+
+
+def _get_bot_security_ids(the_bot):
+    if hasattr(the_bot, 'security_item'):
+        return [the_bot.security_item['id']]
+    if hasattr(the_bot, 'security_items'):
+        return [the_item['id'] for the_item in the_bot.security_items]
+    return []
+
+
+def _preload_kdata(security_ids, fuquan):
+    # 读到get_kdata的缓存里,fork出的进程直接共享这些内存,回放时用copy=False读取,不会复制
+    for security_id in security_ids:
+        security_item = to_security_item(security_id)
+        get_kdata(security_item, fuquan=fuquan if security_item['type'] == 'stock' else 'bfq', copy=False)
+
+
+def _init_worker(security_ids, fuquan):
+    # spawn方式启动的进程需要自己加载一次,fork的话已在缓存里
+    _preload_kdata(security_ids, fuquan)
+
+
+def _run_bot(bot_class, params):
+    result = dict(params)
+    try:
+        # 寻优时不写es,只从文件回放行情
+        the_bot = bot_class(params=dict(params, persist_account=False, quote_source='file'))
+        the_bot.run()
+
+        result['success'] = True
+        result['reason'] = None
+        if the_bot.need_account:
+            account_service = the_bot.account_service
+            # bot已经在最后时刻收盘过的不再重复计算
+            if account_service.closing_time is None or \
+                    pd.Timestamp(account_service.closing_time) != pd.Timestamp(the_bot.current_time):
+                account_service.calculate_closing_account(the_bot.current_time)
+            account = account_service.get_account()
+            result['cash'] = account.cash
+            result['value'] = account.value
+            result['allValue'] = account.allValue
+            result['profitPct'] = account.allValue / the_bot.base_capital - 1
+            result['tradeCount'] = account_service.trade_count
+    except Exception as e:
+        logger.exception("run {} with {} failed".format(bot_class.__name__, params))
+        result['success'] = False
+        result['reason'] = str(e)
+    return result
+
+
+def run_sweep(bot_class, param_grid, workers=None, fuquan='hfq'):
+    """
+    run the bot with every parameter combination in a process pool,the kdata of the bot's securities is loaded
+    once before forking the workers.
+
+    Parameters
+    ----------
+    bot_class : class
+        the bot class,subclass of fooltrader.bot.base_bot.BaseBot,defined in a module
+    param_grid : dict or list
+        parameter name -> the values,or the list of parameter combinations
+    workers : int
+        the process count,default:the cpu count
+    fuquan : str
+        {"qfq","hfq","bfq"},default:"hfq",the stock kdata to preload
+
+    Returns
+    -------
+    DataFrame
+        one row for every parameter combination with the final account,sorted by profitPct
+
+    """
+    if isinstance(param_grid, dict):
+        param_list = expand_param_grid(param_grid)
+    else:
+        param_list = list(param_grid)
+
+    if not param_list:
+        return pd.DataFrame()
+
+    if not workers:
+        workers = os.cpu_count()
+
+    # 用第一组参数找到需要的证券
+    the_bot = bot_class(params=dict(param_list[0], persist_account=False, quote_source='file'))
+    security_ids = _get_bot_security_ids(the_bot)
+    _preload_kdata(security_ids, fuquan)
+
+    if 'fork' in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context('fork')
+    else:
+        mp_context = None
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(param_list)), mp_context=mp_context,
+                             initializer=_init_worker, initargs=(security_ids, fuquan)) as executor:
+        results = list(executor.map(_run_bot, itertools.repeat(bot_class), param_list))
+
+    df = pd.DataFrame(results)
+    if 'profitPct' in df.columns:
+        df = df.sort_values('profitPct', ascending=False)
+    return df
+
+
+if __name__ == '__main__':
+    import pkgutil
+
+    import fooltrader.botsamples
+
+    for _, modname, is_pkg in pkgutil.iter_modules(fooltrader.botsamples.__path__):
+        if not is_pkg:
+            exec("from fooltrader.botsamples.{} import *".format(modname))
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('bot_name', help='the bot you want to run')
+    parser.add_argument('param_grid', help='the parameter grid in json,e.g. {"fast":[5,10],"slow":[20,30]}')
+    parser.add_argument('-w', '--workers', type=int, help='the process count')
+    parser.add_argument('-o', '--output', help='the csv file to save the results')
+
+    args = parser.parse_args()
+
+    bot_class = eval(''.join([item.title() for item in args.bot_name.split('_')]))
+
+    df = run_sweep(bot_class, json.loads(args.param_grid), workers=args.workers)
+    print(df)
+
+    if args.output:
+        df.to_csv(args.output, index=False)
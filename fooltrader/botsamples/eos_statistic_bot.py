@@ -1,14 +1,13 @@
 # -*- coding: utf-8 -*-
 from datetime import timedelta, datetime
 
-import pandas as pd
-
 from fooltrader.bot.bot import NotifyEventBot
 from fooltrader.contract.es_contract import get_es_kdata_index, get_es_statistic_index
 from fooltrader.domain.data.es_quote import CommonKData, CommonStatistic
 from fooltrader.settings import TIME_FORMAT_MICRO
-from fooltrader.utils.es_utils import es_get_latest_timestamp, es_get_latest_record, es_index_mapping
-from fooltrader.utils.utils import to_timestamp, to_time_str, fill_doc_type, is_same_date, is_same_time
+from fooltrader.utils.es_utils import es_get_latest_timestamp, es_get_latest_record, es_index_mapping, \
+    EsBulkWriter
+from fooltrader.utils.utils import to_timestamp, to_time_str, is_same_date, is_same_time
 
 statistic_index_name = get_es_statistic_index(security_type='cryptocurrency', exchange='contract')
 kdata_index_name = get_es_kdata_index(security_type='cryptocurrency', exchange='contract', level='1min')
@@ -17,6 +16,96 @@ es_index_mapping(statistic_index_name, CommonStatistic)
 es_index_mapping(kdata_index_name, CommonKData)
 
 
+class MinuteAccumulator(object):
+    """
+    the ohlcv and money flow of the ticks in one interval,updated in O(1) for every tick.
+
+    Parameters
+    ----------
+    big_order : float
+        the turnover of the big order
+    middle_order : float
+        the turnover of the middle order
+
+    """
+
+    def __init__(self, big_order, middle_order):
+        self.big_order = big_order
+        self.middle_order = middle_order
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.open = None
+        self.close = None
+        self.high = None
+        self.low = None
+        self.volume = 0.0
+        self.turnover = 0.0
+        self.flow = 0.0
+        self.flow_in = [0.0, 0.0, 0.0]
+        self.flow_out = [0.0, 0.0, 0.0]
+
+    def _get_bucket(self, turnover):
+        # 0:大单,1:中单,2:小单
+        if turnover >= self.big_order:
+            return 0
+        if turnover >= self.middle_order:
+            return 1
+        return 2
+
+    def add(self, price, volume, turnover, direction):
+        self.count += 1
+
+        if price is not None and price == price:
+            if self.open is None:
+                self.open = price
+                self.high = price
+                self.low = price
+            else:
+                if price > self.high:
+                    self.high = price
+                if price < self.low:
+                    self.low = price
+            self.close = price
+
+        # 和pandas的sum一样跳过缺失值
+        if volume is not None and volume == volume:
+            self.volume += volume
+
+        if turnover is None or turnover != turnover:
+            return
+        self.turnover += turnover
+
+        if direction == 1:
+            self.flow += turnover
+            self.flow_in[self._get_bucket(turnover)] += turnover
+        elif direction == -1:
+            self.flow -= turnover
+            self.flow_out[self._get_bucket(turnover)] += turnover
+
+    def get_kdata(self):
+        return {'open': float(self.open) if self.open is not None else None,
+                'high': float(self.high) if self.high is not None else None,
+                'low': float(self.low) if self.low is not None else None,
+                'close': float(self.close) if self.close is not None else None,
+                'volume': float(self.volume),
+                'turnover': float(self.turnover)}
+
+    def get_statistic(self):
+        return {'volume': self.volume,
+                'turnover': self.turnover,
+                'flow': self.flow,
+                'flowIn': sum(self.flow_in),
+                'flowOut': sum(self.flow_out),
+                'bigFlowIn': self.flow_in[0],
+                'middleFlowIn': self.flow_in[1],
+                'smallFlowIn': self.flow_in[2],
+                'bigFlowOut': self.flow_out[0],
+                'middleFlowOut': self.flow_out[1],
+                'smallFlowOut': self.flow_out[2]}
+
+
 class EosStatisticBot(NotifyEventBot):
     BIG_ORDER = 2000 * 10000
     MIDDLE_ORDER = 500 * 10000
@@ -61,11 +150,19 @@ class EosStatisticBot(NotifyEventBot):
         self.last_day_time_str = None
         self.last_mirco_time_str = None
 
-        self.df = pd.DataFrame()
-        self.item_list = []
+        self.accumulator = MinuteAccumulator(big_order=self.BIG_ORDER, middle_order=self.MIDDLE_ORDER)
+        # 已存在的k线不覆盖,create冲突的409忽略
+        self.es_writer = EsBulkWriter(ignore_status=(409,))
 
         self.computing_start = None
 
+    def run(self):
+        try:
+            super().run()
+        finally:
+            # 退出时把最后一批没满的统计写进es
+            self.es_writer.close()
+
     def init_new_computing_interval(self, event_timestamp):
         self.last_timestamp = to_timestamp(event_timestamp)
         self.kdata_timestamp = self.last_timestamp + timedelta(seconds=-self.last_timestamp.second,
@@ -84,32 +181,30 @@ class EosStatisticBot(NotifyEventBot):
 
         # calculating last minute
         if current_timestamp.minute != self.last_timestamp.minute:
-            self.df = pd.DataFrame(self.item_list)
-
             self.generate_1min_kdata()
             self.generate_eos_daily_statistic()
 
             self.init_new_computing_interval(event_item['timestamp'])
-            self.item_list = []
+            self.accumulator.reset()
 
             self.logger.info("using computing time:{}".format(datetime.now() - self.computing_start))
             self.computing_start = datetime.now()
 
-        self.item_list.append(event_item)
+        self.accumulator.add(event_item['price'], event_item['volume'], event_item['turnover'],
+                             event_item['direction'])
 
     def update_statistic_doc(self, statistic_doc, append_record, updateTimestamp):
         for key in append_record.keys():
-            if pd.isna(append_record[key]):
-                the_value = 0
-            else:
-                the_value = append_record[key]
-
             if key in statistic_doc:
-                statistic_doc[key] += float(the_value)
+                statistic_doc[key] += float(append_record[key])
             else:
-                statistic_doc[key] = float(the_value)
+                statistic_doc[key] = float(append_record[key])
         statistic_doc['updateTimestamp'] = updateTimestamp
-        statistic_doc.save(force=True)
+
+        self.es_writer.add({'_index': statistic_index_name,
+                            '_type': 'doc',
+                            '_id': statistic_doc.meta.id,
+                            '_source': statistic_doc.to_dict()})
 
     def generate_eos_daily_statistic(self):
         # ignore the statistic has computed before
@@ -119,7 +214,7 @@ class EosStatisticBot(NotifyEventBot):
 
         # update the statistic
         if (not self.latest_statistic_record) or (not is_same_date(self.latest_statistic_record['timestamp'],
-                                                                   self.df['timestamp'][0])):
+                                                                   self.kdata_timestamp)):
             doc_id = "{}_{}".format(self.security_id, self.last_day_time_str)
             self.latest_statistic_record = CommonStatistic(meta={'id': doc_id, 'index': statistic_index_name},
                                                            id=doc_id,
@@ -128,50 +223,14 @@ class EosStatisticBot(NotifyEventBot):
                                                            code=self.security_item['code'],
                                                            name=self.security_item['name'])
 
-        volume = self.df['volume'].sum()
-        turnover = self.df['turnover'].sum()
-        flow = (self.df['turnover'] * self.df['direction']).sum()
-
-        flowIn = self.df[self.df['direction'] == 1]['turnover'].sum()
-        flowOut = self.df[self.df['direction'] == -1]['turnover'].sum()
-
-        bigFlowIn = self.df[(self.df['direction'] == 1) & (self.df['turnover'] >= self.BIG_ORDER)]['turnover'].sum()
-        middleFlowIn = self.df[(self.df['direction'] == 1) & (self.df['turnover'] >= self.MIDDLE_ORDER) & (
-                self.df['turnover'] < self.BIG_ORDER)]['turnover'].sum()
-        smallFlowIn = self.df[(self.df['direction'] == 1) & (self.df['turnover'] < self.MIDDLE_ORDER)]['turnover'].sum()
-
-        bigFlowOut = self.df[(self.df['direction'] == -1) & (self.df['turnover'] >= self.BIG_ORDER)]['turnover'].sum()
-        middleFlowOut = self.df[(self.df['direction'] == -1) & (self.df['turnover'] >= self.MIDDLE_ORDER) & (
-                self.df['turnover'] < self.BIG_ORDER)]['turnover'].sum()
-        smallFlowOut = self.df[(self.df['direction'] == -1) & (self.df['turnover'] < self.MIDDLE_ORDER)][
-            'turnover'].sum()
-
-        self.update_statistic_doc(self.latest_statistic_record, {'volume': volume,
-                                                                 'turnover': turnover,
-                                                                 'flow': flow,
-                                                                 'flowIn': flowIn,
-                                                                 'flowOut': flowOut,
-                                                                 'bigFlowIn': bigFlowIn,
-                                                                 'middleFlowIn': middleFlowIn,
-                                                                 'smallFlowIn': smallFlowIn,
-                                                                 'bigFlowOut': bigFlowOut,
-                                                                 'middleFlowOut': middleFlowOut,
-                                                                 'smallFlowOut': smallFlowOut
-                                                                 }, updateTimestamp=self.last_mirco_time_str)
+        self.update_statistic_doc(self.latest_statistic_record, self.accumulator.get_statistic(),
+                                  updateTimestamp=self.last_mirco_time_str)
 
     def generate_1min_kdata(self):
-        doc_id = "{}_{}".format(self.security_id, self.last_mirco_time_str)
-        kdata_doc = CommonKData(meta={'id': doc_id, 'index': kdata_index_name}, id=doc_id)
-        if kdata_doc.exist(index=kdata_index_name):
+        if not self.accumulator.count:
             return
 
-        se_price = self.df['price']
-        high = se_price.max()
-        low = se_price.min()
-        open = se_price[0]
-        close = se_price[len(se_price) - 1]
-        volume = self.df['volume'].sum()
-        turnover = self.df['turnover'].sum()
+        doc_id = "{}_{}".format(self.security_id, self.last_mirco_time_str)
 
         kdata_json = {
             'id': doc_id,
@@ -179,18 +238,16 @@ class EosStatisticBot(NotifyEventBot):
             'updateTimestamp': self.last_mirco_time_str,
             'securityId': self.security_item['id'],
             'code': self.security_item['code'],
-            'name': self.security_item['name'],
-            'open': float(open),
-            'high': float(high),
-            'low': float(low),
-            'close': float(close),
-            'volume': float(volume),
-            'turnover': float(turnover)
+            'name': self.security_item['name']
         }
-
-        fill_doc_type(kdata_doc, kdata_json)
-
-        kdata_doc.save(force=True)
+        kdata_json.update(self.accumulator.get_kdata())
+
+        # create:已经存在的k线不会被覆盖,不需要先查询
+        self.es_writer.add({'_op_type': 'create',
+                            '_index': kdata_index_name,
+                            '_type': 'doc',
+                            '_id': doc_id,
+                            '_source': kdata_json})
 
 
 if __name__ == '__main__':
@@ -5,12 +5,13 @@ import elasticsearch.helpers
 import pandas as pd
 
 from fooltrader import es_client
-from fooltrader.api.esapi.esapi import es_get_user_statistic, es_get_latest_daily_user_statistic
+from fooltrader.api.esapi.esapi import es_get_user_statistics, es_get_latest_daily_user_statistics
 from fooltrader.bot.bot import NotifyEventBot
 from fooltrader.contract.es_contract import get_cryptocurrency_user_statistic_index, \
     get_cryptocurrency_daily_user_statistic_index
 from fooltrader.domain.data.es_quote import EosUserStatistic
-from fooltrader.settings import TIME_FORMAT_MICRO
+from fooltrader.settings import TIME_FORMAT_MICRO, EOS_USER_STATISTIC_CACHE_SIZE_MB
+from fooltrader.utils.cache_utils import LruCache, get_object_size
 from fooltrader.utils.es_utils import es_get_latest_record, es_index_mapping
 from fooltrader.utils.utils import to_timestamp, to_time_str, is_same_date
 
@@ -21,6 +22,12 @@ es_index_mapping(user_statistic_index_name, EosUserStatistic)
 es_index_mapping(daily_user_statistic_index_name, EosUserStatistic)
 
 
+def _get_statistic_size(statistic_doc):
+    if statistic_doc is None:
+        return get_object_size(statistic_doc)
+    return get_object_size(statistic_doc.to_dict())
+
+
 class EosUserStatisticBot(NotifyEventBot):
     def on_init(self):
         super().on_init()
@@ -46,8 +53,10 @@ class EosUserStatisticBot(NotifyEventBot):
         if self.latest_eos_user_statistic_record:
             self.start_timestamp = to_timestamp(self.latest_eos_user_statistic_record['updateTimestamp'])
 
-        self.user_map_latest_user_statistic = {}
-        self.user_map_latest_user_daily_statistic = {}
+        # 两个缓存各占一半内存
+        max_bytes = EOS_USER_STATISTIC_CACHE_SIZE_MB * 1024 * 1024 // 2
+        self.user_map_latest_user_statistic = LruCache(max_bytes=max_bytes, sizeof=_get_statistic_size)
+        self.user_map_latest_user_daily_statistic = LruCache(max_bytes=max_bytes, sizeof=_get_statistic_size)
         self.es_actions = []
 
     def after_init(self):
@@ -116,17 +125,52 @@ class EosUserStatisticBot(NotifyEventBot):
         # statistic_doc.save(force=True)
         self.es_actions.append(statistic_doc.to_dict(include_meta=True))
 
-    def update_daily_user_statistic(self, user_id, record, update_timestamp):
-        latest_user_daily_statistic = self.user_map_latest_user_daily_statistic.get(user_id)
-
-        if not latest_user_daily_statistic:
-            the_record = es_get_latest_daily_user_statistic(user_id=user_id)
-            if the_record:
-                latest_user_daily_statistic = EosUserStatistic(
-                    meta={'id': the_record['id'], 'index': daily_user_statistic_index_name},
-                    **the_record)
-                self.user_map_latest_user_daily_statistic[user_id] = latest_user_daily_statistic
-
+    def _prefetch(self, cache, user_ids, fetch):
+        # 本分钟用到的记录放在本地,批处理中途被lru淘汰也不会丢
+        the_map = {}
+        missing = []
+        for user_id in user_ids:
+            if user_id in cache:
+                the_map[user_id] = cache.get(user_id)
+            else:
+                missing.append(user_id)
+
+        if missing:
+            records = fetch(missing)
+            for user_id in missing:
+                # es里没有的也缓存None,下一分钟不再查询
+                the_map[user_id] = records.get(user_id)
+                cache.put(user_id, the_map[user_id])
+        return the_map, len(missing)
+
+    def prefetch_user_statistic(self, user_ids):
+        """
+        get the latest daily statistic and statistic of the users,the users not in the cache are queried in batch.
+
+        Returns
+        -------
+        tuple
+            (user_id -> daily statistic,user_id -> statistic),None for the user without statistic
+        """
+
+        def fetch_daily(missing):
+            records = es_get_latest_daily_user_statistics(user_ids=missing, security_id=self.security_id)
+            return {user_id: EosUserStatistic(meta={'id': the_record['id'], 'index': daily_user_statistic_index_name},
+                                              **the_record) for user_id, the_record in records.items()}
+
+        def fetch(missing):
+            records = es_get_user_statistics(user_ids=missing, security_id=self.security_id)
+            return {user_id: EosUserStatistic(
+                meta={'id': '{}_{}'.format(user_id, self.security_id), 'index': user_statistic_index_name},
+                **the_record) for user_id, the_record in records.items()}
+
+        daily_map, daily_missing = self._prefetch(self.user_map_latest_user_daily_statistic, user_ids, fetch_daily)
+        the_map, missing = self._prefetch(self.user_map_latest_user_statistic, user_ids, fetch)
+
+        self.logger.info("prefetch daily statistic:{},statistic:{}".format(daily_missing, missing))
+        return daily_map, the_map
+
+    def update_daily_user_statistic(self, user_id, record, update_timestamp, latest_user_daily_statistic):
         # ignore the user statistic has computed before
         if latest_user_daily_statistic and self.kdata_timestamp <= to_timestamp(
                 latest_user_daily_statistic['updateTimestamp']):
@@ -143,27 +187,20 @@ class EosUserStatisticBot(NotifyEventBot):
                 securityId=self.security_id,
                 code=self.security_item['code'],
                 name=self.security_item['name'])
-            self.user_map_latest_user_daily_statistic[user_id] = latest_user_daily_statistic
 
         # update user daily statistic
         self.update_statistic_doc(latest_user_daily_statistic, record, update_timestamp)
+        # 更新后文档变大,重新put来更新缓存的大小
+        self.user_map_latest_user_daily_statistic.put(user_id, latest_user_daily_statistic)
 
-    def update_user_statistic(self, user_id, record, update_timestamp):
-        latest_user_statistic = self.user_map_latest_user_statistic.get(user_id)
-        if not latest_user_statistic:
-            doc_id = '{}_{}'.format(user_id, self.security_id)
-
-            the_record = es_get_user_statistic(user_id=user_id)
-            if the_record:
-                latest_user_statistic = EosUserStatistic(meta={'id': doc_id, 'index': user_statistic_index_name},
-                                                         **the_record)
-                self.user_map_latest_user_statistic[user_id] = latest_user_statistic
+    def update_user_statistic(self, user_id, record, update_timestamp, latest_user_statistic):
         # ignore the user statistic has computed before
         if latest_user_statistic and self.kdata_timestamp <= to_timestamp(
                 latest_user_statistic['updateTimestamp']):
             return
 
         if not latest_user_statistic:
+            doc_id = '{}_{}'.format(user_id, self.security_id)
             latest_user_statistic = EosUserStatistic(meta={'id': doc_id, 'index': user_statistic_index_name},
                                                      id=doc_id,
                                                      userId=user_id,
@@ -171,10 +208,10 @@ class EosUserStatisticBot(NotifyEventBot):
                                                      securityId=self.security_id,
                                                      code=self.security_item['code'],
                                                      name=self.security_item['name'])
-            self.user_map_latest_user_statistic[user_id] = latest_user_statistic
 
         # update user  statistic
         self.update_statistic_doc(latest_user_statistic, record, update_timestamp)
+        self.user_map_latest_user_statistic.put(user_id, latest_user_statistic)
 
     def generate_user_statistic(self):
         self.df['volumeFlow'] = self.df['volume'] * self.df['direction']
@@ -184,6 +221,8 @@ class EosUserStatisticBot(NotifyEventBot):
         df_sum_in = self.df[self.df['direction'] == 1].groupby('receiver').sum()
         df_sum_out = self.df[self.df['direction'] == -1].groupby('receiver').sum()
 
+        daily_map, the_map = self.prefetch_user_statistic(df_sum.index)
+
         for user in df_sum.index:
             record = {
                 "volume": df_sum.loc[user, 'volumeFlow'],
@@ -204,8 +243,10 @@ class EosUserStatisticBot(NotifyEventBot):
                 record['volumeOut'] = 0
                 record['turnoverOut'] = 0
 
-            self.update_daily_user_statistic(user_id=user, record=record, update_timestamp=self.last_mirco_time_str)
-            self.update_user_statistic(user_id=user, record=record, update_timestamp=self.last_mirco_time_str)
+            self.update_daily_user_statistic(user_id=user, record=record, update_timestamp=self.last_mirco_time_str,
+                                             latest_user_daily_statistic=daily_map[user])
+            self.update_user_statistic(user_id=user, record=record, update_timestamp=self.last_mirco_time_str,
+                                       latest_user_statistic=the_map[user])
 
 
 if __name__ == '__main__':
@@ -1,12 +1,9 @@
 # -*- coding: utf-8 -*-
 
-import json
 import logging
 
-import elasticsearch.helpers
 import pandas as pd
 
-from fooltrader import es_client
 from fooltrader.api.event import get_finance_forecast_event, get_finance_report_event
 from fooltrader.api.fundamental import get_balance_sheet_items, get_income_statement_items, \
     get_cash_flow_statement_items, \
@@ -18,53 +15,90 @@ from fooltrader.domain.data.es_event import FinanceForecastEvent, FinanceReportE
 from fooltrader.domain.data.es_finance import BalanceSheet, IncomeStatement, CashFlowStatement, FinanceSummary
 from fooltrader.domain.data.es_quote import StockMeta, StockKData, IndexKData, CryptoCurrencyKData, IndexMeta, \
     CryptocurrencyMeta
-from fooltrader.settings import US_STOCK_CODES
-from fooltrader.utils.es_utils import es_index_mapping, es_get_latest_timestamp
-from fooltrader.utils.utils import fill_doc_type, index_df_with_time
+from fooltrader.settings import US_STOCK_CODES, ES_BULK_CHUNK_SIZE
+from fooltrader.utils.es_utils import es_index_mapping, es_get_latest_timestamp, es_bulk_index
+from fooltrader.utils.utils import index_df_with_time
 
 logger = logging.getLogger(__name__)
 
 
-# we make the data always have these fields:id,timestamp,securityId
-# so we could handle append data to index in uniform way
-def df_to_es(df, doc_type, index_name=None, timestamp_filed='timestamp', security_item=None, force=False):
-    if not index_name:
-        index_name = doc_type().meta.index
-
-    es_index_mapping(index_name, doc_type)
-
+def _filter_latest(df, index_name, timestamp_filed='timestamp', security_item=None, force=False):
     if not force:
-        query = None
-        if not force:
-            query = {
-                "term": {"securityId": ""}
-            }
-            query["term"]["securityId"] = security_item["id"]
+        query = {
+            "term": {"securityId": security_item["id"]}
+        }
 
         start_date = es_get_latest_timestamp(index=index_name, query=query, time_field=timestamp_filed)
         logger.info("{} latest timestamp:{}".format(index_name, start_date))
         if start_date:
             df = df.loc[start_date:, :]
+    return df
+
+
+def df_to_es_actions(df, doc_type, index_name=None, chunk_size=None):
+    """
+    convert the DataFrame to es bulk actions chunk by chunk.
+
+    Parameters
+    ----------
+    df : DataFrame
+        the data with id column
+    doc_type : DocType
+        the es doc type
+    index_name : str
+        the index name,default:the index of the doc_type
+    chunk_size : int
+        the rows converted at one time,default:settings.ES_BULK_CHUNK_SIZE
+
+    Returns
+    -------
+    generator
+        the bulk actions
+
+    """
+    if not index_name:
+        index_name = doc_type().meta.index
+    if not chunk_size:
+        chunk_size = ES_BULK_CHUNK_SIZE
+
+    if df.empty:
+        return
+    if 'id' not in df.columns:
+        logger.error("index to {} failed:missing id".format(index_name))
+        return
 
-    actions = []
+    the_type = doc_type(meta={'index': index_name}).to_dict(include_meta=True).get('_type')
 
-    for _, item in df.iterrows():
-        try:
-            es_data = doc_type(meta={'id': item['id'], 'index': index_name})
+    for i in range(0, len(df), chunk_size):
+        chunk = df.iloc[i:i + chunk_size]
 
-            item_json = json.loads(item.to_json())
+        for col in chunk.columns[chunk.dtypes.apply(pd.api.types.is_datetime64_any_dtype)]:
+            chunk = chunk.assign(**{col: chunk[col].dt.strftime('%Y-%m-%dT%H:%M:%S')})
 
-            fill_doc_type(es_data, item_json)
+        # 按列转换,空值不写入
+        records = chunk.astype(object).where(chunk.notna(), None).to_dict('records')
 
-            actions.append(es_data.to_dict(include_meta=True))
-        except Exception as e:
-            logger.exception("wrong item:{},error:{}".format(item, e))
+        for record in records:
+            action = {'_index': index_name,
+                      '_id': record['id'],
+                      '_source': {k: v for k, v in record.items() if v is not None}}
+            if the_type:
+                action['_type'] = the_type
+            yield action
 
-    if actions:
-        resp = elasticsearch.helpers.bulk(es_client, actions)
-        logger.info("index to {} success:{} failed:{}".format(index_name, resp[0], len(resp[1])))
-        if resp[1]:
-            logger.error("index to {} error:{}".format(index_name, resp[1]))
+
+# we make the data always have these fields:id,timestamp,securityId
+# so we could handle append data to index in uniform way
+def df_to_es(df, doc_type, index_name=None, timestamp_filed='timestamp', security_item=None, force=False):
+    if not index_name:
+        index_name = doc_type().meta.index
+
+    es_index_mapping(index_name, doc_type)
+
+    df = _filter_latest(df, index_name, timestamp_filed=timestamp_filed, security_item=security_item, force=force)
+
+    success, failed = es_bulk_index(df_to_es_actions(df, doc_type, index_name=index_name))
+    logger.info("index to {} success:{} failed:{}".format(index_name, success, failed))
 
 
 def security_meta_to_es(security_type='stock'):
@@ -90,13 +124,20 @@ def kdata_to_es(security_type='stock', start_code=None, end_code=None, force=Fal
         doc_type = CryptoCurrencyKData
         codes = CRYPTOCURRENCY_CODE
 
-    for _, security_item in get_security_list(security_type=security_type, start_code=start_code,
-                                              end_code=end_code, codes=codes).iterrows():
-        index_name = get_es_kdata_index(security_item['type'], security_item['exchange'])
+    def kdata_actions():
+        # 逐个证券读取,整个市场的文档不会同时在内存里
+        for _, security_item in get_security_list(security_type=security_type, start_code=start_code,
+                                                  end_code=end_code, codes=codes).iterrows():
+            index_name = get_es_kdata_index(security_item['type'], security_item['exchange'])
+            es_index_mapping(index_name, doc_type)
+
+            df = get_kdata(security_item, generate_id=True)
+            df = _filter_latest(df, index_name, security_item=security_item, force=force)
 
-        df = get_kdata(security_item, generate_id=True)
+            yield from df_to_es_actions(df, doc_type, index_name=index_name)
 
-        df_to_es(df, doc_type=doc_type, index_name=index_name, security_item=security_item, force=force)
+    success, failed = es_bulk_index(kdata_actions())
+    logger.info("kdata of {} to es success:{} failed:{}".format(security_type, success, failed))
 
 
 def finance_sheet_to_es(sheet_type=None, start_code=None, end_code=None, force=False):
@@ -1,61 +1,199 @@
 # -*- coding: utf-8 -*-
-import datetime
-import json
 import logging
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 from subprocess import Popen, PIPE, CalledProcessError
 
+import numpy as np
+import pandas as pd
+from dateutil.tz import tzlocal
 from kafka import KafkaConsumer
 from kafka import KafkaProducer
 
 from fooltrader.api.technical import get_security_list, get_ticks, get_kdata, to_security_item
 from fooltrader.contract.kafka_contract import get_kafka_tick_topic, get_kafka_kdata_topic
 from fooltrader.datasource.ccxt_wrapper import fetch_ticks
-from fooltrader.settings import KAFKA_HOST, TIME_FORMAT_SEC, TIME_FORMAT_DAY, KAFKA_PATH, ZK_KAFKA_HOST
+from fooltrader.settings import KAFKA_HOST, TIME_FORMAT_SEC, TIME_FORMAT_DAY, KAFKA_PATH, ZK_KAFKA_HOST, \
+    KAFKA_LINGER_MS, KAFKA_BATCH_SIZE, KAFKA_COMPRESSION_TYPE, KAFKA_PUBLISH_WORKERS
+from fooltrader.utils.kafka_utils import encode_frame, encode_message
+from fooltrader.utils.lazy_utils import LazyObject
 
-producer = KafkaProducer(bootstrap_servers=KAFKA_HOST)
+producer = LazyObject(lambda: KafkaProducer(bootstrap_servers=KAFKA_HOST))
 
 logger = logging.getLogger(__name__)
 
 
-def tick_to_kafka(security_item=None):
-    if security_item:
-        _tick_to_kafka(security_item)
-    else:
-        for _, security_item in get_security_list().iterrows():
-            _tick_to_kafka(security_item)
+class _DeliveryCounter(object):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.success = 0
+        self.failed = 0
 
+    def on_success(self, record_metadata):
+        with self._lock:
+            self.success += 1
 
-def _tick_to_kafka(security_item):
-    security_item = to_security_item(security_item)
+    def on_error(self, e):
+        with self._lock:
+            self.failed += 1
+        logger.warning("send to kafka failed:{}".format(e))
+
+
+def _new_batch_producer():
+    # 攒批,压缩,由broker决定吞吐
+    return KafkaProducer(bootstrap_servers=KAFKA_HOST,
+                         linger_ms=KAFKA_LINGER_MS,
+                         batch_size=KAFKA_BATCH_SIZE,
+                         compression_type=KAFKA_COMPRESSION_TYPE)
 
-    for df in get_ticks(security_item):
-        for _, tick_item in df.iterrows():
-            the_json = tick_item.to_json(force_ascii=False)
-            producer.send(get_kafka_tick_topic(security_item['id']),
-                          bytes(the_json, encoding='utf8'),
-                          timestamp_ms=int(1000 * datetime.datetime.strptime(tick_item['timestamp'],
-                                                                             TIME_FORMAT_SEC).timestamp()))
-            logger.debug("tick_to_kafka {}".format(the_json))
 
+def _to_timestamp_ms(time_series, time_fmt):
+    # 和datetime.timestamp()一样按本地时间
+    the_time = pd.to_datetime(time_series, format=time_fmt).dt.tz_localize(tzlocal())
+    return the_time.astype('int64') // 10 ** 6
 
-def kdata_to_kafka(security_item=None, fuquan='hfq'):
-    if security_item:
-        _kdata_to_kafka(security_item, fuquan)
-    else:
-        for _, security_item in get_security_list().iterrows():
-            _kdata_to_kafka(security_item, fuquan)
 
+def _df_to_kafka(the_producer, topic, df, timestamps, counter):
+    # 每行一条消息
+    messages = encode_frame(topic, df)
+    for message, timestamp_ms in zip(messages, timestamps.tolist()):
+        future = the_producer.send(topic, message, timestamp_ms=timestamp_ms)
+        future.add_callback(counter.on_success)
+        future.add_errback(counter.on_error)
+    return len(messages)
 
-def _kdata_to_kafka(security_item, fuquan='hfq'):
-    security_item = to_security_item(security_item)
 
-    for _, kdata_item in get_kdata(security_item, fuquan=fuquan).iterrows():
-        the_json = kdata_item.to_json(force_ascii=False)
-        producer.send(get_kafka_kdata_topic(security_item['id'], fuquan),
-                      bytes(the_json, encoding='utf8'),
-                      timestamp_ms=int(datetime.datetime.strptime(kdata_item['timestamp'],
-                                                                  TIME_FORMAT_DAY).timestamp()))
-        logger.debug("kdata_to_kafka {}".format(the_json))
+def _publish(security_items, publish_func, *args):
+    the_producer = _new_batch_producer()
+    counter = _DeliveryCounter()
+    sent = 0
+    start_time = time.time()
+    try:
+        for security_item in security_items:
+            try:
+                sent += publish_func(the_producer, to_security_item(security_item), counter, *args)
+            except Exception as e:
+                logger.exception("{} for {} failed".format(publish_func.__name__, security_item), e)
+    finally:
+        the_producer.flush()
+        the_producer.close()
+
+    cost = time.time() - start_time
+    logger.info("{} sent:{} success:{} failed:{} cost:{:.1f}s,{:.0f} msg/s".format(
+        publish_func.__name__, sent, counter.success, counter.failed, cost, sent / cost if cost else 0))
+    return {'sent': sent, 'success': counter.success, 'failed': counter.failed}
+
+
+def _publish_in_workers(security_items, workers, publish_func, *args):
+    """
+    publish the securities in worker processes,every process has its own producer.
+
+    Parameters
+    ----------
+    security_items : list
+        the security ids or codes
+    workers : int
+        the process count
+    publish_func : function
+        the function publishing one security
+
+    Returns
+    -------
+    dict
+        {'sent':int,'success':int,'failed':int}
+
+    """
+    if workers <= 1 or len(security_items) <= 1:
+        return _publish(security_items, publish_func, *args)
+
+    workers = min(workers, len(security_items))
+    # 按顺序切分,每个进程负责连续的一段
+    shards = [list(shard) for shard in np.array_split(np.array(security_items, dtype=object), workers)]
+
+    result = {'sent': 0, 'success': 0, 'failed': 0}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_publish, shard, publish_func, *args) for shard in shards]
+        for future in futures:
+            for key, value in future.result().items():
+                result[key] += value
+    logger.info("{} in {} workers,{}".format(publish_func.__name__, workers, result))
+    return result
+
+
+def _publish_ticks(the_producer, security_item, counter):
+    topic = get_kafka_tick_topic(security_item['id'])
+    sent = 0
+    for df in get_ticks(security_item):
+        if df.empty:
+            continue
+        sent += _df_to_kafka(the_producer, topic, df, _to_timestamp_ms(df['timestamp'], TIME_FORMAT_SEC), counter)
+    logger.debug("tick_to_kafka {} sent:{}".format(security_item['id'], sent))
+    return sent
+
+
+def _publish_kdata(the_producer, security_item, counter, fuquan='hfq'):
+    topic = get_kafka_kdata_topic(security_item['id'], fuquan)
+    df = get_kdata(security_item, fuquan=fuquan)
+    if df.empty:
+        return 0
+    # kdata的消息时间戳一直是秒,消费方按秒seek
+    timestamps = _to_timestamp_ms(df['timestamp'], TIME_FORMAT_DAY) // 1000
+    sent = _df_to_kafka(the_producer, topic, df, timestamps, counter)
+    logger.debug("kdata_to_kafka {} sent:{}".format(security_item['id'], sent))
+    return sent
+
+
+def tick_to_kafka(security_item=None, workers=None):
+    """
+    publish the ticks to kafka,the frames are serialized at once and sent by a batching,compressing producer.
+
+    Parameters
+    ----------
+    security_item : SecurityItem or str
+        the security item,id or code,None for all the stocks
+    workers : int
+        the process count for all the stocks,default:settings.KAFKA_PUBLISH_WORKERS
+
+    Returns
+    -------
+    dict
+        {'sent':int,'success':int,'failed':int}
+
+    """
+    if security_item is not None:
+        return _publish([security_item], _publish_ticks)
+
+    if not workers:
+        workers = KAFKA_PUBLISH_WORKERS
+    return _publish_in_workers(get_security_list()['id'].tolist(), workers, _publish_ticks)
+
+
+def kdata_to_kafka(security_item=None, fuquan='hfq', workers=None):
+    """
+    publish the kdata to kafka,the frames are serialized at once and sent by a batching,compressing producer.
+
+    Parameters
+    ----------
+    security_item : SecurityItem or str
+        the security item,id or code,None for all the stocks
+    fuquan : str
+        {"qfq","hfq","bfq"},default:"hfq"
+    workers : int
+        the process count for all the stocks,default:settings.KAFKA_PUBLISH_WORKERS
+
+    Returns
+    -------
+    dict
+        {'sent':int,'success':int,'failed':int}
+
+    """
+    if security_item is not None:
+        return _publish([security_item], _publish_kdata, fuquan)
+
+    if not workers:
+        workers = KAFKA_PUBLISH_WORKERS
+    return _publish_in_workers(get_security_list()['id'].tolist(), workers, _publish_kdata, fuquan)
 
 
 # make sure delete.topic.enable = true
@@ -84,8 +222,9 @@ def delete_all_topics():
 
 def cryptocurrency_tick_to_kafka(exchange, pairs=None):
     for tick in fetch_ticks(exchange, pairs=pairs):
-        producer.send(get_kafka_tick_topic(tick['securityId']),
-                      bytes(json.dumps(tick), encoding='utf8'),
+        topic = get_kafka_tick_topic(tick['securityId'])
+        producer.send(topic,
+                      encode_message(topic, tick),
                       timestamp_ms=tick['timestamp'])
 
         logger.debug("tick_to_kafka {}".format(tick))
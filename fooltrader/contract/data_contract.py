@@ -15,6 +15,9 @@ STOCK_META_COL = ['code', 'name', 'timestamp', 'listDate', 'exchange', 'type', '
 # 通用k线
 KDATA_COMMON_COL = ['timestamp', 'code', 'name', 'low', 'open', 'close', 'high', 'volume', 'securityId',
                     'preClose', 'change', 'changePct']
+# K线中的字符串字段,其他字段都为数值
+KDATA_STR_COL = ['timestamp', 'code', 'name', 'securityId', 'id']
+
 # tick
 TICK_COL = ['timestamp', 'price', 'volume', 'turnover', 'direction']
 
@@ -27,6 +30,8 @@ KDATA_INDEX_COL = ['timestamp', 'code', 'name', 'low', 'open', 'close', 'high',
 # 日期,代码,名称,最低,开盘,收盘,最高,成交量(股),成交额(元),唯一标识,前收盘,涨跌额,涨跌幅(%),换手率(%),总市值,流通市值,复权因子
 KDATA_STOCK_COL = ['timestamp', 'code', 'name', 'low', 'open', 'close', 'high', 'volume', 'turnover', 'securityId',
                    'preClose', 'change', 'changePct', 'turnoverRate', 'tCap', 'mCap', 'factor']
+# 163股票K线写入时算好的后复权价格
+KDATA_STOCK_HFQ_COL = ['hfqClose', 'hfqOpen', 'hfqHigh', 'hfqLow']
 # 期货K线
 # 日期,代码,名称,最低,开盘,收盘,最高,成交量(手),成交额(元),唯一标识,前收盘,涨跌额,涨跌幅(%),持仓量,结算价,前结算,涨跌额(按结算价),涨跌幅(按结算价)
 KDATA_FUTURE_COL = ['timestamp', 'code', 'name', 'low', 'open', 'close', 'high', 'volume', 'turnover', 'securityId',
@@ -67,15 +67,39 @@ def get_kdata_dir(item, fuquan='bfq'):
         return os.path.join(get_security_dir(item), 'kdata')
 
 
-def get_kdata_path(item, source=None, fuquan='bfq', year=None, quarter=None):
+def get_kdata_store_format(store_format=None):
+    if store_format == 'csv' or store_format == 'parquet':
+        return store_format
+    if settings.KDATA_STORE_FORMAT == 'parquet':
+        return 'parquet'
+    return 'csv'
+
+
+def get_kdata_path(item, source=None, fuquan='bfq', year=None, quarter=None, store_format=None):
     source = adjust_source(item, source)
+    store_format = get_kdata_store_format(store_format)
     if source == 'sina':
         if not year and not quarter:
-            return os.path.join(get_kdata_dir(item, fuquan), 'dayk.csv')
+            return os.path.join(get_kdata_dir(item, fuquan), 'dayk.{}'.format(store_format))
         else:
+            # 按季度抓取的中间数据,合并后会被删除,总是csv
             return os.path.join(get_kdata_dir(item, fuquan), '{}Q{}.csv'.format(year, quarter))
     else:
-        return os.path.join(get_kdata_dir(item, fuquan), '{}_dayk.csv'.format(source))
+        return os.path.join(get_kdata_dir(item, fuquan), '{}_dayk.{}'.format(source, store_format))
+
+
+def get_kdata_meta_path(item, source=None, fuquan='bfq'):
+    source = adjust_source(item, source)
+    if source == '163':
+        fuquan = 'bfq'
+    return os.path.join(get_kdata_dir(item, fuquan), '{}_dayk_meta.json'.format(source))
+
+
+def get_indicator_state_path(item, source=None, fuquan='bfq'):
+    source = adjust_source(item, source)
+    if source == '163':
+        fuquan = 'bfq'
+    return os.path.join(get_kdata_dir(item, fuquan), '{}_indicator_state.json'.format(source))
 
 
 # tick相关
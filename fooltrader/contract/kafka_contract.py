@@ -13,5 +13,50 @@ def get_kafka_kdata_topic(security_id, fuquan="hfq", level='day'):
         return '{}_{}_{}_kdata'.format(security_id, 'bfq', level)
 
 
+# 消息的紧凑编码,去掉重复的字段名
+# schema名 -> (schema id,{版本:字段表}),字段类型:'s' utf8字符串,'d' float64,'q' int64
+# 字段只能在新版本里追加,已发出的消息按其头部的版本解码
+KAFKA_MESSAGE_SCHEMAS = {
+    'tick': (1, {
+        1: (('timestamp', 's'), ('securityId', 's'), ('code', 's'), ('name', 's'), ('id', 's'),
+            ('price', 'd'), ('volume', 'd'), ('turnover', 'd'), ('direction', 'q'),
+            ('preClose', 'd'), ('change', 'd'), ('changePct', 'd'),
+            ('order', 'q'), ('blockNumber', 'q'), ('action', 's'), ('receiver', 's'), ('trxId', 's'),
+            ('operator', 's'), ('fee', 'd'))
+    }),
+    'kdata': (2, {
+        1: (('timestamp', 's'), ('securityId', 's'), ('code', 's'), ('name', 's'), ('id', 's'),
+            ('open', 'd'), ('close', 'd'), ('high', 'd'), ('low', 'd'), ('volume', 'd'), ('turnover', 'd'),
+            ('preClose', 'd'), ('change', 'd'), ('changePct', 'd'), ('turnoverRate', 'd'), ('tCap', 'd'),
+            ('mCap', 'd'), ('pe', 'd'), ('factor', 'd'),
+            ('hfqOpen', 'd'), ('hfqClose', 'd'), ('hfqHigh', 'd'), ('hfqLow', 'd'),
+            ('qfqOpen', 'd'), ('qfqClose', 'd'), ('qfqHigh', 'd'), ('qfqLow', 'd'),
+            ('openInterest', 'd'), ('settlement', 'd'), ('preSettlement', 'd'), ('change1', 'd'), ('changePct1', 'd'))
+    })
+}
+
+
+def get_kafka_topic_schema(topic):
+    """
+    get the message schema name of the topic.
+
+    Parameters
+    ----------
+    topic : str
+        the topic
+
+    Returns
+    -------
+    str
+        'tick','kdata' or None for the topics sending json
+
+    """
+    if topic.endswith('_tick'):
+        return 'tick'
+    if topic.endswith('_kdata'):
+        return 'kdata'
+    return None
+
+
 def get_subscription_triggered_topic(the_date):
     return 'subscription_triggered_{}'.format(to_time_str(the_date))
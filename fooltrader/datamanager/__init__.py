@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
 import logging
-from multiprocessing import Process
+import queue
+from multiprocessing import Process, Queue
 
-from scrapy.crawler import CrawlerProcess
+import pandas as pd
+from scrapy.crawler import CrawlerProcess, Crawler
 from scrapy.utils.project import get_project_settings
 
+from fooltrader import settings
+
 logger = logging.getLogger(__name__)
 
 
@@ -23,3 +27,139 @@ def process_crawl(spider, setting={}):
     if p.is_alive():
         logger.warning("kill the spider:{} which has run {} minutes,".format(type(spider).__name__), max_run_time)
         p.terminate()
+
+
+def _get_task_security_id(task):
+    security_item = task.get('security_item')
+    if security_item is None:
+        return None
+    return security_item['id']
+
+
+def _get_task_code(task):
+    security_item = task.get('security_item')
+    if security_item is None:
+        return ''
+    return security_item['code']
+
+
+def _crawl_shard(spider, setting, indexed_tasks, result_queue, concurrency):
+    process = CrawlerProcess({**get_project_settings(), **setting})
+
+    # CrawlerProcess初始化后再导入reactor
+    from twisted.internet import defer, reactor
+    # 爬虫假死的话,由CLOSESPIDER_TIMEOUT关闭
+    base_setting = {**get_project_settings(), 'CLOSESPIDER_TIMEOUT': settings.CRAWL_SPIDER_TIMEOUT, **setting}
+
+    results = []
+
+    @defer.inlineCallbacks
+    def crawl_task(task_idx, task):
+        crawler = Crawler(spider, {**base_setting, **task})
+        try:
+            yield process.crawl(crawler)
+            stats = crawler.stats.get_stats()
+            reason = stats.get('finish_reason')
+            error_count = stats.get('log_count/ERROR', 0) + sum(
+                v for k, v in stats.items() if k.startswith('spider_exceptions/'))
+            success = reason == 'finished' and error_count == 0
+            if not success and reason == 'finished':
+                reason = '{} errors'.format(error_count)
+        except Exception as e:
+            success = False
+            reason = str(e)
+
+        results.append({'taskIdx': task_idx,
+                        'securityId': _get_task_security_id(task),
+                        'spider': spider.name,
+                        'success': success,
+                        'reason': reason})
+
+    semaphore = defer.DeferredSemaphore(concurrency)
+    tasks_deferred = defer.DeferredList(
+        [semaphore.run(crawl_task, task_idx, task) for task_idx, task in indexed_tasks])
+    tasks_deferred.addBoth(lambda _: reactor.callLater(0, reactor.stop))
+
+    process.start(stop_after_crawl=False)
+
+    result_queue.put(results)
+
+
+def crawl_batch(spider, tasks, setting={}, workers=None, concurrency=1):
+    """
+    crawl many securities in one run,the tasks are sharded by code range over the worker processes,
+    and every worker runs all its tasks in one long-lived crawler process.
+
+    Parameters
+    ----------
+    spider : Spider class
+        the spider
+    tasks : list
+        the settings for every security,e.g. [{'security_item': item, 'start_date': start_date}]
+    setting : dict
+        the settings shared by all the tasks
+    workers : int
+        the worker process count,default:settings.CRAWL_WORKERS
+    concurrency : int
+        the tasks running at the same time in one worker,the spider's CONCURRENT_REQUESTS_PER_DOMAIN is
+        for every task,so keep it small for the sites which are sensitive to the crawling,default:1
+
+    Returns
+    -------
+    DataFrame
+        the result for every task with columns ['taskIdx', 'securityId', 'spider', 'success', 'reason'],
+        taskIdx is the index of the task in tasks
+
+    """
+    columns = ['taskIdx', 'securityId', 'spider', 'success', 'reason']
+    if not tasks:
+        return pd.DataFrame(columns=columns)
+
+    if not workers:
+        workers = settings.CRAWL_WORKERS
+    workers = max(1, min(workers, len(tasks)))
+
+    # 按代码区间切分,一个证券可能有多个任务(比如三张财务报表),结果按任务的序号对应
+    indexed_tasks = sorted(enumerate(tasks), key=lambda indexed_task: _get_task_code(indexed_task[1]))
+    shard_size = (len(tasks) + workers - 1) // workers
+    shards = [indexed_tasks[i:i + shard_size] for i in range(0, len(tasks), shard_size)]
+
+    result_queue = Queue()
+    processes = []
+    for shard in shards:
+        p = Process(target=_crawl_shard, args=(spider, setting, shard, result_queue, concurrency))
+        p.start()
+        processes.append(p)
+
+    results = []
+    pending = len(processes)
+    while pending:
+        try:
+            results += result_queue.get(timeout=60)
+            pending -= 1
+        except queue.Empty:
+            # worker异常退出
+            if not any(p.is_alive() for p in processes) and result_queue.empty():
+                break
+
+    for p in processes:
+        p.join()
+
+    # 没有结果的任务
+    done_idxs = {result['taskIdx'] for result in results}
+    for task_idx, task in indexed_tasks:
+        if task_idx not in done_idxs:
+            results.append({'taskIdx': task_idx,
+                            'securityId': _get_task_security_id(task),
+                            'spider': spider.name,
+                            'success': False,
+                            'reason': 'worker exited'})
+
+    df = pd.DataFrame(results, columns=columns)
+
+    failed = df[~df['success']]
+    logger.info("crawl {} tasks by {} finished,{} failed".format(len(df), spider.name, len(failed)))
+    for _, item in failed.iterrows():
+        logger.warning("crawl {} by {} failed:{}".format(item['securityId'], item['spider'], item['reason']))
+
+    return df
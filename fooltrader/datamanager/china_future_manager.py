@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import os
+from datetime import datetime
 
 from fooltrader import get_exchange_cache_dir
 from fooltrader.api.technical import get_trading_calendar
@@ -17,7 +18,9 @@ def crawl_shfe_quote():
     cache_dir = get_exchange_cache_dir(security_type='future', exchange='shfe', the_year=datetime.today().year,
                                        data_type="day_kdata")
 
-    saved_kdata_dates = [f for f in os.listdir(cache_dir)]
+    saved_kdata_dates = []
+    if os.path.exists(cache_dir):
+        saved_kdata_dates = [f for f in os.listdir(cache_dir)]
     trading_dates = get_trading_calendar(security_type='future', exchange='shfe')
 
     the_dates = set(trading_dates) - set(saved_kdata_dates)
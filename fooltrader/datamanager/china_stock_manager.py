@@ -7,13 +7,13 @@ import os
 import pandas as pd
 
 from fooltrader import settings, init_env
-from fooltrader.api.fundamental import get_balance_sheet_items, get_income_statement_items, \
-    get_cash_flow_statement_items
+from fooltrader.api.fundamental import get_finance_statement, BALANCE_SHEET_FIELDS, INCOME_STATEMENT_FIELDS, \
+    CASH_FLOW_STATEMENT_FIELDS
 from fooltrader.api.technical import get_security_list, get_latest_download_trading_date, get_trading_dates, \
     get_available_tick_dates, get_kdata
 from fooltrader.contract.files_contract import get_balance_sheet_path, get_income_statement_path, \
     get_cash_flow_statement_path
-from fooltrader.datamanager import process_crawl
+from fooltrader.datamanager import process_crawl, crawl_batch
 from fooltrader.settings import STOCK_START_CODE, STOCK_END_CODE
 from fooltrader.spiders.chinastock.china_stock_list_spider import ChinaStockListSpider
 from fooltrader.spiders.chinastock.sina_category_spider import SinaCategorySpider
@@ -46,80 +46,66 @@ def craw_stock_category():
     process_crawl(SinaCategorySpider, {'category_type': 'sinaArea'})
 
 
-def crawl_finance_data(start_code=STOCK_START_CODE, end_code=STOCK_END_CODE):
+def _need_crawl_finance(path, fields, current_report_period):
+    if not os.path.exists(path):
+        return True
+    # 只需要报告期,直接读解析缓存
+    df = get_finance_statement(path, fields)
+    # 当前报告期还没抓取
+    return df.empty or current_report_period != df['reportPeriod'].max()
+
+
+def crawl_finance_data(start_code=STOCK_START_CODE, end_code=STOCK_END_CODE, workers=None):
+    event_tasks = []
+    finance_tasks = []
+
+    current_report_period = get_report_period()
+
     for _, security_item in get_security_list(start_code=start_code, end_code=end_code).iterrows():
         try:
-            # 先抓事件,有些后续抓取依赖事件
-            process_crawl(StockFinanceReportEventSpider, {"security_item": security_item})
-
-            current_report_period = get_report_period()
+            event_tasks.append({"security_item": security_item})
 
             # 资产负债表
-            path = get_balance_sheet_path(security_item)
-            if not os.path.exists(path):
-                process_crawl(StockFinanceSpider, {"security_item": security_item,
-                                                   "report_type": "balance_sheet"})
-            else:
-                current_items = get_balance_sheet_items(security_item)
-                # 当前报告期还没抓取
-
-                if current_report_period != current_items[-1]['reportPeriod']:
-                    # 报告出来了
-                    # df = event.get_finance_report_event(security_item, index='reportPeriod')
-                    # if current_report_period in df.index:
-                    process_crawl(StockFinanceSpider, {"security_item": security_item,
-                                                       "report_type": "balance_sheet"})
+            if _need_crawl_finance(get_balance_sheet_path(security_item), BALANCE_SHEET_FIELDS,
+                                   current_report_period):
+                finance_tasks.append({"security_item": security_item, "report_type": "balance_sheet"})
 
             # 利润表
-            path = get_income_statement_path(security_item)
-            if not os.path.exists(path):
-                process_crawl(StockFinanceSpider, {"security_item": security_item,
-                                                   "report_type": "income_statement"})
-            else:
-                current_items = get_income_statement_items(security_item)
-                # 当前报告期还没抓取
-                if current_report_period != current_items[-1]['reportPeriod']:
-                    # 报告出来了
-                    # df = event.get_finance_report_event(security_item, index='reportPeriod')
-                    # if current_report_period in df.index:
-                    process_crawl(StockFinanceSpider, {"security_item": security_item,
-                                                       "report_type": "income_statement"})
+            if _need_crawl_finance(get_income_statement_path(security_item), INCOME_STATEMENT_FIELDS,
+                                   current_report_period):
+                finance_tasks.append({"security_item": security_item, "report_type": "income_statement"})
 
             # 现金流量表
-            path = get_cash_flow_statement_path(security_item)
-            if not os.path.exists(path):
-                process_crawl(StockFinanceSpider, {"security_item": security_item,
-                                                   "report_type": "cash_flow"})
-            else:
-                current_items = get_cash_flow_statement_items(security_item)
-                # 当前报告期还没抓取
-                if current_report_period != current_items[-1]['reportPeriod']:
-                    # 报告出来了
-                    # df = event.get_finance_report_event(security_item, index='reportPeriod')
-                    # if current_report_period in df.index:
-                    process_crawl(StockFinanceSpider, {"security_item": security_item,
-                                                       "report_type": "cash_flow"})
+            if _need_crawl_finance(get_cash_flow_statement_path(security_item), CASH_FLOW_STATEMENT_FIELDS,
+                                   current_report_period):
+                finance_tasks.append({"security_item": security_item, "report_type": "cash_flow"})
         except Exception as e:
             logger.exception(e)
 
+    # 先抓事件,有些后续抓取依赖事件
+    result = crawl_batch(StockFinanceReportEventSpider, event_tasks, workers=workers)
+    return result.append(crawl_batch(StockFinanceSpider, finance_tasks, workers=workers), ignore_index=True)
 
-def crawl_index_quote():
-    for _, security_item in get_security_list(security_type='index').iterrows():
-        # 抓取日K线
-        logger.info("{} get index kdata start".format(security_item['code']))
 
+def crawl_index_quote(workers=None):
+    kdata_tasks = []
+    security_items = get_security_list(security_type='index')
+    for _, security_item in security_items.iterrows():
+        # 抓取日K线
         start_date, _ = get_latest_download_trading_date(security_item, source='163')
         end_date = pd.Timestamp.today()
         if start_date > end_date:
             logger.info("{} kdata is ok".format(security_item['code']))
         else:
-            process_crawl(StockKdata163Spider, {"security_item": security_item,
-                                                "start_date": start_date,
-                                                "end_date": end_date})
+            kdata_tasks.append({"security_item": security_item,
+                                "start_date": start_date,
+                                "end_date": end_date})
 
-        logger.info("{} get index kdata from 163 end".format(security_item['code']))
+    result = crawl_batch(StockKdata163Spider, kdata_tasks, workers=workers)
 
-        # 获取市场概况数据[上海,深圳,中小板,创业板]
+    # 获取市场概况数据[上海,深圳,中小板,创业板]
+    summary_tasks = []
+    for _, security_item in security_items.iterrows():
         if security_item['id'] in ['index_sh_000001', 'index_sz_399106', 'index_sz_399005', 'index_sz_399006']:
             # if security_item['id'] in ['index_sz_399106', 'index_sz_399005', 'index_sz_399006']:
             df = get_kdata(security_item=security_item)
@@ -131,37 +117,41 @@ def crawl_index_quote():
                 # dates = [the_date for the_date in dates if
                 #          pd.Timestamp(the_date).date().year >= 2018]
                 if dates:
-                    process_crawl(StockSummarySpider, {"security_item": security_item,
-                                                       "the_dates": dates})
+                    summary_tasks.append({"security_item": security_item,
+                                          "the_dates": dates})
 
+    return result.append(crawl_batch(StockSummarySpider, summary_tasks, workers=workers), ignore_index=True)
 
-def crawl_stock_quote(start_code=STOCK_START_CODE, end_code=STOCK_END_CODE, crawl_tick=True):
-    # 抓取股票k线
-    for _, security_item in get_security_list(start_code=start_code, end_code=end_code).iterrows():
-        # 抓取日K线
-        logger.info("{} get stock kdata start".format(security_item['code']))
 
+def crawl_stock_quote(start_code=STOCK_START_CODE, end_code=STOCK_END_CODE, crawl_tick=True, workers=None):
+    security_items = get_security_list(start_code=start_code, end_code=end_code)
+
+    # 抓取股票日K线
+    kdata_tasks = []
+    for _, security_item in security_items.iterrows():
         start_date, _ = get_latest_download_trading_date(security_item, source='163')
         end_date = pd.Timestamp.today()
         if start_date > end_date:
             logger.info("{} stock kdata is ok".format(security_item['code']))
         else:
-            process_crawl(StockKdata163Spider, {"security_item": security_item,
-                                                "start_date": start_date,
-                                                "end_date": end_date})
+            kdata_tasks.append({"security_item": security_item,
+                                "start_date": start_date,
+                                "end_date": end_date})
 
-        logger.info("{} get stock kdata from 163 end".format(security_item['code']))
+    result = crawl_batch(StockKdata163Spider, kdata_tasks, workers=workers)
 
+    # 新浪的数据以163的交易日为准
+    sina_tasks = []
+    tick_tasks = []
+    for _, security_item in security_items.iterrows():
         base_dates = set(get_trading_dates(security_item, source='163'))
         for fuquan in ('bfq', 'hfq'):
             sina_dates = set(get_trading_dates(security_item, source='sina', fuquan=fuquan))
             diff_dates = base_dates - sina_dates
             if diff_dates:
-                logger.info("{} get {} kdata from sina start".format(security_item['code'], fuquan))
-                process_crawl(StockKDataSinaSpider, {"security_item": security_item,
-                                                     "trading_dates": diff_dates,
-                                                     "fuquan": fuquan})
-                logger.info("{} get {} kdata from sina end".format(security_item['code'], fuquan))
+                sina_tasks.append({"security_item": security_item,
+                                   "trading_dates": diff_dates,
+                                   "fuquan": fuquan})
             else:
                 logger.info("{} {} kdata from sina is ok".format(security_item['code'], fuquan))
 
@@ -172,22 +162,24 @@ def crawl_stock_quote(start_code=STOCK_START_CODE, end_code=STOCK_END_CODE, craw
             diff_dates = tick_dates - set(get_available_tick_dates(security_item))
 
             if diff_dates:
-                logger.info("{} get tick start".format(security_item['code']))
-                process_crawl(StockTickSpider, {"security_item": security_item,
-                                                "trading_dates": diff_dates})
-                logger.info("{} get tick end".format(security_item['code']))
+                tick_tasks.append({"security_item": security_item,
+                                   "trading_dates": diff_dates})
             else:
                 logger.info("{} tick is ok".format(security_item['code']))
 
+    result = result.append(crawl_batch(StockKDataSinaSpider, sina_tasks, workers=workers), ignore_index=True)
+    return result.append(crawl_batch(StockTickSpider, tick_tasks, workers=workers), ignore_index=True)
+
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('-s', '--start_code', default='300002', help='the stock start code to be crawled')
     parser.add_argument('-e', '--end_code', default='300002', help='the stock end code to be crawled')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='the crawler process count')
 
     args = parser.parse_args()
 
     # crawl_stock_meta()
     # crawl_index_quote()
-    # crawl_stock_quote(args.start_code, args.end_code)
-    crawl_finance_data(args.start_code, args.end_code)
+    # crawl_stock_quote(args.start_code, args.end_code, workers=args.workers)
+    crawl_finance_data(args.start_code, args.end_code, workers=args.workers)
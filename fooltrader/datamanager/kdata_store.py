@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+from fooltrader import settings
+from fooltrader.contract.data_contract import KDATA_STOCK_HFQ_COL
+from fooltrader.contract.files_contract import get_kdata_path, get_kdata_meta_path
+from fooltrader.utils.pd_utils import pd_read_kdata, kdata_df_save, kdata_df_append, kdata_compact, \
+    get_kdata_delta_path
+from fooltrader.utils.utils import to_time_str
+
+logger = logging.getLogger(__name__)
+
+
+def _is_kdata_file(file_name, store_format):
+    # 163_dayk.csv,exchange_dayk.csv,sina的dayk.csv等
+    return file_name.endswith('dayk.{}'.format(store_format))
+
+
+def _walk_kdata_files(security_types, store_format):
+    for security_type in security_types:
+        the_dir = os.path.join(settings.FOOLTRADER_STORE_PATH, security_type)
+        if not os.path.exists(the_dir):
+            continue
+
+        for root, _, files in os.walk(the_dir):
+            if os.path.basename(root) not in ('kdata', 'bfq', 'hfq', 'qfq'):
+                continue
+
+            for f in files:
+                if _is_kdata_file(f, store_format):
+                    yield os.path.join(root, f)
+
+
+def migrate_kdata(security_types=('stock', 'index', 'future', 'cryptocurrency'), from_format='csv',
+                  to_format='parquet', remove_source=False):
+    """
+    migrate the kdata files from one store format to another.
+
+    Parameters
+    ----------
+    security_types : list
+        the security types to migrate
+    from_format : str
+        {'csv','parquet'},default:'csv'
+    to_format : str
+        {'csv','parquet'},default:'parquet'
+    remove_source : bool
+        whether remove the source file after migrating,default:False
+
+    Returns
+    -------
+    int
+        the migrated file count
+
+    """
+    count = 0
+    for src_path in _walk_kdata_files(security_types, from_format):
+        dst_path = src_path[:-len(from_format)] + to_format
+        try:
+            df = pd_read_kdata(src_path)
+            if df.empty:
+                continue
+            kdata_df_save(df, dst_path)
+            count += 1
+
+            if remove_source:
+                os.remove(src_path)
+                delta_path = get_kdata_delta_path(src_path)
+                if os.path.exists(delta_path):
+                    os.remove(delta_path)
+            logger.info("migrate {} to {}".format(src_path, dst_path))
+        except Exception as e:
+            logger.exception("migrate {} failed".format(src_path), e)
+    return count
+
+
+def compact_kdata(security_types=('stock', 'index', 'future', 'cryptocurrency'), store_format=None):
+    """
+    merge the delta segments to the kdata files.
+
+    Parameters
+    ----------
+    security_types : list
+        the security types to compact
+    store_format : str
+        {'csv','parquet'},default:settings.KDATA_STORE_FORMAT
+
+    Returns
+    -------
+    int
+        the compacted file count
+
+    """
+    if not store_format:
+        store_format = settings.KDATA_STORE_FORMAT
+
+    count = 0
+    for the_path in _walk_kdata_files(security_types, store_format):
+        try:
+            if kdata_compact(the_path):
+                count += 1
+                logger.info("compact {}".format(the_path))
+        except Exception as e:
+            logger.exception("compact {} failed".format(the_path), e)
+    return count
+
+
+def compact_kdata_in_background(security_types=('stock', 'index', 'future', 'cryptocurrency'), interval=3600):
+    """
+    compact the delta segments periodically in a daemon thread.
+
+    Parameters
+    ----------
+    security_types : list
+        the security types to compact
+    interval : int
+        the interval in seconds
+
+    Returns
+    -------
+    Thread
+
+    """
+
+    def run():
+        while True:
+            compact_kdata(security_types)
+            time.sleep(interval)
+
+    the_thread = threading.Thread(target=run, name='kdata_compactor', daemon=True)
+    the_thread.start()
+    return the_thread
+
+
+def add_hfq_columns(df):
+    """
+    fill the hfq columns of the 163 stock kdata by the factor,only the rows missing them are calculated.
+
+    Parameters
+    ----------
+    df : DataFrame
+        the kdata with factor column
+
+    Returns
+    -------
+    DataFrame
+
+    """
+    for col in KDATA_STOCK_HFQ_COL:
+        if col not in df.columns:
+            df[col] = None
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    if 'factor' not in df.columns:
+        return df
+
+    factor = pd.to_numeric(df['factor'], errors='coerce')
+    # 后复权价格是不变的,只需算新增的,或者factor刚补上的
+    rows = df['hfqClose'].isna() & factor.notna()
+    if rows.any():
+        for col in KDATA_STOCK_HFQ_COL:
+            price_col = col[3:].lower()
+            df.loc[rows, col] = pd.to_numeric(df.loc[rows, price_col], errors='coerce') * factor[rows]
+    return df
+
+
+def get_kdata_meta(security_item, source='163'):
+    """
+    get the kdata meta,e.g. {'latestFactor':2.5,'latestFactorDate':'2018-03-29'}
+
+    Parameters
+    ----------
+    security_item : SecurityItem
+        the security item
+    source : str
+        the data source,default: '163'
+
+    Returns
+    -------
+    dict
+        None if not exist
+
+    """
+    the_path = get_kdata_meta_path(security_item, source=source)
+    if os.path.isfile(the_path):
+        with open(the_path) as f:
+            return json.load(f)
+    return None
+
+
+def save_stock_kdata_163(security_item, df):
+    """
+    save the 163 stock kdata,the hfq columns are materialised and the latest factor is stored in the meta,
+    so reading qfq just needs one scalar division.
+
+    Parameters
+    ----------
+    security_item : SecurityItem
+        the security item
+    df : DataFrame
+        the kdata
+
+    """
+    df = add_hfq_columns(df)
+    kdata_df_save(df, get_kdata_path(security_item, source='163', fuquan='bfq'))
+
+    meta = {}
+    if 'factor' in df.columns:
+        df_has_factor = df[pd.to_numeric(df['factor'], errors='coerce').notna()]
+        if not df_has_factor.empty:
+            df_has_factor = df_has_factor.iloc[pd.to_datetime(df_has_factor['timestamp']).argsort(kind='stable')]
+            meta['latestFactor'] = float(df_has_factor['factor'].iat[-1])
+            meta['latestFactorDate'] = to_time_str(df_has_factor['timestamp'].iat[-1])
+
+    with open(get_kdata_meta_path(security_item, source='163'), 'w') as f:
+        json.dump(meta, f)
+
+
+def append_stock_kdata_163(security_item, df):
+    """
+    append the new bars to the 163 stock kdata,the hfq columns are filled and the meta is updated
+    if the bars have new factor.
+
+    Parameters
+    ----------
+    security_item : SecurityItem
+        the security item
+    df : DataFrame
+        the new kdata
+
+    """
+    the_path = get_kdata_path(security_item, source='163', fuquan='bfq')
+    if not os.path.exists(the_path):
+        save_stock_kdata_163(security_item, df)
+        return
+
+    df = add_hfq_columns(df)
+    kdata_df_append(df, the_path)
+
+    if 'factor' in df.columns:
+        df_has_factor = df[pd.to_numeric(df['factor'], errors='coerce').notna()]
+        if not df_has_factor.empty:
+            df_has_factor = df_has_factor.iloc[pd.to_datetime(df_has_factor['timestamp']).argsort(kind='stable')]
+            meta = get_kdata_meta(security_item) or {}
+            if pd.Timestamp(df_has_factor['timestamp'].iat[-1]) >= pd.Timestamp(
+                    meta.get('latestFactorDate', '1970-01-01')):
+                meta['latestFactor'] = float(df_has_factor['factor'].iat[-1])
+                meta['latestFactorDate'] = to_time_str(df_has_factor['timestamp'].iat[-1])
+                with open(get_kdata_meta_path(security_item, source='163'), 'w') as f:
+                    json.dump(meta, f)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--from_format', default='csv', help='the store format migrate from')
+    parser.add_argument('--to_format', default='parquet', help='the store format migrate to')
+    parser.add_argument('--remove_source', action='store_true', help='remove the source file after migrating')
+    parser.add_argument('--compact', action='store_true', help='just merge the delta segments to the kdata files')
+
+    args = parser.parse_args()
+
+    if args.compact:
+        compact_kdata()
+    else:
+        migrate_kdata(from_format=args.from_format, to_format=args.to_format, remove_source=args.remove_source)
@@ -13,7 +13,7 @@ from fooltrader.consts import CRYPTOCURRENCY_EXCHANGES, CRYPTOCURRENCY_PAIR, SEC
 from fooltrader.contract.data_contract import KDATA_COMMON_COL
 from fooltrader.contract.files_contract import get_security_meta_path, get_security_list_path, \
     get_kdata_path, get_kdata_dir
-from fooltrader.utils.pd_utils import kdata_df_save
+from fooltrader.utils.pd_utils import kdata_df_append
 from fooltrader.utils.utils import to_time_str, is_same_date
 
 logger = logging.getLogger(__name__)
@@ -117,10 +117,18 @@ def fetch_kdata(exchange_str='bitstamp'):
                     logger.exception("fetch_kdata for {} {} failed".format(exchange_str, security_item['name']), e)
                     continue
 
+                # 只追加新的k线
+                pre_close = None
+                if not df.empty:
+                    pre_close = df['close'].iat[-1]
+                    df = pd.DataFrame()
+
                 for kdata in kdatas:
                     timestamp = pd.Timestamp.fromtimestamp(int(kdata[0] / 1000))
                     if is_same_date(timestamp, pd.Timestamp.today()):
                         continue
+                    if pre_close is not None and timestamp < start_date:
+                        continue
                     kdata_json = {
                         'timestamp': to_time_str(timestamp),
                         'code': security_item['code'],
@@ -138,7 +146,7 @@ def fetch_kdata(exchange_str='bitstamp'):
                     df = df.append(kdata_json, ignore_index=True)
                 if not df.empty:
                     df = df.loc[:, KDATA_COMMON_COL]
-                    kdata_df_save(df, get_kdata_path(security_item), calculate_change=True)
+                    kdata_df_append(df, get_kdata_path(security_item), calculate_change=True, pre_close=pre_close)
                     logger.info(
                         "fetch_kdata for exchange:{} security:{} success".format(exchange_str, security_item['name']))
             except Exception as e:
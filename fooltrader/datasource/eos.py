@@ -1,5 +1,4 @@
 # -*- coding: utf-8 -*-
-import json
 import logging
 import time
 from datetime import timedelta, datetime
@@ -9,17 +8,19 @@ from pymongo import MongoClient
 
 from fooltrader import to_time_str
 from fooltrader.contract.kafka_contract import get_kafka_tick_topic
+from fooltrader.datasource import init_contract_security_list
 from fooltrader.settings import EOS_MONGODB_URL, KAFKA_HOST, TIME_FORMAT_MICRO
-from fooltrader.utils.kafka_utils import get_latest_timestamp_order
+from fooltrader.utils.kafka_utils import get_latest_timestamp_order, encode_message
+from fooltrader.utils.lazy_utils import LazyObject
 from fooltrader.utils.utils import to_timestamp
 
 logger = logging.getLogger(__name__)
 
-producer = KafkaProducer(bootstrap_servers=KAFKA_HOST)
+producer = LazyObject(lambda: KafkaProducer(bootstrap_servers=KAFKA_HOST))
 
-client = MongoClient(EOS_MONGODB_URL)
+client = LazyObject(lambda: MongoClient(EOS_MONGODB_URL))
 
-db = client['eosMain']
+db = LazyObject(lambda: client['eosMain'])
 
 
 def to_tick(item):
@@ -92,7 +93,7 @@ def eos_ram_to_kafka():
             tick = to_tick(item)
 
             record_meta = producer.send(topic,
-                                        bytes(json.dumps(tick, ensure_ascii=False), encoding='utf8'),
+                                        encode_message(topic, tick),
                                         key=bytes(security_id, encoding='utf8'),
                                         timestamp_ms=int(item['block_time'].timestamp() * 1000))
             record = record_meta.get(10)
@@ -121,4 +122,5 @@ def evaluate_time_range(timestamp, time_step=10):
 
 
 if __name__ == '__main__':
+    init_contract_security_list()
     eos_ram_to_kafka()
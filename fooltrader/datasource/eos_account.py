@@ -9,14 +9,15 @@ from fooltrader import fill_doc_type, es_client
 from fooltrader.domain.data.es_quote import EosAccount
 from fooltrader.settings import EOS_MONGODB_URL
 from fooltrader.utils.es_utils import es_index_mapping
+from fooltrader.utils.lazy_utils import LazyObject
 from fooltrader.utils.utils import to_time_str
 
 logger = logging.getLogger(__name__)
 
-client = MongoClient(EOS_MONGODB_URL)
+client = LazyObject(lambda: MongoClient(EOS_MONGODB_URL))
 
-db = client['eosMain']
-db_rs = client['local']
+db = LazyObject(lambda: client['eosMain'])
+db_rs = LazyObject(lambda: client['local'])
 
 es_index_mapping("eos_account", EosAccount)
 
@@ -96,6 +96,30 @@ FOOLTRADER_STORE_PATH = os.environ.get('FOOLTRADER_STORE_PATH')
 if not FOOLTRADER_STORE_PATH:
     FOOLTRADER_STORE_PATH = '/home/xuanqi/workspace/github/fooltrader/data'
 
+# k线的存储格式,{'csv','parquet'},parquet需要安装pyarrow
+# 切换格式后,用fooltrader.datamanager.kdata_store把已有的数据迁移过去
+KDATA_STORE_FORMAT = os.environ.get('KDATA_STORE_FORMAT')
+if not KDATA_STORE_FORMAT:
+    KDATA_STORE_FORMAT = 'csv'
+
+# k线增量文件超过这个大小(bytes)时合并到k线文件
+KDATA_DELTA_MAX_SIZE = 1024 * 1024
+
+# get_kdata的内存缓存大小(MB),为0则不缓存
+KDATA_CACHE_SIZE_MB = 512
+# 缓存的淘汰策略,{'lru','fifo'}
+KDATA_CACHE_POLICY = 'lru'
+
+# 解析后的财报的内存缓存大小(MB),为0则不缓存
+FINANCE_CACHE_SIZE_MB = 256
+
+# 事件索引的内存缓存大小(MB)
+EVENT_CACHE_SIZE_MB = 128
+
+# 批量抓取的进程数,以及单个证券的抓取超时(秒)
+CRAWL_WORKERS = 4
+CRAWL_SPIDER_TIMEOUT = 30 * 60
+
 STOCK_START_CODE = '000001'
 STOCK_END_CODE = '666666'
 
@@ -112,6 +136,13 @@ AUTO_KAFKA = False
 KAFKA_HOST = 'localhost:9092'
 KAFKA_PATH = '/home/xuanqi/software/kafka_2.11-0.11.0.1'
 ZK_KAFKA_HOST = 'localhost:2181'
+# 批量发送kafka的攒批等待(ms),批大小(bytes),压缩方式({None,'gzip','snappy','lz4'})以及进程数
+KAFKA_LINGER_MS = 50
+KAFKA_BATCH_SIZE = 512 * 1024
+KAFKA_COMPRESSION_TYPE = 'gzip'
+KAFKA_PUBLISH_WORKERS = 4
+# tick和kdata消息的编码,{'binary','json'},所有的消费者都用decode_message解码后才能切换到binary
+KAFKA_MESSAGE_ENCODING = 'json'
 
 # http://www.delegate.org/delegate/
 # 用于socks转http
@@ -131,6 +162,14 @@ TIME_FORMAT_DAY = '%Y-%m-%d'
 
 # ES_HOSTS = ['172.16.92.200:9200']
 ES_HOSTS = ['localhost:9200']
+# 批量索引的每批文档数,线程数,以及被限流(429)时的重试次数
+ES_BULK_CHUNK_SIZE = 500
+ES_BULK_THREAD_COUNT = 4
+ES_BULK_MAX_RETRIES = 5
+
+# 机器人账户的快照:每多少次交易记录一次(0为只在收盘和结束时),攒够多少个快照批量写入es
+ACCOUNT_SNAPSHOT_INTERVAL = 0
+ACCOUNT_SNAPSHOT_BATCH_SIZE = 500
 
 # the action account settings
 SMTP_HOST = 'smtpdm.aliyun.com'
@@ -157,3 +196,6 @@ EOS_MONGODB_URL = ""
 
 if not EOS_MONGODB_URL:
     EOS_MONGODB_URL = os.environ.get("EOS_MONGODB_URL")
+
+# EosUserStatisticBot缓存用户统计的内存上限(MB),超过后淘汰最久没交易的用户
+EOS_USER_STATISTIC_CACHE_SIZE_MB = 256
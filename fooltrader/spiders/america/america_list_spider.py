@@ -10,7 +10,7 @@ from scrapy import signals
 
 from fooltrader.contract import files_contract
 from fooltrader.contract.data_contract import STOCK_META_COL
-from fooltrader.utils.utils import to_time_str
+from fooltrader.utils.utils import to_time_str, mkdir_for_path
 
 
 class AmericaListSpider(scrapy.Spider):
@@ -63,6 +63,7 @@ class AmericaListSpider(scrapy.Spider):
                 df_current = df_current.append(df.loc[diff, :], ignore_index=False)
                 df_current = df_current.loc[:, STOCK_META_COL]
                 df_current.columns = STOCK_META_COL
+                mkdir_for_path(path)
                 df_current.to_csv(path, index=False)
 
     @classmethod
@@ -9,7 +9,7 @@ from scrapy import signals
 
 from fooltrader.api.technical import get_security_list
 from fooltrader.contract.files_contract import get_finance_path
-from fooltrader.utils.utils import index_df_with_time
+from fooltrader.utils.utils import index_df_with_time, mkdir_for_path
 
 
 class AmericaStockFinanceSpider(scrapy.Spider):
@@ -106,6 +106,7 @@ class AmericaStockFinanceSpider(scrapy.Spider):
 
             df.fillna(0, inplace=True)
 
+            mkdir_for_path(path)
             df.to_csv(path, index=False)
         else:
             self.logger.exception(
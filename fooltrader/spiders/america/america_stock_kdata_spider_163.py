@@ -13,6 +13,7 @@ from fooltrader.contract.data_contract import KDATA_COLUMN_163, KDATA_INDEX_COLU
     KDATA_INDEX_COL, KDATA_STOCK_COL
 from fooltrader.contract.files_contract import get_kdata_path
 from fooltrader.settings import US_STOCK_CODES
+from fooltrader.utils.pd_utils import pd_read_kdata, kdata_df_save
 from fooltrader.utils.utils import to_time_str
 
 
@@ -75,7 +76,7 @@ class AmericaStockKdataSpider(scrapy.Spider):
         try:
             # 已经保存的csv数据
             if os.path.exists(filename_):
-                df_current = pd.read_csv(filename_, dtype=str)
+                df_current = pd_read_kdata(filename_)
                 # 补全历史数据
                 if 'name' not in df_current.columns:
                     df_current['name'] = item['name']
@@ -155,11 +156,7 @@ class AmericaStockKdataSpider(scrapy.Spider):
                 # 保证col顺序
                 df_current = df_current.loc[:, KDATA_STOCK_COL]
 
-            df_current = df_current.drop_duplicates(subset='timestamp', keep='last')
-            df_current = df_current.set_index(df_current['timestamp'], drop=False)
-            df_current.index = pd.to_datetime(df_current.index)
-            df_current = df_current.sort_index()
-            df_current.to_csv(filename_, index=False)
+            kdata_df_save(df_current, filename_)
         except Exception as e:
             self.logger.exception('error when getting k data url={} error={}'.format(response.url, e))
 
@@ -7,6 +7,7 @@ from scrapy import Selector
 from scrapy import signals
 
 from fooltrader.contract.files_contract import get_kdata_path
+from fooltrader.utils.pd_utils import kdata_df_save
 from fooltrader.utils.utils import index_df_with_time, to_time_str, to_float
 
 
@@ -84,5 +85,5 @@ class Sp500Spider(scrapy.Spider):
         self.df_pe['code'] = self.security_item['code']
         self.df_pe['securityId'] = self.security_item['id']
         self.df_pe['name'] = self.security_item['name']
-        self.df_pe.to_csv(get_kdata_path(self.security_item), index=False)
+        kdata_df_save(self.df_pe, get_kdata_path(self.security_item))
         spider.logger.info('Spider closed: %s,%s\n', spider.name, reason)
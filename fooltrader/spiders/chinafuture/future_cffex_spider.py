@@ -10,7 +10,7 @@ import pandas as pd
 
 from fooltrader.api.technical import parse_shfe_data, parse_shfe_day_data
 from fooltrader.contract.files_contract import get_exchange_cache_dir, get_exchange_cache_path
-from fooltrader.utils.utils import to_timestamp
+from fooltrader.utils.utils import to_timestamp, mkdir_for_path
 
 
 class FutureCffexSpider(scrapy.Spider):
@@ -52,6 +52,7 @@ class FutureCffexSpider(scrapy.Spider):
         the_path = response.meta['filename']
 
         if content_type_header.decode("utf-8") == 'application/zip' or content_type_header.decode("utf-8") == 'text/csv':
+            mkdir_for_path(the_path)
             with open(the_path, "wb") as f:
                 f.write(response.body)
                 f.flush()
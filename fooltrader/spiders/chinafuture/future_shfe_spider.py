@@ -10,7 +10,7 @@ from scrapy import signals
 
 from fooltrader.api.technical import parse_shfe_data, parse_shfe_day_data
 from fooltrader.contract.files_contract import get_exchange_cache_dir, get_exchange_cache_path
-from fooltrader.utils.utils import to_timestamp
+from fooltrader.utils.utils import to_timestamp, mkdir_for_path
 
 
 class FutureShfeSpider(scrapy.Spider):
@@ -67,6 +67,7 @@ class FutureShfeSpider(scrapy.Spider):
         the_path = response.meta['the_path']
 
         if content_type_header.decode("utf-8") == 'application/zip':
+            mkdir_for_path(the_path)
             with open(the_path, "wb") as f:
                 f.write(response.body)
                 f.flush()
@@ -83,6 +84,7 @@ class FutureShfeSpider(scrapy.Spider):
         the_path = response.meta['the_path']
 
         # 缓存数据
+        mkdir_for_path(the_path)
         with open(the_path, "wb") as f:
             f.write(response.body)
             f.flush()
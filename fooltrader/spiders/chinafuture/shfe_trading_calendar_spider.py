@@ -10,7 +10,7 @@ from scrapy import signals
 
 from fooltrader.api.technical import get_trading_calendar
 from fooltrader.contract.files_contract import get_exchange_trading_calendar_path
-from fooltrader.utils.utils import next_date, to_time_str, drop_duplicate
+from fooltrader.utils.utils import next_date, to_time_str, drop_duplicate, mkdir_for_path
 
 
 class ShfeTradingCalendarSpider(scrapy.Spider):
@@ -67,6 +67,7 @@ class ShfeTradingCalendarSpider(scrapy.Spider):
             result_list = sorted(result_list)
 
             the_path = get_exchange_trading_calendar_path('future', 'shfe')
+            mkdir_for_path(the_path)
             with open(the_path, 'w') as outfile:
                 json.dump(result_list, outfile)
 
@@ -11,6 +11,7 @@ from scrapy import signals
 from fooltrader.consts import DEFAULT_SH_HEADER, DEFAULT_SZ_HEADER
 from fooltrader.contract import files_contract
 from fooltrader.contract.data_contract import STOCK_META_COL
+from fooltrader.utils.utils import mkdir_for_path
 
 
 class ChinaStockListSpider(scrapy.Spider):
@@ -61,6 +62,7 @@ class ChinaStockListSpider(scrapy.Spider):
                 df_current = df_current.append(df.loc[diff, :], ignore_index=False)
                 df_current = df_current.loc[:, STOCK_META_COL]
                 df_current.columns = STOCK_META_COL
+                mkdir_for_path(path)
                 df_current.to_csv(path, index=False)
 
     @classmethod
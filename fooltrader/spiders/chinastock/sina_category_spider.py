@@ -10,7 +10,7 @@ from scrapy import signals
 
 from fooltrader.api.technical import get_security_list
 from fooltrader.contract.files_contract import get_security_list_path
-from fooltrader.utils.utils import get_exchange
+from fooltrader.utils.utils import get_exchange, mkdir_for_path
 
 
 class SinaCategorySpider(scrapy.Spider):
@@ -95,7 +95,9 @@ class SinaCategorySpider(scrapy.Spider):
 
     def spider_closed(self, spider, reason):
         if self.sh_df[self.category_type].any():
+            mkdir_for_path(get_security_list_path('stock', 'sh'))
             self.sh_df.to_csv(get_security_list_path('stock', 'sh'), index=False)
         if self.sz_df[self.category_type].any():
+            mkdir_for_path(get_security_list_path('stock', 'sz'))
             self.sz_df.to_csv(get_security_list_path('stock', 'sz'), index=False)
         spider.logger.info('Spider closed: %s,%s\n', spider.name, reason)
\ No newline at end of file
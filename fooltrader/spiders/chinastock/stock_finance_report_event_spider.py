@@ -11,7 +11,7 @@ from scrapy import signals
 from fooltrader.api.technical import get_security_list
 from fooltrader.consts import DEFAULT_KDATA_HEADER
 from fooltrader.contract.files_contract import get_finance_report_event_path
-from fooltrader.utils.utils import index_df_with_time
+from fooltrader.utils.utils import index_df_with_time, mkdir_for_path
 
 
 class StockFinanceReportEventSpider(scrapy.Spider):
@@ -93,6 +93,7 @@ class StockFinanceReportEventSpider(scrapy.Spider):
             if not df.empty:
                 df = df.drop_duplicates()
                 df = index_df_with_time(df)
+                mkdir_for_path(path)
                 df.to_csv(path, index=False)
         except Exception as e:
             self.logger.exception('error when getting k data url={}'.format(response.url))
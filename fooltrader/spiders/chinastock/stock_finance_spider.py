@@ -8,6 +8,7 @@ from fooltrader.api.technical import get_security_list
 from fooltrader.consts import DEFAULT_BALANCE_SHEET_HEADER
 from fooltrader.contract.files_contract import get_balance_sheet_path, get_income_statement_path, \
     get_cash_flow_statement_path
+from fooltrader.utils.utils import mkdir_for_path
 
 
 class StockFinanceSpider(scrapy.Spider):
@@ -58,6 +59,7 @@ class StockFinanceSpider(scrapy.Spider):
         if content_type_header.decode("utf-8") == 'application/vnd.ms-excel':
             path = response.meta['path']
             item = response.meta['item']
+            mkdir_for_path(path)
             with open(path, "wb") as f:
                 f.write(response.body)
                 f.flush()
@@ -18,7 +18,7 @@ from fooltrader.consts import DEFAULT_KDATA_HEADER
 # （三）实现扭亏为盈。
 from fooltrader.contract.data_contract import EVENT_STOCK_FINANCE_FORECAST_COL
 from fooltrader.contract.files_contract import get_finance_forecast_event_path
-from fooltrader.utils.utils import index_df_with_time
+from fooltrader.utils.utils import index_df_with_time, mkdir_for_path
 
 
 class StockForecastSpider(scrapy.Spider):
@@ -92,6 +92,7 @@ class StockForecastSpider(scrapy.Spider):
                 df = df.drop_duplicates()
                 df = df[:, EVENT_STOCK_FINANCE_FORECAST_COL]
                 df = index_df_with_time(df)
+                mkdir_for_path(get_finance_forecast_event_path(security_item))
                 df.to_csv(get_finance_forecast_event_path(security_item), index=False)
 
 
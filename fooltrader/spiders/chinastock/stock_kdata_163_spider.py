@@ -4,7 +4,6 @@ import io
 import os
 from datetime import datetime
 
-import pandas as pd
 import scrapy
 from scrapy import Request
 from scrapy import signals
@@ -13,9 +12,11 @@ from fooltrader.api.technical import get_security_list
 from fooltrader.contract.data_contract import KDATA_STOCK_COL, KDATA_COLUMN_163, KDATA_INDEX_COLUMN_163, \
     KDATA_INDEX_COL
 from fooltrader.contract.files_contract import get_kdata_path
+from fooltrader.datamanager.kdata_store import append_stock_kdata_163
 from fooltrader.settings import STOCK_START_CODE, STOCK_END_CODE
 from fooltrader.spiders.common import random_proxy
 from fooltrader.utils import utils
+from fooltrader.utils.pd_utils import kdata_df_append
 
 
 class StockKdata163Spider(scrapy.Spider):
@@ -72,12 +73,6 @@ class StockKdata163Spider(scrapy.Spider):
         item = response.meta['item']
 
         try:
-            # 已经保存的csv数据
-            if os.path.exists(path):
-                saved_df = pd.read_csv(path, dtype=str)
-            else:
-                saved_df = pd.DataFrame()
-
             df = utils.read_csv(io.BytesIO(response.body), encoding='GB2312', na_values='None')
             df['code'] = item['code']
             df['securityId'] = item['id']
@@ -100,23 +95,19 @@ class StockKdata163Spider(scrapy.Spider):
                 df['factor'] = None
                 df.columns = KDATA_STOCK_COL
 
-            # 合并到当前csv中
-            saved_df = saved_df.append(df, ignore_index=True)
-
+            # 只追加新的数据,不用重写整个文件
             if item['type'] == 'index':
-                saved_df = saved_df.dropna(subset=KDATA_INDEX_COLUMN_163)
+                df = df.dropna(subset=KDATA_INDEX_COLUMN_163)
                 # 保证col顺序
-                saved_df = saved_df.loc[:, KDATA_INDEX_COL]
+                df = df.loc[:, KDATA_INDEX_COL]
+
+                kdata_df_append(df, path)
             else:
-                saved_df = saved_df.dropna(subset=KDATA_COLUMN_163)
+                df = df.dropna(subset=KDATA_COLUMN_163)
                 # 保证col顺序
-                saved_df = saved_df.loc[:, KDATA_STOCK_COL]
+                df = df.loc[:, KDATA_STOCK_COL]
 
-            saved_df = saved_df.drop_duplicates(subset='timestamp', keep='last')
-            saved_df = saved_df.set_index(saved_df['timestamp'],drop=False)
-            saved_df.index = pd.to_datetime(saved_df.index)
-            saved_df = saved_df.sort_index()
-            saved_df.to_csv(path, index=False)
+                append_stock_kdata_163(item, df)
         except Exception as e:
             self.logger.exception('error when getting k data url={} error={}'.format(response.url, e))
 
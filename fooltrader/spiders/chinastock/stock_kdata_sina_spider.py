@@ -12,9 +12,10 @@ from fooltrader.api.technical import get_security_list, kdata_exist, get_kdata,
 from fooltrader.consts import DEFAULT_KDATA_HEADER
 from fooltrader.contract import data_contract, files_contract
 from fooltrader.contract.files_contract import get_kdata_path, get_kdata_dir
+from fooltrader.datamanager.kdata_store import save_stock_kdata_163
 from fooltrader.settings import STOCK_START_CODE, STOCK_END_CODE
-from fooltrader.utils.pd_utils import pd_read_csv
-from fooltrader.utils.utils import get_quarters, get_year_quarter
+from fooltrader.utils.pd_utils import pd_read_kdata, kdata_df_save
+from fooltrader.utils.utils import get_quarters, get_year_quarter, mkdir_for_path
 
 logger = logging.getLogger(__name__)
 
@@ -107,6 +108,7 @@ class StockKDataSinaSpider(scrapy.Spider):
                                    factor]
                 else:
                     df.loc[idx] = [timestamp, item['code'], low, open, close, high, volume, turnover, securityId]
+            mkdir_for_path(path)
             df.to_csv(path, index=False)
         except Exception as e:
             self.logger.exception('error when getting k data url={} error={}'.format(response.url, e))
@@ -147,12 +149,12 @@ class StockKDataSinaSpider(scrapy.Spider):
             df1 = df1.loc[:, data_contract.KDATA_COLUMN_SINA_FQ]
         else:
             df1 = df1.loc[:, data_contract.KDATA_COLUMN_SINA]
-        df1.to_csv(the_path, index=False)
+        kdata_df_save(df1, the_path)
 
     @staticmethod
     def add_factor_to_163(security_item):
         path_163 = get_kdata_path(security_item, source='163', fuquan='bfq')
-        df_163 = pd_read_csv(path_163)
+        df_163 = pd_read_kdata(path_163)
 
         if 'factor' in df_163.columns:
             df = df_163[df_163['factor'].isna()]
@@ -162,11 +164,18 @@ class StockKDataSinaSpider(scrapy.Spider):
                 return
 
         path_sina = get_kdata_path(security_item, source='sina', fuquan='hfq')
-        df_sina = pd_read_csv(path_sina)
+        df_sina = pd_read_kdata(path_sina)
 
         df_sina = df_sina[~df_sina.index.duplicated(keep='first')]
-        df_163['factor'] = df_sina['factor']
-        df_163.to_csv(path_163, index=False)
+        factor = df_sina['factor'].reindex(df_163.index)
+
+        # factor变了的行需要重新算后复权价格
+        if 'factor' in df_163.columns and 'hfqClose' in df_163.columns:
+            changed = ~((df_163['factor'] == factor) | (df_163['factor'].isna() & factor.isna()))
+            df_163.loc[changed, 'hfqClose'] = None
+
+        df_163['factor'] = factor
+        save_stock_kdata_163(security_item, df_163)
 
     @staticmethod
     def merge_kdata_to_one(security_item=None, replace=False, fuquan='bfq'):
@@ -194,7 +203,7 @@ class StockKDataSinaSpider(scrapy.Spider):
 
                 if os.path.exists(the_dir):
                     files = [os.path.join(the_dir, f) for f in os.listdir(the_dir) if
-                             ('dayk.csv' not in f and os.path.isfile(os.path.join(the_dir, f)))]
+                             ('dayk.' not in f and os.path.isfile(os.path.join(the_dir, f)))]
                     for f in files:
                         df = df.append(pd.read_csv(f, dtype=str), ignore_index=True)
                 if df.size > 0:
@@ -203,7 +212,7 @@ class StockKDataSinaSpider(scrapy.Spider):
                     df = df.sort_index()
                     logger.info("{} to {}".format(security_item['code'], dayk_path))
                     if replace:
-                        df.to_csv(dayk_path, index=False)
+                        kdata_df_save(df, dayk_path)
                     else:
                         StockKDataSinaSpider.merge_to_current_kdata(security_item, df, fuquan=fuquan)
 
@@ -13,6 +13,7 @@ from fooltrader.api.technical import get_kdata
 from fooltrader.consts import DEFAULT_SH_SUMMARY_HEADER
 from fooltrader.contract.data_contract import KDATA_INDEX_COL
 from fooltrader.contract.files_contract import get_kdata_path
+from fooltrader.utils.pd_utils import kdata_df_save
 from fooltrader.utils.utils import to_float
 
 
@@ -136,5 +137,5 @@ class StockSummarySpider(scrapy.Spider):
     def spider_closed(self, spider, reason):
         self.current_df = self.current_df.loc[:, KDATA_INDEX_COL]
         print(self.current_df)
-        self.current_df.to_csv(get_kdata_path(item=self.security_item), index=False)
+        kdata_df_save(self.current_df, get_kdata_path(item=self.security_item))
         spider.logger.info('Spider closed: %s,%s\n', spider.name, reason)
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def get_file_stat(the_path):
+    try:
+        file_stat = os.stat(the_path)
+        return file_stat.st_mtime_ns, file_stat.st_size
+    except OSError:
+        return None
+
+
+class FrameCache(object):
+    """
+    size-bounded cache for the DataFrames parsed from files.
+
+    the entry is invalidated when the file's path,mtime or size changes,and the entries are evicted by the policy
+    when the memory budget is exceeded.the caller gets a copy by default,so it could modify the result freely.
+
+    Parameters
+    ----------
+    max_bytes : int
+        the memory budget,0 for disabling the cache
+    policy : str
+        {'lru','fifo'},default:'lru'
+
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024, policy='lru'):
+        self.max_bytes = max_bytes
+        self.policy = policy
+
+        self._lock = threading.RLock()
+        # key -> (stat, df, size)
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, the_path, loader, depend_paths=None, copy=True):
+        """
+        get the DataFrame of the file,load it by loader if not cached.
+
+        Parameters
+        ----------
+        key : hashable
+            the cache key
+        the_path : str
+            the file path
+        loader : function
+            loader(the_path) returns the DataFrame
+        depend_paths : list
+            the files read together with the_path
+        copy : bool
+            whether return a copy of the cached DataFrame,set False only if the result is not modified
+
+        Returns
+        -------
+        DataFrame
+
+        """
+        stat = get_file_stat(the_path)
+
+        if self.max_bytes <= 0 or stat is None:
+            return loader(the_path)
+
+        # 存储目录可能会切换,路径也作为校验的一部分
+        stat = (the_path,) + stat
+        # 读取时一起合并的文件,比如k线的增量文件
+        if depend_paths:
+            stat = stat + tuple(get_file_stat(depend_path) for depend_path in depend_paths)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == stat:
+                self.hits += 1
+                if self.policy == 'lru':
+                    self._entries.move_to_end(key)
+                return entry[1].copy() if copy else entry[1]
+
+            self.misses += 1
+            if entry:
+                self._remove(key)
+
+        df = loader(the_path)
+
+        size = int(df.memory_usage(deep=True).sum())
+        if size <= self.max_bytes:
+            with self._lock:
+                if key in self._entries:
+                    self._remove(key)
+                self._entries[key] = (stat, df.copy(), size)
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    evict_key = next(iter(self._entries))
+                    self._remove(evict_key)
+                    self.evictions += 1
+        return df
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries = OrderedDict()
+            self._bytes = 0
+
+    def resize(self, max_bytes, policy=None):
+        with self._lock:
+            self.max_bytes = max_bytes
+            if policy:
+                self.policy = policy
+            while self._entries and self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes}
+
+
+def get_object_size(obj):
+    """
+    approximate memory size of the object,recursive for dict,list,tuple and set.
+    """
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(get_object_size(key) + get_object_size(value) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(get_object_size(item) for item in obj)
+    return size
+
+
+class LruCache(object):
+    """
+    size-bounded lru cache for the objects,the least recently used entries are evicted when the memory budget
+    is exceeded.
+
+    Parameters
+    ----------
+    max_bytes : int
+        the memory budget
+    sizeof : function
+        the function to get the size of the value,default:get_object_size
+
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, sizeof=get_object_size):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+
+        self._lock = threading.RLock()
+        # key -> (value, size)
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size)
+            self._bytes += size
+            # 至少保留刚放进去的
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries = OrderedDict()
+            self._bytes = 0
+
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes}
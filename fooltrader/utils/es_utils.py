@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
 import logging
+import queue
+import threading
+import time
 from ast import literal_eval
 
+from elasticsearch import helpers
 from elasticsearch_dsl import Index
 
-from fooltrader import es_client
+from fooltrader import es_client, settings
 from fooltrader.utils.utils import to_timestamp
 
 logger = logging.getLogger(__name__)
@@ -94,3 +98,175 @@ def es_resp_to_payload(resp, csv=False):
         'total': resp['hits']['total'],
         'data': datas
     }
+
+
+def es_bulk_index(actions, chunk_size=None, thread_count=None, max_retries=None):
+    """
+    index the actions in parallel,the actions could be a generator,so the documents needn't be all in memory.
+
+    the chunks are sent by thread_count threads through a bounded queue,and the chunk is retried
+    with exponential backoff when es rejects it by 429.
+
+    Parameters
+    ----------
+    actions : iterable
+        the bulk actions
+    chunk_size : int
+        the documents count for one bulk request,default:settings.ES_BULK_CHUNK_SIZE
+    thread_count : int
+        the thread count,default:settings.ES_BULK_THREAD_COUNT
+    max_retries : int
+        the max retries when 429,default:settings.ES_BULK_MAX_RETRIES
+
+    Returns
+    -------
+    tuple
+        (success count,failed count)
+
+    """
+    if not chunk_size:
+        chunk_size = settings.ES_BULK_CHUNK_SIZE
+    if not thread_count:
+        thread_count = settings.ES_BULK_THREAD_COUNT
+    if max_retries is None:
+        max_retries = settings.ES_BULK_MAX_RETRIES
+
+    # 队列有界,索引跟不上时生产者会等待
+    chunk_queue = queue.Queue(maxsize=thread_count * 2)
+    result = {'success': 0, 'failed': 0}
+    lock = threading.Lock()
+
+    def index_chunks():
+        while True:
+            chunk = chunk_queue.get()
+            if chunk is None:
+                break
+            success = failed = 0
+            # 出任何错都只算这个chunk失败,线程继续取队列,生产者不会一直等待
+            try:
+                for ok, info in helpers.streaming_bulk(es_client, chunk, chunk_size=chunk_size, raise_on_error=False,
+                                                       raise_on_exception=False, max_retries=max_retries):
+                    if ok:
+                        success += 1
+                    else:
+                        failed += 1
+                        logger.error("index error:{}".format(info))
+            except Exception:
+                logger.exception("bulk index {} actions failed".format(len(chunk)))
+                failed = len(chunk) - success
+            with lock:
+                result['success'] += success
+                result['failed'] += failed
+
+    threads = [threading.Thread(target=index_chunks, name='es_bulk_{}'.format(i), daemon=True) for i in
+               range(thread_count)]
+    for the_thread in threads:
+        the_thread.start()
+
+    start_time = time.time()
+
+    # actions出错时也要结束索引线程,已经入队的会索引完
+    try:
+        chunk = []
+        for action in actions:
+            chunk.append(action)
+            if len(chunk) >= chunk_size:
+                chunk_queue.put(chunk)
+                chunk = []
+        if chunk:
+            chunk_queue.put(chunk)
+    finally:
+        for _ in threads:
+            chunk_queue.put(None)
+        for the_thread in threads:
+            the_thread.join()
+
+    cost = max(time.time() - start_time, 1e-6)
+    logger.info("bulk index success:{} failed:{},{:.0f} docs/sec".format(result['success'], result['failed'],
+                                                                          (result['success'] + result[
+                                                                              'failed']) / cost))
+    return result['success'], result['failed']
+
+
+class EsBulkWriter(object):
+    """
+    write the actions to es in bulk asynchronously,a daemon thread flushes them when the count reaches
+    chunk_size or every flush_interval seconds,so the caller is not blocked by es.
+
+    Parameters
+    ----------
+    chunk_size : int
+        the documents count for one bulk request,default:settings.ES_BULK_CHUNK_SIZE
+    flush_interval : float
+        the max seconds an action waits in the buffer
+    max_pending : int
+        the max actions waiting,add() blocks when es could not keep up
+    ignore_status : tuple
+        the error status ignored,e.g. (409,) for the 'create' actions of the existing documents
+
+    """
+
+    def __init__(self, chunk_size=None, flush_interval=1.0, max_pending=100000, ignore_status=()):
+        self.chunk_size = chunk_size if chunk_size else settings.ES_BULK_CHUNK_SIZE
+        self.flush_interval = flush_interval
+        self.ignore_status = ignore_status
+
+        self.success = 0
+        self.failed = 0
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name='es_bulk_writer', daemon=True)
+        self._thread.start()
+
+    def add(self, action):
+        self._queue.put(action)
+
+    def flush(self):
+        """
+        block until all the added actions are written.
+        """
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            chunk = []
+            closing = False
+            deadline = time.time() + self.flush_interval
+            while len(chunk) < self.chunk_size:
+                try:
+                    action = self._queue.get(timeout=max(deadline - time.time(), 0.001))
+                except queue.Empty:
+                    break
+                if action is None:
+                    self._queue.task_done()
+                    closing = True
+                    break
+                chunk.append(action)
+
+            if chunk:
+                self._write(chunk)
+                for _ in chunk:
+                    self._queue.task_done()
+
+            if closing:
+                break
+
+    def _write(self, chunk):
+        try:
+            for ok, info in helpers.streaming_bulk(es_client, chunk, chunk_size=self.chunk_size, raise_on_error=False,
+                                                   raise_on_exception=False,
+                                                   max_retries=settings.ES_BULK_MAX_RETRIES):
+                if ok:
+                    self.success += 1
+                elif list(info.values())[0].get('status') in self.ignore_status:
+                    continue
+                else:
+                    self.failed += 1
+                    logger.error("index error:{}".format(info))
+        except Exception as e:
+            self.failed += len(chunk)
+            logger.exception("bulk write {} actions failed".format(len(chunk)), e)
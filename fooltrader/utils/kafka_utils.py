@@ -1,21 +1,190 @@
 # -*- coding: utf-8 -*-
 import json
 import logging
+import math
+import numbers
+import struct
 
 from kafka import KafkaConsumer, TopicPartition
 
-from fooltrader import KAFKA_HOST
-from fooltrader.contract.kafka_contract import get_kafka_tick_topic
+from fooltrader import KAFKA_HOST, settings
+from fooltrader.contract.kafka_contract import get_kafka_tick_topic, get_kafka_topic_schema, KAFKA_MESSAGE_SCHEMAS
 from fooltrader.utils.utils import to_timestamp
 
 logger = logging.getLogger(__name__)
 
+# 二进制消息头:magic,schema id,版本,字段存在的bitmap,字段为null的bitmap
+# 0xFB不会是utf8的首字节,和json消息区分开
+_MAGIC = 0xFB
+_HEADER = struct.Struct('<BBBII')
+_STR_LEN = struct.Struct('<H')
+_NUMBER_STRUCTS = {'d': struct.Struct('<d'), 'q': struct.Struct('<q')}
+
+# (schema id,版本) -> (字段表,字段名->位置)
+_SCHEMA_FIELDS = {}
+# schema名 -> (schema id,最新版本)
+_SCHEMA_LATEST = {}
+for _name, (_schema_id, _versions) in KAFKA_MESSAGE_SCHEMAS.items():
+    for _version, _fields in _versions.items():
+        assert len(_fields) <= 32
+        _SCHEMA_FIELDS[(_schema_id, _version)] = (_fields, {field[0]: i for i, field in enumerate(_fields)})
+    _SCHEMA_LATEST[_name] = (_schema_id, max(_versions))
+
+
+def _is_null(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _is_type_of(value, field_type):
+    if field_type == 's':
+        return isinstance(value, str)
+    if isinstance(value, bool):
+        return False
+    if field_type == 'q':
+        return isinstance(value, numbers.Integral)
+    return isinstance(value, numbers.Real)
+
+
+def _encode_binary(schema_id, version, the_dict):
+    fields, field_index = _SCHEMA_FIELDS[(schema_id, version)]
+    present = 0
+    null = 0
+    parts = []
+    for i, (name, field_type) in enumerate(fields):
+        if name not in the_dict:
+            continue
+        value = the_dict[name]
+        if _is_null(value):
+            present |= 1 << i
+            null |= 1 << i
+        elif _is_type_of(value, field_type):
+            if field_type == 's':
+                value = value.encode('utf8')
+                if len(value) > 0xFFFF:
+                    continue
+                parts.append(_STR_LEN.pack(len(value)))
+                parts.append(value)
+            else:
+                parts.append(_NUMBER_STRUCTS[field_type].pack(value))
+            present |= 1 << i
+
+    # 字段表之外或类型不符的放到尾部,用json编码
+    extras = {key: value for key, value in the_dict.items() if
+              not (key in field_index and present & (1 << field_index[key]))}
+    if extras:
+        parts.append(bytes(json.dumps(extras, ensure_ascii=False, default=str), encoding='utf8'))
+
+    return _HEADER.pack(_MAGIC, schema_id, version, present, null) + b''.join(parts)
+
+
+def encode_message(topic, the_dict, encoding=None):
+    """
+    encode the message by the schema registered for the topic in kafka_contract.
+
+    Parameters
+    ----------
+    topic : str
+        the topic
+    the_dict : dict
+        the message
+    encoding : str
+        {'binary','json'},default:settings.KAFKA_MESSAGE_ENCODING
+
+    Returns
+    -------
+    bytes
+
+    """
+    if not encoding:
+        encoding = settings.KAFKA_MESSAGE_ENCODING
+
+    schema = get_kafka_topic_schema(topic)
+    if encoding == 'binary' and schema:
+        schema_id, version = _SCHEMA_LATEST[schema]
+        return _encode_binary(schema_id, version, the_dict)
+    return bytes(json.dumps(the_dict, ensure_ascii=False), encoding='utf8')
+
+
+def encode_frame(topic, df, encoding=None):
+    """
+    encode every row of the DataFrame as a message.
+
+    Parameters
+    ----------
+    topic : str
+        the topic
+    df : DataFrame
+        the data
+    encoding : str
+        {'binary','json'},default:settings.KAFKA_MESSAGE_ENCODING
+
+    Returns
+    -------
+    list of bytes
+
+    """
+    if not encoding:
+        encoding = settings.KAFKA_MESSAGE_ENCODING
+
+    schema = get_kafka_topic_schema(topic)
+    if encoding == 'binary' and schema:
+        schema_id, version = _SCHEMA_LATEST[schema]
+        return [_encode_binary(schema_id, version, the_dict) for the_dict in df.to_dict('records')]
+    # 整个frame一次序列化
+    return [bytes(the_json, encoding='utf8') for the_json in
+            df.to_json(orient='records', lines=True, force_ascii=False).splitlines()]
+
+
+def decode_message(message):
+    """
+    decode the message,the binary messages are decoded by the schema version in the header,
+    others are decoded as json.
+
+    Parameters
+    ----------
+    message : bytes
+        the message
+
+    Returns
+    -------
+    dict
+
+    """
+    if not message or message[0] != _MAGIC:
+        return json.loads(message.decode('utf8'))
+
+    _, schema_id, version, present, null = _HEADER.unpack_from(message)
+    if (schema_id, version) not in _SCHEMA_FIELDS:
+        raise ValueError("unknown message schema:{} version:{}".format(schema_id, version))
+
+    fields, _ = _SCHEMA_FIELDS[(schema_id, version)]
+    offset = _HEADER.size
+    the_dict = {}
+    for i, (name, field_type) in enumerate(fields):
+        if not present & (1 << i):
+            continue
+        if null & (1 << i):
+            the_dict[name] = None
+        elif field_type == 's':
+            (size,) = _STR_LEN.unpack_from(message, offset)
+            offset += _STR_LEN.size
+            the_dict[name] = message[offset:offset + size].decode('utf8')
+            offset += size
+        else:
+            number_struct = _NUMBER_STRUCTS[field_type]
+            (the_dict[name],) = number_struct.unpack_from(message, offset)
+            offset += number_struct.size
+
+    if offset < len(message):
+        the_dict.update(json.loads(message[offset:].decode('utf8')))
+    return the_dict
+
 
 def get_latest_timestamp_order_from_topic(topic):
     consumer = KafkaConsumer(topic,
                              # client_id='fooltrader',
                              # group_id='fooltrader',
-                             value_deserializer=lambda m: json.loads(m.decode('utf8')),
+                             value_deserializer=decode_message,
                              bootstrap_servers=[KAFKA_HOST])
     topic_partition = TopicPartition(topic=topic, partition=0)
     end_offset = consumer.end_offsets([topic_partition])[topic_partition]
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import threading
+
+
+class LazyObject(object):
+    """
+    proxy of the object created by the factory on first use,e.g. the es,kafka and mongo clients,
+    so importing the module doesn't connect to anything.
+
+    Parameters
+    ----------
+    factory : function
+        the function to create the object
+
+    """
+
+    def __init__(self, factory):
+        self.__dict__['_factory'] = factory
+        self.__dict__['_lock'] = threading.Lock()
+        self.__dict__['_obj'] = None
+
+    def get_object(self):
+        if self._obj is None:
+            with self._lock:
+                if self._obj is None:
+                    self.__dict__['_obj'] = self._factory()
+        return self._obj
+
+    def is_created(self):
+        return self._obj is not None
+
+    def __getattr__(self, name):
+        # 还没初始化,比如unpickle的时候
+        if name in ('_factory', '_lock', '_obj'):
+            raise AttributeError(name)
+        return getattr(self.get_object(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.get_object(), name, value)
+
+    def __getitem__(self, key):
+        return self.get_object()[key]
+
+    def __repr__(self):
+        if self._obj is None:
+            return 'LazyObject({})'.format(getattr(self._factory, '__name__', self._factory))
+        return repr(self._obj)
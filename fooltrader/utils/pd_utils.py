@@ -1,34 +1,253 @@
 # -*- coding: utf-8 -*-
+import csv
 import logging
+import os
+from contextlib import contextmanager
 
+import numpy as np
 import pandas as pd
 
+from fooltrader import settings
+from fooltrader.contract.data_contract import KDATA_STR_COL
+from fooltrader.utils.utils import mkdir_for_path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 logger = logging.getLogger(__name__)
 
+# parquet中用来保存时间索引的列,有序并带有统计信息,读的时候可以按时间过滤
+_PARQUET_INDEX = '__timestamp'
 
-def kdata_df_save(df, to_path, calculate_change=False):
+
+def is_parquet_path(the_path):
+    return the_path.endswith('.parquet')
+
+
+def get_kdata_delta_path(kdata_path):
+    # 163_dayk.csv -> 163_dayk.delta.csv,parquet的增量也用csv,方便追加
+    return os.path.splitext(kdata_path)[0] + '.delta.csv'
+
+
+@contextmanager
+def kdata_lock(kdata_path):
+    """
+    the inter-process lock of the kdata,the appending and the compaction of the same kdata are serialized,
+    so the bars appended by other spiders during the compaction are not lost.
+    """
+    # 没有fcntl的平台(windows)不加锁
+    if fcntl is None:
+        yield
+        return
+
+    lock_path = os.path.splitext(kdata_path)[0] + '.lock'
+    mkdir_for_path(lock_path)
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        # close会释放锁
+        os.close(fd)
+
+
+def _normalize_kdata(df):
     df = df.drop_duplicates(subset='timestamp', keep='last')
     df = df.set_index(df['timestamp'], drop=False)
     df.index = pd.to_datetime(df.index)
-    df = df.sort_index()
+    return df.sort_index()
+
+
+def _calculate_change(df, pre_close=None):
+    """
+    fill the missing preClose,change,changePct with the close of the previous bar,
+    the rows which have them all are kept.
+
+    Parameters
+    ----------
+    df : DataFrame
+        the kdata sorted by timestamp
+    pre_close : float
+        the close before the first bar
+
+    Returns
+    -------
+    DataFrame
+
+    """
+    change_cols = ['preClose', 'change', 'changePct']
+    for col in change_cols:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+        else:
+            df[col] = np.nan
+
+    need_fill = df[change_cols].isna().any(axis=1).values
+    if not need_fill.any():
+        return df
+
+    close = pd.to_numeric(df['close'], errors='coerce')
+    pre_closes = close.shift(1)
+    if pre_close is not None:
+        pre_closes.iat[0] = pre_close
+
+    # 没有前收盘价的不填
+    mask = need_fill & pre_closes.notna().values
+    change = close - pre_closes
+
+    df.loc[mask, 'preClose'] = pre_closes.values[mask]
+    df.loc[mask, 'change'] = change.values[mask]
+    df.loc[mask, 'changePct'] = (change / close).values[mask]
+    return df
+
+
+def kdata_df_save(df, to_path, calculate_change=False):
+    """
+    save the whole kdata to the path,the file is replaced atomically and the delta segment is dropped,
+    so df should contain all the data,e.g. read by pd_read_kdata.
+
+    Parameters
+    ----------
+    df : DataFrame
+        the kdata
+    to_path : str
+        the kdata path,csv or parquet according to the file extension
+    calculate_change : bool
+        whether calculate the preClose,change,changePct which are missing
+
+    """
+    df = _normalize_kdata(df)
 
     if calculate_change:
-        pre_close = None
-        for index in df.index:
-            try:
-                if pd.notna(df.loc[index, ['preClose', 'change', 'changePct']]).all():
-                    continue
-                current_close = df.loc[index, 'close']
-                if pre_close:
-                    df.loc[index, 'preClose'] = pre_close
-                    change = current_close - pre_close
-                    df.loc[index, 'change'] = change
-                    df.loc[index, 'changePct'] = change / current_close
-                pre_close = df.loc[index, 'close']
-            except  Exception as e:
-                logger.exception("pre_close:{},current:{}".format(pre_close, df.loc[index, :].to_dict()), e)
-
-    df.to_csv(to_path, index=False)
+        df = _calculate_change(df)
+
+    with kdata_lock(to_path):
+        _kdata_save(df, to_path)
+
+
+def _kdata_save(df, to_path):
+    # 调用者持有kdata_lock
+    _kdata_write(df, to_path)
+
+    delta_path = get_kdata_delta_path(to_path)
+    if os.path.exists(delta_path):
+        os.remove(delta_path)
+
+
+def _kdata_write(df, to_path):
+    mkdir_for_path(to_path)
+
+    tmp_path = to_path + '.tmp'
+    if is_parquet_path(to_path):
+        _kdata_to_parquet(df, tmp_path)
+    else:
+        df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, to_path)
+
+
+def kdata_df_append(df, to_path, calculate_change=False, pre_close=None):
+    """
+    append the new bars to the delta segment of the kdata,the io is proportional to the new rows.
+
+    the out-of-order or duplicate bars are ok,the later one wins when reading,
+    and the delta segment is compacted to the kdata when it's bigger than settings.KDATA_DELTA_MAX_SIZE.
+
+    Parameters
+    ----------
+    df : DataFrame
+        the new kdata
+    to_path : str
+        the kdata path,csv or parquet according to the file extension
+    calculate_change : bool
+        whether calculate the preClose,change,changePct which are missing
+    pre_close : float
+        the close before the new bars,used for calculating change
+
+    """
+    if df.empty:
+        return
+
+    df = _normalize_kdata(df)
+    if calculate_change:
+        df = _calculate_change(df, pre_close=pre_close)
+
+    delta_path = get_kdata_delta_path(to_path)
+
+    # 合并期间其他进程的追加会等待,不会写到正在合并的增量里
+    with kdata_lock(to_path):
+        if not os.path.exists(to_path):
+            _kdata_save(df, to_path)
+            return
+
+        header = None
+        if os.path.exists(delta_path):
+            with open(delta_path, encoding='utf-8') as f:
+                header = next(csv.reader(f), None)
+            # 新的列,先合并再重新开始增量
+            if not header or set(df.columns) - set(header):
+                _kdata_compact(to_path)
+                header = None
+
+        content = df.reindex(columns=header if header else df.columns).to_csv(index=False, header=header is None)
+
+        # 一次write追加,不会写出半行
+        fd = os.open(delta_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, content.encode('utf-8'))
+        finally:
+            os.close(fd)
+
+        if os.path.getsize(delta_path) > settings.KDATA_DELTA_MAX_SIZE:
+            _kdata_compact(to_path)
+
+
+def kdata_compact(kdata_path):
+    """
+    merge the delta segment to the kdata.
+
+    Parameters
+    ----------
+    kdata_path : str
+        the kdata path
+
+    Returns
+    -------
+    bool
+        whether compacted
+
+    """
+    with kdata_lock(kdata_path):
+        return _kdata_compact(kdata_path)
+
+
+def _kdata_compact(kdata_path):
+    # 调用者持有kdata_lock
+    delta_path = get_kdata_delta_path(kdata_path)
+    if not os.path.exists(delta_path):
+        return False
+
+    df = _merge_kdata_delta(_read_kdata_file(kdata_path), delta_path)
+    if df.empty:
+        return False
+    _kdata_write(_normalize_kdata(df), kdata_path)
+    os.remove(delta_path)
+
+    # 合并不会改变factor,meta(163_dayk_meta.json)仍然有效,保持它比k线文件新
+    meta_path = os.path.splitext(kdata_path)[0] + '_meta.json'
+    if os.path.exists(meta_path):
+        os.utime(meta_path)
+    return True
+
+
+def _kdata_to_parquet(df, to_path):
+    df = df.copy()
+    for col in df.columns:
+        if col not in KDATA_STR_COL:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    df.index.name = _PARQUET_INDEX
+    df.to_parquet(to_path)
 
 
 def df_for_date_range(df, start_date=None, end_date=None):
@@ -57,3 +276,90 @@ def pd_read_csv(csv_path, converters=None, index='timestamp', generate_id=False)
             df.index = pd.to_datetime(df.index)
             df = df.sort_index()
     return df
+
+
+def _read_kdata_csv(the_path, columns=None, start_date=None, end_date=None):
+    usecols = None
+    if columns is not None:
+        usecols = lambda col: col in columns or col == 'timestamp'
+    df = pd.read_csv(the_path, dtype={"code": str, 'timestamp': str}, usecols=usecols)
+
+    if not df.empty:
+        df = df.set_index(df['timestamp'], drop=False)
+        df.index = pd.to_datetime(df.index)
+        df = df.sort_index()
+        df = df_for_date_range(df, start_date=start_date, end_date=end_date)
+        if columns is not None and 'timestamp' not in columns:
+            df = df.drop(columns=['timestamp'])
+    return df
+
+
+def _read_kdata_file(kdata_path, columns=None, start_date=None, end_date=None):
+    if is_parquet_path(kdata_path):
+        filters = []
+        if start_date:
+            filters.append((_PARQUET_INDEX, '>=', pd.Timestamp(start_date)))
+        if end_date:
+            filters.append((_PARQUET_INDEX, '<=', pd.Timestamp(end_date)))
+
+        df = pd.read_parquet(kdata_path, columns=columns, filters=filters if filters else None)
+        df.index.name = 'timestamp'
+        return df
+    return _read_kdata_csv(kdata_path, columns=columns, start_date=start_date, end_date=end_date)
+
+
+def _merge_kdata_delta(df, delta_path, columns=None, start_date=None, end_date=None):
+    # 可能刚好被合并掉
+    try:
+        df_delta = _read_kdata_csv(delta_path, columns=columns, start_date=start_date, end_date=end_date)
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        return df
+
+    if df_delta.empty:
+        return df
+    if df.empty:
+        return df_delta
+    df = pd.concat([df, df_delta], sort=False)
+    return df[~df.index.duplicated(keep='last')].sort_index()
+
+
+def pd_read_kdata(kdata_path, generate_id=False, columns=None, start_date=None, end_date=None):
+    """
+    read the kdata file,csv or parquet according to the file extension,the delta segments are merged.
+
+    Parameters
+    ----------
+    kdata_path : str
+        the kdata file path
+    generate_id : bool
+        whether generate the id column
+    columns : list
+        the columns to read,default:None(all columns)
+    start_date : TimeStamp str or TimeStamp
+        start date
+    end_date : TimeStamp str or TimeStamp
+        end date
+
+    Returns
+    -------
+    DataFrame
+        indexed by timestamp
+
+    """
+    if columns is not None:
+        columns = list(columns)
+        if generate_id:
+            columns = columns + [col for col in ['securityId', 'timestamp'] if col not in columns]
+
+    df = _read_kdata_file(kdata_path, columns=columns, start_date=start_date, end_date=end_date)
+
+    # 合并增量
+    df = _merge_kdata_delta(df, get_kdata_delta_path(kdata_path), columns=columns, start_date=start_date,
+                            end_date=end_date)
+
+    # generate id if need
+    if generate_id and not df.empty and 'id' not in df.columns and 'securityId' in df.columns \
+            and 'timestamp' in df.columns:
+        df['id'] = df['securityId'] + '_' + df['timestamp']
+
+    return df
@@ -188,8 +188,16 @@ def read_csv(f, encoding, sep=None, na_values=None):
             raise e
 
 
+def mkdir_for_path(the_path):
+    # 目录在写文件时才创建
+    the_dir = os.path.dirname(the_path)
+    if the_dir and not os.path.exists(the_dir):
+        os.makedirs(the_dir, exist_ok=True)
+
+
 def sina_tick_to_csv(security_item, the_content, the_date):
     csv_path = get_tick_path(security_item, the_date)
+    mkdir_for_path(csv_path)
     df = read_csv(the_content, "GB2312", sep='\s+')
     df = df.loc[:, ['成交时间', '成交价', '成交量(手)', '成交额(元)', '性质']]
     df.columns = TICK_COL
@@ -0,0 +1,239 @@
+import importlib
+import numpy as np
+import pandas as pd
+import pytest
+
+from fooltrader.api import technical, computing, backtest
+from fooltrader.bot.action.account_action import AccountService
+from fooltrader.bot import sweep_runner
+from fooltrader.bot.base_bot import BaseBot
+from fooltrader.utils import es_utils
+
+
+class ReplayBot(BaseBot):
+    def on_init(self):
+        self.need_account = False
+        self.start_date = '2017-01-01'
+        self.end_date = '2017-12-31'
+        self.events = []
+
+    def on_event(self, event_item):
+        self.events.append((self.current_time, event_item))
+
+
+def test_replay_kdata_from_file():
+    bot = ReplayBot(security_item='600977')
+    assert bot.quote_source == 'file'
+    bot.run()
+
+    df = technical.get_kdata('600977', start_date='2017-01-01', end_date='2017-12-31', fuquan='hfq')
+    assert [timestamp for timestamp, _ in bot.events] == list(df.index)
+
+
+def test_account_service_in_memory():
+    security_id = 'stock_sh_600977'
+    account_service = AccountService(bot_name='test', timestamp=pd.Timestamp('2017-01-03'), base_capital=100000,
+                                     security_ids=[security_id], start_date='2017-01-01', end_date='2017-12-31',
+                                     persist=False)
+
+    df = technical.get_kdata(security_id, start_date='2017-01-01', end_date='2017-12-31', fuquan='hfq')
+    price = df['hfqClose'].iat[0]
+
+    # 查询不会增加仓位
+    assert account_service.get_current_position(security_id).longAmount == 0
+    assert account_service.get_account().positions == []
+
+    account_service.buy(security_id, current_price=price, order_amount=100)
+    position = account_service.get_current_position(security_id)
+    assert position.longAmount == 100
+    assert position.availableLong == 0
+    assert account_service.account.cash == pytest.approx(100000 - 100 * price * 1.002)
+
+    account_service.calculate_closing_account(df.index[10])
+    position = account_service.get_current_position(security_id)
+    assert position.availableLong == 100
+    assert position.value == pytest.approx(100 * df['hfqClose'].iat[10])
+    assert account_service.account.allValue == pytest.approx(account_service.account.cash + position.value)
+
+    account_service.close_long(security_id, current_price=df['hfqClose'].iat[10], order_amount=100)
+    assert account_service.get_current_position(security_id).longAmount == 0
+
+    # 初始和收盘的快照
+    assert len(account_service.snapshots) == 2
+    assert account_service.snapshots[-1]['closing']
+    account_service.flush()
+    assert account_service.snapshots == []
+
+
+def test_vectorized_backtest():
+    close = technical.get_kdata_panel(codes=['600977', '300027', '300550'], start_date='2017-01-01',
+                                      end_date='2017-12-31', fuquan='hfq', columns=['close'], pivot=True)['close']
+
+    signals = (computing.panel_ma(close, window=5) > computing.panel_ma(close, window=20)).astype(float)
+    # 停牌
+    prices = close.copy()
+    prices.iloc[60:70, 0] = np.nan
+    result = backtest.backtest(signals, prices, base_capital=100000)
+
+    # 停牌期间不交易
+    held = result['position'].iloc[61:71, 0]
+    assert (held == held.iat[0]).all() and held.iat[0] > 0
+
+    # 逐日计算对比,停牌的保持之前的仓位
+    weights = pd.DataFrame(0.0, index=prices.index, columns=prices.columns)
+    pre_weight = pd.Series(0.0, index=prices.columns)
+    for timestamp in prices.index:
+        frozen = prices.loc[timestamp].isna()
+        weight = signals.loc[timestamp].fillna(0).where(~frozen, 0)
+        budget = max(1 - pre_weight[frozen].abs().sum(), 0)
+        if weight.abs().sum() > budget:
+            weight = weight * budget / weight.abs().sum()
+        pre_weight = weight.where(~frozen, pre_weight)
+        weights.loc[timestamp] = pre_weight
+
+    pre_position = pd.Series(0.0, index=close.columns)
+    returns = prices.ffill().pct_change().fillna(0)
+    equity = 100000
+    for i, timestamp in enumerate(close.index):
+        position = weights.iloc[i - 1] if i > 0 else pd.Series(0.0, index=close.columns)
+        trade = position - pre_position
+        cost = trade.clip(lower=0).sum() * 0.002 + (-trade).clip(lower=0).sum() * 0.002
+        equity *= 1 + (position * returns.loc[timestamp]).sum() - cost
+        pre_position = position
+        assert result['equity'].loc[timestamp] == pytest.approx(equity)
+
+    df = backtest.backtest_sweep(
+        {(fast, slow): (computing.panel_ma(close, window=fast) > computing.panel_ma(close, window=slow)).astype(float)
+         for fast in (5, 10) for slow in (20, 30)}, prices, chunk_size=3)
+    assert len(df) == 4
+    assert df.loc[(5, 20), 'totalReturn'] == pytest.approx(result['equity'].iat[-1] / 100000 - 1)
+
+
+class MaBot(BaseBot):
+    def on_init(self):
+        self.security_item = '600977'
+        self.start_date = '2017-01-01'
+        self.end_date = '2017-12-31'
+        self.persist_account = False
+        self.window = 5
+        self.closes = []
+
+    def on_event(self, event_item):
+        self.trade(event_item)
+        self.account_service.calculate_closing_account(self.current_time)
+
+    def trade(self, event_item):
+        self.closes.append(event_item['hfqClose'])
+        if len(self.closes) >= self.window:
+            close = self.closes[-1]
+            ma = sum(self.closes[-self.window:]) / self.window
+            position = self.account_service.get_current_position(self.security_item['id'])
+            if close > ma and position.longAmount == 0:
+                self.account_service.buy(self.security_item['id'], current_price=close, order_pct=1.0)
+            elif close < ma and position.availableLong > 1:
+                self.account_service.close_long(self.security_item['id'], current_price=close, order_pct=1.0)
+
+
+class NoClosingMaBot(MaBot):
+    # 不自己计算收盘账户
+    def on_event(self, event_item):
+        self.trade(event_item)
+
+
+def test_sweep_runner():
+    df = sweep_runner.run_sweep(MaBot, {'window': [5, 10, 20]}, workers=2)
+    assert len(df) == 3
+    assert df['success'].all()
+
+    the_bot = MaBot(params={'window': 10})
+    the_bot.run()
+    assert df.set_index('window').loc[10, 'allValue'] == pytest.approx(the_bot.account_service.account.allValue)
+    assert df.set_index('window').loc[10, 'tradeCount'] == the_bot.account_service.trade_count > 0
+
+
+def test_sweep_runner_closing(monkeypatch):
+    df = sweep_runner.run_sweep(NoClosingMaBot, {'window': [10]}, workers=1)
+    assert df['success'].all()
+
+    # 没有收盘时allValue为空,value停在初始资金
+    the_bot = NoClosingMaBot(params={'window': 10, 'persist_account': False, 'quote_source': 'file'})
+    the_bot.run()
+    account_service = the_bot.account_service
+    assert account_service.trade_count > 0
+    assert account_service.account.allValue is None
+
+    account_service.calculate_closing_account(the_bot.current_time)
+    assert df['allValue'].iat[0] == pytest.approx(account_service.account.allValue)
+    assert df['value'].iat[0] == pytest.approx(account_service.account.value) != the_bot.base_capital
+
+    closings = []
+    calculate_closing_account = AccountService.calculate_closing_account
+
+    def counting_closing_account(self, the_date):
+        closings.append(the_date)
+        calculate_closing_account(self, the_date)
+
+    monkeypatch.setattr(AccountService, 'calculate_closing_account', counting_closing_account)
+
+    # 没有收盘的bot在最后收盘一次
+    assert sweep_runner._run_bot(NoClosingMaBot, {'window': 10})['success']
+    assert len(closings) == 1
+
+    # bot最后已经收盘的,不再多一条收盘记录
+    del closings[:]
+    the_bot = MaBot(params={'window': 10, 'persist_account': False, 'quote_source': 'file'})
+    the_bot.run()
+    bot_closings = len(closings)
+
+    del closings[:]
+    assert sweep_runner._run_bot(MaBot, {'window': 10})['success']
+    assert len(closings) == bot_closings
+
+
+def test_minute_accumulator(monkeypatch):
+    # 导入时会建es的mapping,这里不连es
+    monkeypatch.setattr(es_utils, 'es_index_mapping', lambda *args, **kwargs: None)
+    eos_statistic_bot = importlib.import_module('fooltrader.botsamples.eos_statistic_bot')
+
+    big_order, middle_order = 2000, 500
+    rng = np.random.RandomState(0)
+    df = pd.DataFrame({'price': rng.uniform(1, 2, 200),
+                       'volume': rng.uniform(0, 1000, 200),
+                       'turnover': rng.uniform(0, 3000, 200),
+                       'direction': rng.choice([1, -1, 0], 200)})
+    df.loc[[3, 50], 'turnover'] = np.nan
+    df.loc[[7, 80], 'volume'] = np.nan
+
+    accumulator = eos_statistic_bot.MinuteAccumulator(big_order=big_order, middle_order=middle_order)
+    for _, row in df.iterrows():
+        accumulator.add(row['price'], row['volume'], row['turnover'], row['direction'])
+
+    # 原来每分钟用pandas的算法
+    buy = df['direction'] == 1
+    sell = df['direction'] == -1
+    big = df['turnover'] >= big_order
+    middle = (df['turnover'] >= middle_order) & (df['turnover'] < big_order)
+    small = df['turnover'] < middle_order
+    expected = {'volume': df['volume'].sum(),
+                'turnover': df['turnover'].sum(),
+                'flow': (df['turnover'] * df['direction']).sum(),
+                'flowIn': df[buy]['turnover'].sum(),
+                'flowOut': df[sell]['turnover'].sum(),
+                'bigFlowIn': df[buy & big]['turnover'].sum(),
+                'middleFlowIn': df[buy & middle]['turnover'].sum(),
+                'smallFlowIn': df[buy & small]['turnover'].sum(),
+                'bigFlowOut': df[sell & big]['turnover'].sum(),
+                'middleFlowOut': df[sell & middle]['turnover'].sum(),
+                'smallFlowOut': df[sell & small]['turnover'].sum()}
+    assert accumulator.get_statistic() == pytest.approx(expected)
+
+    assert accumulator.get_kdata() == pytest.approx({'open': df['price'][0],
+                                                     'high': df['price'].max(),
+                                                     'low': df['price'].min(),
+                                                     'close': df['price'][len(df) - 1],
+                                                     'volume': df['volume'].sum(),
+                                                     'turnover': df['turnover'].sum()})
+
+    accumulator.reset()
+    assert accumulator.count == 0
+    assert accumulator.get_statistic()['turnover'] == 0
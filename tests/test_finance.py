@@ -1,4 +1,8 @@
-from fooltrader.api import fundamental
+import os
+import shutil
+
+from fooltrader.api import fundamental, event
+from fooltrader.utils.cache_utils import FrameCache
 
 
 def test_get_balance_sheet_items():
@@ -23,3 +27,81 @@ def test_get_cash_flow_statement_items():
     for item in cash_flow_statements:
         assert item['netCashFlowsFromOperatingActivities'] > 0
         assert item['reportEventDate'] > item['reportPeriod']
+
+
+def test_finance_statement_cache(tmp_path, monkeypatch):
+    shutil.copytree(os.path.join('sample-data', 'stock', 'sh', '600977', 'finance'),
+                    str(tmp_path / 'finance'))
+    path = str(tmp_path / 'finance' / 'balance_sheet.xls')
+
+    monkeypatch.setattr(fundamental, 'finance_cache', FrameCache())
+
+    df = fundamental.get_finance_statement(path, fundamental.BALANCE_SHEET_FIELDS)
+    assert df['totalAssets'].dtype == float
+    assert fundamental.get_finance_statement(path, fundamental.BALANCE_SHEET_FIELDS).equals(df)
+    assert fundamental.finance_cache.stats()['hits'] == 1
+
+    # 文件变化后重新解析
+    with open(path, 'a', encoding='GB2312') as f:
+        f.write('\n')
+    fundamental.get_finance_statement(path, fundamental.BALANCE_SHEET_FIELDS)
+    assert fundamental.finance_cache.stats()['misses'] == 2
+
+    items = fundamental.get_balance_sheet_items('600977', start_date='2016-06-30')
+    items_df = fundamental.get_balance_sheet_items('600977', start_date='2016-06-30', return_type='df')
+    assert items_df.to_dict('records') == items
+
+
+def test_get_fundamental_panel():
+    panel = fundamental.get_fundamental_panel(['netProfit', 'totalAssets'], codes=['600977', '300027'])
+    assert set(panel['netProfit'].columns) == {'stock_sh_600977', 'stock_sz_300027'}
+    assert panel.loc['2017-03-31', ('totalAssets', 'stock_sh_600977')] == \
+           fundamental.get_balance_sheet_items('600977', report_period='2017-03-31')['totalAssets']
+
+    # 按公告日,公告前取不到该报告期的数据
+    pit_panel = fundamental.get_fundamental_panel('netProfit', codes=['600977'], point_in_time=True)
+    net_profit = pit_panel[('netProfit', 'stock_sh_600977')]
+    assert net_profit[:'2017-04-27'].iloc[-1] != panel.loc['2017-03-31', ('netProfit', 'stock_sh_600977')]
+    assert net_profit[:'2017-04-28'].iloc[-1] == panel.loc['2017-03-31', ('netProfit', 'stock_sh_600977')]
+
+
+def test_event_index_asof():
+    assert event.get_report_event_date('300550', '2016-12-31') == '2017-06-05'
+    assert event.get_report_event_date('300550', '2010-06-30') == '2010-06-30'
+
+    event_index = event.get_event_index('600977')
+    assert event_index.get_latest('2017-04-27')['reportPeriod'] == '2016-09-30'
+    assert event_index.get_latest('2017-04-28')['reportPeriod'] == '2017-03-31'
+    assert event_index.get_latest('2010-01-01') is None
+
+    df = event.get_latest_events(['600977', '300550', '600977'], ['2017-04-28', '2017-05-01', '2010-01-01'])
+    assert df['securityId'].tolist() == ['stock_sh_600977', 'stock_sz_300550', 'stock_sh_600977']
+    assert df['reportPeriod'].iloc[0] == '2017-03-31'
+    assert df['reportPeriod'].iloc[1] == '2017-03-31'
+    assert df['reportPeriod'].isna().iloc[2]
+
+
+def _crawl_balance_sheet_only(spider, setting, indexed_tasks, result_queue, concurrency):
+    result_queue.put([{'taskIdx': task_idx,
+                       'securityId': task['security_item']['id'],
+                       'spider': spider.name,
+                       'success': True,
+                       'reason': 'finished'} for task_idx, task in indexed_tasks if
+                      task['report_type'] == 'balance_sheet'])
+
+
+def test_crawl_batch_result_per_task(monkeypatch):
+    from fooltrader import datamanager
+    from fooltrader.api.technical import to_security_item
+    from fooltrader.spiders.chinastock.stock_finance_spider import StockFinanceSpider
+
+    monkeypatch.setattr(datamanager, '_crawl_shard', _crawl_balance_sheet_only)
+
+    security_item = to_security_item('600977')
+    tasks = [{'security_item': security_item, 'report_type': report_type} for report_type in
+             ['balance_sheet', 'income_statement', 'cash_flow']]
+    df = datamanager.crawl_batch(StockFinanceSpider, tasks, workers=2)
+
+    # 同一个证券的其他报表没有结果,算失败
+    assert len(df) == 3
+    assert df.set_index('taskIdx')['success'].to_dict() == {0: True, 1: False, 2: False}
@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+
+# import fooltrader的时间预算(秒)
+IMPORT_TIME_BUDGET = 5
+
+SCRIPT = '''
+import time
+start = time.time()
+import fooltrader
+from fooltrader.connector import kafka_connector
+print(time.time() - start)
+print(fooltrader.es_client.is_created() or fooltrader.kafka_producer.is_created() or kafka_connector.producer.is_created())
+'''
+
+
+def test_import_fooltrader_lazily(tmp_path):
+    store_path = tmp_path / 'store'
+    store_path.mkdir()
+
+    env = dict(os.environ, FOOLTRADER_STORE_PATH=str(store_path))
+    output = subprocess.run([sys.executable, '-c', SCRIPT], env=env, stdout=subprocess.PIPE, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.decode()
+    cost, created = output.split()[-2:]
+
+    assert float(cost) < IMPORT_TIME_BUDGET
+    # 不连接es和kafka,也不创建目录
+    assert created == 'False'
+    assert not os.listdir(store_path)
+
+
+def test_fresh_store_without_init_env(tmp_path, monkeypatch):
+    from fooltrader import settings
+    from fooltrader.api import technical
+
+    store_path = tmp_path / 'store'
+    store_path.mkdir()
+    monkeypatch.setattr(settings, 'FOOLTRADER_STORE_PATH', str(store_path))
+
+    # 没有缓存目录时不解析
+    technical.parse_shfe_day_data()
+    technical.parse_shfe_data()
+
+    # 去中心化交易所的列表第一次用到时生成
+    df = technical.get_security_list(security_type='cryptocurrency', exchanges=['contract'])
+    assert list(df['id']) == ['cryptocurrency_contract_RAM-EOS']
+    assert os.path.exists(os.path.join(str(store_path), 'cryptocurrency', 'contract.csv'))
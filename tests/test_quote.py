@@ -1,5 +1,20 @@
+import datetime
+import itertools
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
 from fooltrader import settings
-from fooltrader.api import technical
+from fooltrader.api import technical, computing
+from fooltrader.bot import quote_source
+from fooltrader.contract import files_contract
+from fooltrader.datamanager import kdata_store
+from fooltrader.utils import pd_utils, kafka_utils, cache_utils
 
 
 def test_get_china_stock_list():
@@ -141,3 +156,485 @@ def test_get_ticks():
     ticks = technical.get_ticks('600977', the_date='20180115')
     for tick in ticks:
         assert 'timestamp' in tick.columns
+
+
+def test_get_kdata_parquet_store(tmp_path, monkeypatch):
+    from fooltrader.datamanager.kdata_store import migrate_kdata
+
+    store_path = str(tmp_path / 'data')
+    shutil.copytree(settings.FOOLTRADER_STORE_PATH, store_path)
+    monkeypatch.setattr(settings, 'FOOLTRADER_STORE_PATH', store_path)
+
+    df_csv = technical.get_kdata('600977', start_date='2016-08-09', end_date='20180329')
+
+    assert migrate_kdata() > 0
+    monkeypatch.setattr(settings, 'KDATA_STORE_FORMAT', 'parquet')
+
+    df = technical.get_kdata('600977', start_date='2016-08-09', end_date='20180329')
+    assert len(df.index) == len(df_csv.index)
+    assert df.loc['2016-08-09', 'code'] == '600977'
+    assert df.loc['20180329', 'factor'] == df_csv.loc['20180329', 'factor']
+    assert round(df.loc['2016-08-09', 'qfqClose'], 2) == round(df_csv.loc['2016-08-09', 'qfqClose'], 2)
+
+    df = technical.get_kdata('rb1605', start_date='2015-05-15')
+    assert '20160516' in df.index
+
+
+def test_get_kdata_panel():
+    df = technical.get_kdata_panel(exchanges=['sh', 'sz'], start_date='2017-01-01', end_date='2017-12-31',
+                                   columns=['close', 'volume'])
+    assert list(df.columns) == ['close', 'volume']
+    assert ('2017-01-03', 'stock_sh_600977') in df.index
+    assert df.index.get_level_values('timestamp').min() >= pd.Timestamp('2017-01-01')
+
+    df = technical.get_kdata_panel(codes=['600977'], start_date='2016-08-09', fuquan='qfq', columns=['close'],
+                                   pivot=True)
+    df_kdata = technical.get_kdata('600977', start_date='2016-08-09')
+    assert round(df['close'].loc['2016-08-09', 'stock_sh_600977'], 2) == round(
+        df_kdata.loc['2016-08-09', 'qfqClose'], 2)
+
+
+def test_security_master(tmp_path, monkeypatch):
+    items = technical.to_security_items(['000338', 'ag1301', 'MSFT'])
+    assert [item['id'] for item in items] == ['stock_sz_000338', 'future_shfe_ag1301', 'stock_nasdaq_MSFT']
+
+    # 缓存的item不会被调用者修改
+    items[0]['name'] = 'changed'
+    assert technical.to_security_item('000338')['name'] != 'changed'
+
+    store_path = str(tmp_path / 'data')
+    shutil.copytree(settings.FOOLTRADER_STORE_PATH, store_path)
+    monkeypatch.setattr(settings, 'FOOLTRADER_STORE_PATH', store_path)
+
+    assert technical.to_security_item('rb2901') is None
+
+    # 列表文件更新后,缓存失效
+    df = technical.get_security_list(security_type='future', exchanges=['shfe'])
+    df = df.append({'code': 'rb2901', 'name': '螺纹钢2901', 'id': 'future_shfe_rb2901', 'exchange': 'shfe',
+                    'type': 'future'}, ignore_index=True)
+    df.to_csv(os.path.join(store_path, 'future', 'shfe.csv'), index=False)
+
+    assert technical.to_security_item('rb2901')['id'] == 'future_shfe_rb2901'
+
+
+def test_kdata_cache(tmp_path, monkeypatch):
+    store_path = str(tmp_path / 'data')
+    shutil.copytree(settings.FOOLTRADER_STORE_PATH, store_path)
+    monkeypatch.setattr(settings, 'FOOLTRADER_STORE_PATH', store_path)
+
+    technical.kdata_cache.clear()
+    stats = technical.kdata_cache.stats()
+
+    df = technical.get_kdata('600977', fuquan='qfq')
+    df1 = technical.get_kdata('600977', fuquan='hfq', start_date='2017-01-01')
+    assert technical.kdata_cache.stats()['misses'] == stats['misses'] + 1
+    assert technical.kdata_cache.stats()['hits'] == stats['hits'] + 1
+    assert df1.index[0] >= pd.Timestamp('2017-01-01')
+
+    # 调用者修改结果不影响缓存
+    df['close'] = 0
+    assert (technical.get_kdata('600977')['close'] != 0).all()
+
+    # 只读的结果不复制缓存的数据,增加的列不影响缓存
+    df2 = technical.get_kdata('600977', fuquan='qfq', copy=False)
+    df3 = technical.get_kdata('600977', copy=False)
+    assert np.shares_memory(df2['close'].values, df3['close'].values)
+    df3['signal'] = 1
+    assert 'signal' not in technical.get_kdata('600977', copy=False).columns
+
+    # 文件变化后重新读取
+    the_path = technical.get_kdata_path(technical.to_security_item('600977'), source='163')
+    pd_utils.kdata_df_save(df.iloc[:10], the_path)
+    assert len(technical.get_kdata('600977')) == 10
+
+
+def test_panel_macd():
+    close = technical.get_kdata_panel(codes=['600977', '300027', '300550'], start_date='2017-01-01',
+                                      end_date='2017-12-31', columns=['close'], pivot=True)['close']
+    result = computing.panel_macd(close)
+
+    for security_id in close.columns:
+        df = computing.macd(security_id, start_date='2017-01-01', end_date='2017-12-31')
+        assert np.allclose(result['macd'][security_id].dropna(), df['macd'].dropna())
+
+    df_ma = computing.panel_ma(close, window=5)
+    df = computing.ma('600977', start_date='2017-01-01', end_date='2017-12-31', col=['close'])
+    assert np.allclose(df_ma['stock_sh_600977'].dropna(), df['close_ma5'].dropna())
+
+
+def test_indicator_state_update(tmp_path, monkeypatch):
+    store_path = str(tmp_path / 'data')
+    shutil.copytree(settings.FOOLTRADER_STORE_PATH, store_path)
+    monkeypatch.setattr(settings, 'FOOLTRADER_STORE_PATH', store_path)
+
+    # 先用前面的数据建立状态,再增量推进最新的5个bar,其中一个缺失
+    df = technical.get_kdata('600977')
+    the_path = technical.get_kdata_path(technical.to_security_item('600977'), source='163')
+    pd_utils.kdata_df_save(df.iloc[:-5], the_path)
+
+    new_bars = df.iloc[-5:].copy()
+    new_bars.iloc[2, new_bars.columns.get_loc('hfqClose')] = np.nan
+
+    # 后复权的价格,缺失值被跳过
+    df_close = pd.concat([df.iloc[:-5], new_bars])[['hfqClose']]
+    df_macd = computing.panel_macd(df_close)
+    df_ema = computing.panel_ema(df_close, window=12)
+    df_ma = computing.panel_ma(df_close, window=20)
+
+    computing.update('600977')
+    state = computing.get_indicator_state('600977')
+    assert state['timestamp'] == technical.to_time_str(df.index[-6])
+    assert state['fuquan'] == 'hfq'
+    state_path = files_contract.get_indicator_state_path(technical.to_security_item('600977'), source='163')
+    assert os.path.exists(state_path) and not os.path.exists(state_path + '.tmp')
+
+    result = computing.update('600977', new_bars=new_bars)
+    assert len(result) == 5
+
+    valid = [0, 1, 3, 4]
+    assert np.allclose(result['macd'].iloc[valid], df_macd['macd'].iloc[-5:, 0].iloc[valid])
+    assert np.allclose(result['dea'].iloc[valid], df_macd['dea'].iloc[-5:, 0].iloc[valid])
+    assert np.allclose(result['close_ema12'].iloc[valid], df_ema.iloc[-5:, 0].iloc[valid])
+    assert np.allclose(result['close_ma20'].iloc[valid], df_ma.iloc[-5:, 0].iloc[valid])
+
+    # 缺失的bar不推进ema,也没有ma
+    assert result['close_ema12'].iloc[2] == result['close_ema12'].iloc[1]
+    assert np.isnan(result['close_ma20'].iloc[2])
+
+    # 重复推进不会重复计算
+    assert computing.update('600977', new_bars=new_bars).empty
+
+    with pytest.raises(ValueError):
+        computing.update('600977', fuquan='qfq')
+
+
+def test_save_stock_kdata_163(tmp_path, monkeypatch):
+    df = technical.get_kdata('600977', fuquan='qfq')
+
+    store_path = str(tmp_path / 'data')
+    shutil.copytree(settings.FOOLTRADER_STORE_PATH, store_path)
+    monkeypatch.setattr(settings, 'FOOLTRADER_STORE_PATH', store_path)
+
+    security_item = technical.to_security_item('600977')
+    the_path = technical.get_kdata_path(security_item, source='163')
+    kdata_store.save_stock_kdata_163(security_item, pd_utils.pd_read_kdata(the_path))
+
+    # 后复权价格写在文件里,最新的factor写在meta里
+    assert 'hfqClose' in pd_utils.pd_read_kdata(the_path).columns
+    assert kdata_store.get_kdata_meta(security_item)['latestFactor'] == df['factor'].dropna().iat[-1]
+
+    df1 = technical.get_kdata('600977', fuquan='qfq')
+    for col in ['hfqClose', 'hfqOpen', 'qfqClose', 'qfqLow']:
+        assert np.allclose(df1[col], df[col], equal_nan=True)
+
+    # meta没变化不再读取
+    monkeypatch.setattr(kdata_store, 'get_kdata_meta', None)
+    assert np.allclose(technical.get_kdata('600977', fuquan='qfq')['qfqClose'], df['qfqClose'], equal_nan=True)
+
+
+def test_kdata_df_append(tmp_path, monkeypatch):
+    store_path = str(tmp_path / 'data')
+    shutil.copytree(settings.FOOLTRADER_STORE_PATH, store_path)
+    monkeypatch.setattr(settings, 'FOOLTRADER_STORE_PATH', store_path)
+
+    df = technical.get_kdata('600977')
+    the_path = technical.get_kdata_path(technical.to_security_item('600977'), source='163')
+    pd_utils.kdata_df_save(df.iloc[:-5], the_path)
+    size = os.path.getsize(the_path)
+
+    # 乱序和重复的k线
+    pd_utils.kdata_df_append(df.iloc[-2:], the_path)
+    pd_utils.kdata_df_append(df.iloc[-6:-2], the_path)
+
+    assert os.path.getsize(the_path) == size
+    assert os.path.exists(pd_utils.get_kdata_delta_path(the_path))
+
+    df1 = technical.get_kdata('600977')
+    assert df1.index.equals(df.index)
+    assert np.allclose(df1['close'], df['close'])
+
+    assert kdata_store.compact_kdata(security_types=['stock']) == 1
+    assert not os.path.exists(pd_utils.get_kdata_delta_path(the_path))
+    assert np.allclose(technical.get_kdata('600977')['close'], df['close'])
+
+
+@pytest.mark.skipif(pd_utils.fcntl is None, reason='no fcntl')
+def test_kdata_compact_with_append(tmp_path, monkeypatch):
+    df = technical.get_kdata('600977')
+    the_path = str(tmp_path / '163_dayk.csv')
+    pd_utils.kdata_df_save(df.iloc[:-5], the_path)
+    pd_utils.kdata_df_append(df.iloc[-5:-2], the_path)
+
+    # 合并读取之后,保存之前,其他进程追加新的k线
+    appender = threading.Thread(target=pd_utils.kdata_df_append, args=(df.iloc[-2:], the_path))
+    kdata_write = pd_utils._kdata_write
+
+    def append_and_write(*args, **kwargs):
+        appender.start()
+        appender.join(0.2)
+        return kdata_write(*args, **kwargs)
+
+    monkeypatch.setattr(pd_utils, '_kdata_write', append_and_write)
+    assert pd_utils.kdata_compact(the_path)
+    appender.join()
+    monkeypatch.undo()
+
+    df1 = pd_utils.pd_read_kdata(the_path)
+    assert df1.index.equals(df.index)
+    assert np.allclose(df1['close'], df['close'])
+
+
+def test_calculate_change(tmp_path):
+    df = technical.get_kdata('600977')
+    expected = df[['preClose', 'change', 'changePct']].copy()
+
+    # 中间和最后的k线缺失
+    df.loc[df.index[10:15], ['preClose', 'change', 'changePct']] = None
+    df.loc[df.index[-3:], 'changePct'] = None
+
+    the_path = str(tmp_path / '600977.csv')
+    pd_utils.kdata_df_save(df, the_path, calculate_change=True)
+    df1 = pd_utils.pd_read_kdata(the_path)
+    assert np.allclose(df1['preClose'], expected['preClose'])
+    assert np.allclose(df1['change'], expected['change'])
+    # 完整的k线不变
+    assert np.allclose(df1['changePct'].iloc[:10], expected['changePct'].iloc[:10])
+    assert np.allclose(df1['changePct'].iloc[10:15], df1['change'].iloc[10:15] / df1['close'].iloc[10:15])
+
+    # 新的k线用传入的pre_close
+    df2 = df.iloc[-2:].copy()
+    df2[['preClose', 'change', 'changePct']] = None
+    df2 = pd_utils._calculate_change(df2, pre_close=df['close'].iat[-3])
+    assert np.allclose(df2['preClose'], expected['preClose'].iloc[-2:])
+    assert np.allclose(df2['change'], expected['change'].iloc[-2:])
+
+
+def test_parse_shfe_day_data(tmp_path, monkeypatch):
+    store_path = str(tmp_path / 'data')
+    shutil.copytree(settings.FOOLTRADER_STORE_PATH, store_path)
+    monkeypatch.setattr(settings, 'FOOLTRADER_STORE_PATH', store_path)
+
+    cache_dir = files_contract.get_exchange_cache_dir(security_type='future', exchange='shfe',
+                                                      the_year=datetime.datetime.today().year, data_type='day_kdata')
+    os.makedirs(cache_dir)
+
+    def day_data(product_id, month, close, change):
+        return {'CLOSEPRICE': close, 'DELIVERYMONTH': month, 'HIGHESTPRICE': close, 'LOWESTPRICE': close,
+                'OPENINTEREST': 100, 'OPENPRICE': close, 'PRESETTLEMENTPRICE': close - change,
+                'PRODUCTID': product_id, 'SETTLEMENTPRICE': close, 'VOLUME': 10, 'ZD1_CHG': change, 'ZD2_CHG': change}
+
+    for the_date, close in [('20151102', 2000), ('20151103', 2010)]:
+        with open(os.path.join(cache_dir, the_date), 'w', encoding='UTF8') as f:
+            json.dump({'o_curinstrument': [day_data('rb_f    ', '1605', close, 10),
+                                           day_data('au_f    ', '2612', close / 10, 1),
+                                           day_data('au_f    ', '小计', 0, 0)]}, f)
+
+    technical.parse_shfe_day_data()
+
+    security_list = technical.get_security_list(security_type='future', exchanges=['shfe'])
+    assert 'au2612' in security_list.index
+    assert security_list['code'].is_unique
+
+    df = technical.get_kdata('au2612', source='exchange')
+    assert list(df['close']) == [200, 201]
+    assert np.allclose(df['changePct'], [1 / 199, 1 / 200])
+
+    df = technical.get_kdata('rb1605', source='exchange')
+    assert df.loc['2015-11-03', 'close'] == 2010
+    assert df.loc['2015-11-03', 'preClose'] == 2000
+
+    with open(os.path.join(cache_dir, 'parsed')) as f:
+        assert json.load(f) == ['20151102', '20151103']
+
+    # 已经解析过的日期不再解析
+    with open(os.path.join(cache_dir, '20151103'), 'w', encoding='UTF8') as f:
+        json.dump({'o_curinstrument': [day_data('au_f    ', '2612', 202, 2)]}, f)
+    technical.parse_shfe_day_data()
+    assert list(technical.get_kdata('au2612', source='exchange')['close']) == [200, 201]
+
+    # 强制重新解析时,新的bar覆盖已保存的同一天
+    technical.parse_shfe_day_data(force_parse=True)
+    df = technical.get_kdata('au2612', source='exchange')
+    assert list(df['close']) == [200, 202]
+    assert df.loc['2015-11-03', 'preClose'] == 200
+    # 新的缓存文件里没有的合约保持不变
+    assert technical.get_kdata('rb1605', source='exchange').loc['2015-11-03', 'close'] == 2010
+
+
+def test_es_bulk_index_failed_actions(monkeypatch):
+    from fooltrader.utils import es_utils
+
+    indexed = []
+
+    def streaming_bulk(client, chunk, **kwargs):
+        for action in chunk:
+            indexed.append(action)
+            yield True, {}
+
+    monkeypatch.setattr(es_utils.helpers, 'streaming_bulk', streaming_bulk)
+
+    def actions():
+        for i in range(5):
+            yield {'_id': i}
+        raise ValueError('bad doc')
+
+    with pytest.raises(ValueError):
+        es_utils.es_bulk_index(actions(), chunk_size=2, thread_count=2)
+
+    # 索引线程都结束了,出错前的文档都索引了
+    assert not [t for t in threading.enumerate() if t.name.startswith('es_bulk_')]
+    assert sorted(action['_id'] for action in indexed) == [0, 1, 2, 3]
+
+
+def test_es_bulk_index_worker_error(monkeypatch):
+    from fooltrader.utils import es_utils
+
+    def streaming_bulk(client, chunk, **kwargs):
+        for action in chunk:
+            if action['_id'] % 3 == 2:
+                raise RuntimeError('connection lost')
+            yield True, {}
+
+    monkeypatch.setattr(es_utils.helpers, 'streaming_bulk', streaming_bulk)
+
+    # 线程出错时不会卡住生产者,失败的chunk计入failed
+    result = []
+    the_thread = threading.Thread(
+        target=lambda: result.append(es_utils.es_bulk_index(({'_id': i} for i in range(30)), chunk_size=3,
+                                                            thread_count=1)), daemon=True)
+    the_thread.start()
+    the_thread.join(timeout=10)
+    assert not the_thread.is_alive()
+    assert result == [(20, 10)]
+
+
+def test_kafka_message_codec():
+    topic = 'stock_sz_300550_tick'
+    df = next(technical.get_ticks('300550', the_date='2018-01-08'))
+
+    binary_messages = kafka_utils.encode_frame(topic, df, encoding='binary')
+    json_messages = kafka_utils.encode_frame(topic, df, encoding='json')
+    assert len(binary_messages) == len(df)
+    assert sum(len(m) for m in binary_messages) < sum(len(m) for m in json_messages) * 0.7
+
+    for binary_message, json_message in zip(binary_messages[:100], json_messages[:100]):
+        assert kafka_utils.decode_message(binary_message) == kafka_utils.decode_message(json_message)
+
+    # 字段表之外或类型不符的字段也能还原
+    tick = {'timestamp': 1522315801, 'securityId': 'cryptocurrency_kraken_BTC-USD', 'price': 7000.5,
+            'volume': None, 'unknown': 'x'}
+    assert kafka_utils.decode_message(kafka_utils.encode_message(topic, tick, encoding='binary')) == tick
+
+    # 默认json,旧的消费者能读
+    assert kafka_utils.encode_message(topic, tick) == kafka_utils.encode_message(topic, tick, encoding='json')
+
+    kdata_topic = 'stock_sz_300027_hfq_day_kdata'
+    df = technical.get_kdata('300027', fuquan='hfq')
+    for binary_message, json_message in zip(kafka_utils.encode_frame(kdata_topic, df, encoding='binary')[:100],
+                                            kafka_utils.encode_frame(kdata_topic, df, encoding='json')[:100]):
+        # json只保留10位小数
+        assert kafka_utils.decode_message(binary_message) == pytest.approx(kafka_utils.decode_message(json_message))
+
+
+def test_quote_source_from_file():
+    events = list(quote_source.get_quote_source('600977', level='day', start_date='2017-01-01',
+                                                end_date='2017-12-31'))
+    df = technical.get_kdata('600977', start_date='2017-01-01', end_date='2017-12-31', fuquan='hfq')
+    assert [timestamp for timestamp, _ in events] == list(df.index)
+    assert events[0][1]['hfqClose'] == df['hfqClose'].iat[0]
+
+    events = list(quote_source.get_quote_source('300550', level='tick', start_date='2018-01-08',
+                                                end_date='2018-01-09 10:00:00'))
+    timestamps = [timestamp for timestamp, _ in events]
+    assert timestamps == sorted(timestamps)
+    assert timestamps[0] >= pd.Timestamp('2018-01-08')
+    assert timestamps[-1] <= pd.Timestamp('2018-01-09 10:00:00')
+    assert events[0][1]['securityId'] == 'stock_sz_300550'
+
+    # 数据源必须实现__iter__
+    with pytest.raises(TypeError):
+        quote_source.QuoteSource()
+
+
+def test_merged_quote_source():
+    codes = ['600977', '300027', '300550']
+    merged = quote_source.MergedSource([quote_source.KdataSource(code, start_date='2017-01-01') for code in codes],
+                                       buffer_size=7)
+    events = list(merged)
+
+    timestamps = [timestamp for timestamp, _ in events]
+    assert timestamps == sorted(timestamps)
+
+    for code in codes:
+        df = technical.get_kdata(code, start_date='2017-01-01', fuquan='hfq')
+        assert [timestamp for timestamp, event in events if event['code'] == code] == list(df.index)
+
+
+class _LiveSource(quote_source.QuoteSource):
+    bounded = False
+
+    def __init__(self):
+        super().__init__()
+        self.pulled = 0
+
+    def __iter__(self):
+        for timestamp in itertools.count():
+            self.pulled += 1
+            yield pd.Timestamp('2017-01-01') + pd.Timedelta(seconds=timestamp), {'code': 'live'}
+
+
+def test_merged_quote_source_live():
+    live = _LiveSource()
+    merged = quote_source.MergedSource([live, quote_source.KdataSource('600977', start_date='2017-01-01')],
+                                       buffer_size=1000)
+    assert not merged.bounded
+
+    events = list(itertools.islice(merged, 5))
+    assert [event['code'] for _, event in events] == ['live'] * 5
+    # 实时的数据源不预读
+    assert live.pulled <= 6
+
+
+def test_lru_cache():
+    cache = cache_utils.LruCache(max_bytes=10, sizeof=lambda value: len(value or ''))
+    cache.put('a', 'xxx')
+    cache.put('b', 'xxx')
+    cache.put('c', 'xxx')
+    assert cache.stats()['bytes'] == 9
+
+    # 访问过的a变成最新,超出预算时先淘汰b
+    assert cache.get('a') == 'xxx'
+    cache.put('d', 'xx')
+    assert 'b' not in cache
+    assert list(cache._entries) == ['c', 'a', 'd']
+    assert cache.stats()['bytes'] == 8
+    assert cache.evictions == 1
+
+    # 缓存None作为不存在的标记
+    cache.put('e', None)
+    assert 'e' in cache
+    assert cache.get('e', default='missing') is None
+    assert cache.get('b', default='missing') == 'missing'
+    assert cache.hits == 2 and cache.misses == 1
+
+    # 值变大后重新put,大小按新的值计算
+    value = ['x']
+    sized = cache_utils.LruCache(max_bytes=10, sizeof=len)
+    sized.put('v', value)
+    sized.put('w', ['x'] * 4)
+    value.extend(['x'] * 5)
+    assert sized.stats()['bytes'] == 5
+    sized.put('v', value)
+    assert sized.stats()['bytes'] == 10
+    value.append('x')
+    sized.put('v', value)
+    assert 'w' not in sized
+    assert sized.stats()['bytes'] == 7
+
+    # 超出预算也保留刚放进去的
+    sized.put('big', ['x'] * 20)
+    assert list(sized._entries) == ['big']
+    assert sized.stats()['bytes'] == 20
+
+    sized.invalidate('big')
+    assert len(sized) == 0 and sized.stats()['bytes'] == 0